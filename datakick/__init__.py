@@ -1,3 +1,67 @@
-from .api import add_image, add_product, find_product, list_products, search
-from . import exceptions
-from . import models
+"""
+datakick
+--------
+
+The functions and submodules of datakick are imported on first use, so that
+``import datakick`` doesn't pay for importing requests until a request is
+actually made.
+
+"""
+
+import importlib
+
+_API = (
+    "Client",
+    "add_image",
+    "add_product",
+    "find_product",
+    "find_products",
+    "iter_products",
+    "list_products",
+    "search",
+)
+
+_SUBMODULES = (
+    "api",
+    "bloom",
+    "breaker",
+    "cache",
+    "cli",
+    "crawler",
+    "deadline",
+    "encoding",
+    "exceptions",
+    "export",
+    "images",
+    "index",
+    "interning",
+    "models",
+    "nutrition",
+    "parallel",
+    "pipeline",
+    "quantities",
+    "server",
+    "transport",
+    "warming",
+)
+
+__all__ = _API + ("exceptions", "models")
+
+
+def __getattr__(name):
+    if name in _API:
+        value = getattr(importlib.import_module(".api", __name__), name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module("." + name, __name__)
+    else:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name)
+        )
+
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_API) | set(_SUBMODULES))
@@ -6,21 +6,87 @@ This module contains the methods that power datakick.
 
 """
 
+import collections
+import functools
 import os
-import requests
-import six
-
-from .exceptions import ImageTooLargeError, InvalidImageFormatError
+import threading
+import time
+
+from .deadline import as_deadline
+from .exceptions import (
+    CircuitOpenError, DeadlineExceededError, ImageTooLargeError,
+    InvalidImageFormatError
+)
+from .images import hash_image
 from .models import DatakickProduct
+from .parallel import imap
+from .transport import RequestsTransport, Response
+
+#: Base url of the Datakick API.
+API_URL = "https://www.datakick.org/api"
 
-_ADD_PRODUCT_URL = "https://www.datakick.org/api/items/{gtin14}"
-_ADD_IMAGE_URL = "https://www.datakick.org/api/items/{gtin14}/images"
-_FIND_PRODUCT_URL = "https://www.datakick.org/api/items/{gtin14}"
-_LIST_PRODUCTS_URL = "https://www.datakick.org/api/items?page={page}"
-_SEARCH_URL = "https://www.datakick.org/api/items?query={key}"
+_ADD_PRODUCT_URL = "{api_url}/items/{gtin14}"
+_ADD_IMAGE_URL = "{api_url}/items/{gtin14}/images"
+_FIND_PRODUCT_URL = "{api_url}/items/{gtin14}"
+_LIST_PRODUCTS_URL = "{api_url}/items?page={page}"
+_SEARCH_URL = "{api_url}/items?query={key}"
 
 VALID_IMAGE_EXT = (".jpeg", ".jpg")
 
+#: Endpoints guarded by their own circuit breaker.
+ENDPOINTS = (
+    "add_image", "add_product", "find_product", "list_products", "search"
+)
+
+#: Default ``(connect, read)`` timeouts in seconds of each endpoint.
+TIMEOUTS = {
+    "add_image": (3.05, 60),
+    "add_product": (3.05, 30),
+    "find_product": (3.05, 30),
+    "list_products": (3.05, 30),
+    "search": (3.05, 30),
+}
+
+# client errors answered when the database is overloaded or too slow, which
+# count as failures for the circuit breakers unlike other client errors
+_OVERLOAD_STATUSES = (408, 429)
+
+# cache hits are counted for at most this many products at a time
+_MAX_TRACKED_HITS = 100000
+
+_hooks = []
+
+
+def register_hook(callback):
+    """
+    Registers a callback that is called with every product fetched from or
+    added to the Datakick database, i.e. to keep a local index up to date.
+
+    :param callback: callable accepting a
+        :class:`DatakickProduct <DatakickProduct>` object
+    :return: None
+    """
+    if callback not in _hooks:
+        _hooks.append(callback)
+
+
+def unregister_hook(callback):
+    """
+    Removes a callback registered with :func:`register_hook`.
+
+    :param callback: the registered callable
+    :return: None
+    """
+    if callback in _hooks:
+        _hooks.remove(callback)
+
+
+def _run_hooks(products):
+    """Calls every registered hook with each of the products."""
+    for hook in list(_hooks):
+        for product in products:
+            hook(product)
+
 
 def _check_image_ext(img_path):
     """
@@ -56,6 +122,436 @@ def _check_image_size(img_path):
         raise ImageTooLargeError("Image must be <= 1MB in size.")
 
 
+class _Refresher(object):
+    """Refetches cached products on background threads, at most once at a
+    time per gtin14."""
+
+    def __init__(self, fetch, workers):
+        self._fetch = fetch
+        self._workers = workers
+        self._pool = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def refresh(self, gtin14):
+        """Schedules a refresh of the product unless one is pending."""
+        from multiprocessing.pool import ThreadPool
+
+        with self._lock:
+            if gtin14 in self._pending:
+                return
+
+            if self._pool is None:
+                self._pool = ThreadPool(self._workers)
+
+            self._pending.add(gtin14)
+
+        self._pool.apply_async(self._run, (gtin14,))
+
+    def _run(self, gtin14):
+        try:
+            self._fetch(gtin14)
+        except Exception:
+            # the stale product keeps being served until it is too old
+            pass
+        finally:
+            with self._lock:
+                self._pending.discard(gtin14)
+                self._idle.notify_all()
+
+    def wait(self, timeout=None):
+        """Blocks until no refresh is pending. Returns False on timeout."""
+        deadline = None if timeout is None else time.time() + timeout
+
+        with self._lock:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.time()
+
+                if remaining is not None and remaining <= 0:
+                    return False
+
+                self._idle.wait(remaining)
+
+        return True
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+
+class Client(object):
+    """Sends requests to the Datakick database through a
+    :class:`Transport <datakick.transport.Transport>`.
+
+    The module-level functions use :data:`default_client`; create a client to
+    pick another transport, i.e. a pooled
+    :class:`Urllib3Transport <datakick.transport.Urllib3Transport>` for high
+    throughput or a :class:`FakeTransport <datakick.transport.FakeTransport>`
+    in tests.
+    """
+
+    def __init__(self, transport=None, intern_pool=None, cache=None,
+                 ttl=86400, stale_ttl=0, refresh_ahead=0.0, refresh_hits=2,
+                 refresh_workers=2, access_sketch=None, circuit_breaker=None,
+                 timeouts=None, known_gtin14s=None, image_manifest=None,
+                 api_url=API_URL):
+        """Creates a :class:`Client <Client>` using the transport supplied or
+        a :class:`RequestsTransport <datakick.transport.RequestsTransport>`.
+
+        :param transport: :class:`Transport <datakick.transport.Transport>`
+        :param intern_pool: optional
+            :class:`InternPool <datakick.interning.InternPool>` deduplicating
+            the strings repeated across the products returned
+        :param cache: optional :class:`Cache <datakick.cache.Cache>` keeping
+            the products found and added
+        :param ttl: number of seconds a cached product is fresh for
+        :param stale_ttl: number of seconds past ``ttl`` a cached product is
+            still served while it is refetched in the background
+        :param refresh_ahead: fraction of ``ttl``, i.e. 0.2, before expiry
+            from which hot products are refetched in the background
+        :param refresh_hits: number of cache hits making a product hot
+        :param refresh_workers: number of background refresh threads
+        :param access_sketch: optional
+            :class:`SpaceSaving <datakick.warming.SpaceSaving>` sketch
+            recording the gtin14 of every :meth:`find_product` call, used to
+            warm the cache after a restart
+        :param circuit_breaker: optional factory, i.e.
+            :class:`CircuitBreaker <datakick.breaker.CircuitBreaker>`, called
+            once per endpoint of :data:`ENDPOINTS` to create its breaker
+        :param timeouts: :class:`dict <dict>` overriding the :data:`TIMEOUTS`
+            of some endpoints with a number of seconds, a ``(connect, read)``
+            :class:`tuple <tuple>` or None for no timeout
+        :param known_gtin14s: optional
+            :class:`BloomFilter <datakick.bloom.BloomFilter>` of the gtin14s
+            in the Datakick database, letting :meth:`find_product` answer
+            lookups of unknown gtin14s without a request
+        :param image_manifest: optional
+            :class:`ImageManifest <datakick.images.ImageManifest>` of the
+            images uploaded, letting :meth:`add_image` return the url of an
+            image uploaded before instead of uploading it again
+        :param api_url: base url of the API, i.e. of a ``datakick serve``
+            proxy shared by several services
+        """
+        self.transport = transport or RequestsTransport()
+        self.api_url = api_url.rstrip("/")
+        self.intern_pool = intern_pool
+        self.cache = cache
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.refresh_ahead = refresh_ahead
+        self.refresh_hits = refresh_hits
+        self.access_sketch = access_sketch
+        self.breakers = dict(
+            (endpoint, circuit_breaker()) for endpoint in ENDPOINTS
+        ) if circuit_breaker is not None else {}
+        self.timeouts = dict(TIMEOUTS)
+
+        for endpoint, timeout in (timeouts or {}).items():
+            if timeout is not None and not isinstance(timeout, tuple):
+                timeout = (timeout, timeout)
+
+            self.timeouts[endpoint] = timeout
+
+        self.known_gtin14s = known_gtin14s
+        self.image_manifest = image_manifest
+
+        self._hits = collections.Counter()
+        self._hits_lock = threading.Lock()
+        self._refresher = _Refresher(self._fetch_product, refresh_workers)
+
+    def _request(self, endpoint, method, url, params=None, files=None,
+                 deadline=None):
+        """Sends a request with the timeouts of the endpoint, cut down to the
+        deadline if any, and raises for error responses, unless the circuit
+        breaker of the endpoint is open."""
+        timeout = self.timeouts.get(endpoint)
+
+        if deadline is not None:
+            timeout = deadline.timeout(timeout)
+
+        breaker = self.breakers.get(endpoint)
+
+        if breaker is None:
+            resp = self._send(method, url, params, files, timeout, deadline)
+            resp.raise_for_status()
+
+            return resp
+
+        if not breaker.allow():
+            raise CircuitOpenError(
+                "The circuit breaker of {} is open.".format(endpoint)
+            )
+
+        start = time.time()
+
+        try:
+            resp = self._send(method, url, params, files, timeout, deadline)
+            resp.raise_for_status()
+        except Exception as error:
+            # client errors, i.e. unknown products, are valid answers
+            status_code = getattr(
+                getattr(error, "response", None), "status_code", None
+            )
+            breaker.record(
+                status_code is not None and status_code < 500 and
+                status_code not in _OVERLOAD_STATUSES,
+                time.time() - start
+            )
+            raise
+
+        breaker.record(True, time.time() - start)
+
+        return resp
+
+    def _send(self, method, url, params, files, timeout, deadline):
+        """Sends a request through the transport, raising
+        :class:`DeadlineExceededError` if it failed, i.e. timed out, once the
+        deadline passed."""
+        import requests
+
+        try:
+            return self.transport.request(
+                method, url, params=params, files=files, timeout=timeout
+            )
+        except requests.RequestException:
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceededError("The deadline passed.")
+
+            raise
+
+    def _url(self, template, **kwargs):
+        """Formats the url of an endpoint under the base url."""
+        return template.format(api_url=self.api_url, **kwargs)
+
+    def _product(self, json_response):
+        """Creates a product, sharing its strings through the intern pool."""
+        if self.intern_pool is not None:
+            json_response = self.intern_pool.intern_response(json_response)
+
+        return DatakickProduct(json_response)
+
+    def add_image(self, gtin14, img_path):
+        """See :func:`add_image`. Images found in the ``image_manifest``, if
+        any, aren't uploaded again."""
+        _check_image_ext(img_path)
+        _check_image_size(img_path)
+
+        digest = None
+
+        if self.image_manifest is not None:
+            digest = hash_image(img_path)
+            image_url = self.image_manifest.get(gtin14, digest)
+
+            if image_url is not None:
+                return image_url
+
+        url = self._url(_ADD_IMAGE_URL, gtin14=gtin14)
+
+        with open(img_path, "rb") as image:
+            resp = self._request(
+                "add_image", "POST", url, files={"image": image}
+            )
+
+        image_url = resp.json().get("image_url")
+
+        if digest is not None and image_url is not None:
+            self.image_manifest.record(gtin14, digest, image_url)
+
+        return image_url
+
+    def add_product(self, gtin14, **kwargs):
+        """See :func:`add_product`."""
+        url = self._url(_ADD_PRODUCT_URL, gtin14=gtin14)
+
+        resp = self._request("add_product", "PUT", url, params=kwargs)
+
+        product = self._product(resp.json())
+        _run_hooks([product])
+
+        if self.cache is not None:
+            self.cache.set(gtin14, product)
+
+        if self.known_gtin14s is not None:
+            self.known_gtin14s.add(product.gtin14 or gtin14)
+
+        return product
+
+    def find_product(self, gtin14, deadline=None):
+        """See :func:`find_product`. The request isn't sent once the
+        :class:`Deadline <datakick.deadline.Deadline>`, if any, passed.
+
+        Products are served from the cache, if any, while they are fresh.
+        Stale products younger than ``ttl + stale_ttl`` are served right away
+        and refetched in the background. Products hit at least
+        ``refresh_hits`` times are refetched in the background shortly before
+        they expire, so hot products never wait on the network.
+
+        While the circuit breaker of the endpoint is open, expired cached
+        products are served as copies whose ``stale`` attribute is True.
+
+        Gtin14s missing from ``known_gtin14s``, if any, raise the same
+        :class:`requests.HTTPError` as the database would, without a request.
+        """
+        if self.access_sketch is not None:
+            self.access_sketch.record(gtin14)
+
+        return self._lookup(gtin14, deadline)
+
+    def _lookup(self, gtin14, deadline=None):
+        """Finds a product like :meth:`find_product` without recording the
+        access, i.e. when warming the cache from the sketch."""
+        entry = None
+
+        if self.cache is not None:
+            entry = self.cache.get(gtin14)
+
+            if entry is not None:
+                product, stored_at = entry
+                age = time.time() - stored_at
+
+                if age < self.ttl:
+                    if self._is_due(gtin14, age):
+                        self._refresher.refresh(gtin14)
+
+                    return product
+
+                if age < self.ttl + self.stale_ttl:
+                    self._refresher.refresh(gtin14)
+
+                    return product
+
+        if (self.known_gtin14s is not None and
+                gtin14 not in self.known_gtin14s):
+            url = self._url(_FIND_PRODUCT_URL, gtin14=gtin14)
+            Response(
+                404, b'{"error": "Not Found"}', url, "Not Found"
+            ).raise_for_status()
+
+        try:
+            return self._fetch_product(gtin14, deadline)
+        except CircuitOpenError:
+            if entry is None:
+                raise
+
+            return entry[0]._stale_copy()
+
+    def _is_due(self, gtin14, age):
+        """Counts a cache hit and returns True if the product is hot and
+        about to expire."""
+        if not self.refresh_ahead:
+            return False
+
+        with self._hits_lock:
+            if len(self._hits) >= _MAX_TRACKED_HITS:
+                self._hits.clear()
+
+            self._hits[gtin14] += 1
+
+            if age < self.ttl * (1.0 - self.refresh_ahead):
+                return False
+
+            if self._hits[gtin14] < self.refresh_hits:
+                return False
+
+            del self._hits[gtin14]
+
+        return True
+
+    def _fetch_product(self, gtin14, deadline=None):
+        """Fetches a product from the Datakick database and caches it."""
+        url = self._url(_FIND_PRODUCT_URL, gtin14=gtin14)
+
+        resp = self._request("find_product", "GET", url, deadline=deadline)
+
+        product = self._product(resp.json())
+        _run_hooks([product])
+
+        if self.cache is not None:
+            self.cache.set(gtin14, product)
+
+        return product
+
+    def find_products(self, gtin14s, concurrency=8, ordered=True,
+                      deadline=None):
+        """See :func:`find_products`."""
+        deadline = as_deadline(deadline)
+        find = self.find_product
+
+        if deadline is not None:
+            find = functools.partial(self.find_product, deadline=deadline)
+
+        return imap(find, gtin14s, concurrency, ordered)
+
+    def iter_products(self, start_page=1, end_page=None, deadline=None):
+        """See :func:`iter_products`."""
+        deadline = as_deadline(deadline)
+        page = max(start_page, 1)
+
+        while end_page is None or page <= end_page:
+            try:
+                products = self.list_products(page, deadline)
+            except DeadlineExceededError as error:
+                error.page = page
+                raise
+
+            if not products:
+                break
+
+            for product in products:
+                yield product
+
+            page += 1
+
+    def list_products(self, page=1, deadline=None):
+        """See :func:`list_products`. The request isn't sent once the
+        :class:`Deadline <datakick.deadline.Deadline>`, if any, passed."""
+        if page < 1:
+            page = 1
+
+        url = self._url(_LIST_PRODUCTS_URL, page=page)
+
+        resp = self._request("list_products", "GET", url, deadline=deadline)
+
+        products = [self._product(product) for product in resp.json()]
+        _run_hooks(products)
+
+        return products
+
+    def search(self, key, index=None):
+        """See :func:`search`."""
+        if index is not None:
+            products = index.search(key)
+
+            if products:
+                return products
+
+        url_safe_key = key.replace(" ", "+")
+
+        url = self._url(_SEARCH_URL, key=url_safe_key)
+
+        resp = self._request("search", "GET", url)
+
+        products = [self._product(product) for product in resp.json()]
+        _run_hooks(products)
+
+        if index is not None:
+            index.update(products)
+
+        return products
+
+    def close(self):
+        """Stops the background refreshes and releases the connections held
+        by the transport."""
+        self._refresher.close()
+        self.transport.close()
+
+
+#: :class:`Client <Client>` used by the module-level functions.
+default_client = Client()
+
+
 def add_image(gtin14, img_path):
     """
     Adds an image to the product on the Datakick database and returns the url to
@@ -71,17 +567,7 @@ def add_image(gtin14, img_path):
     :return: url :class:`str <str>`
     :rtype: :class:`str <str>`
     """
-    _check_image_ext(img_path)
-    _check_image_size(img_path)
-
-    url = _ADD_IMAGE_URL.format(gtin14=gtin14)
-
-    files = {"image": open(img_path, "rb")}
-
-    resp = requests.post(url, files=files)
-    resp.raise_for_status()
-
-    return resp.json().get("image_url")
+    return default_client.add_image(gtin14, img_path)
 
 
 def add_product(gtin14, **kwargs):
@@ -116,12 +602,7 @@ def add_product(gtin14, **kwargs):
     :return: :class:`DatakickProduct <DatakickProduct>` object
     :rtype: datakick.models.DatakickProduct
     """
-    url = _ADD_PRODUCT_URL.format(gtin14=gtin14)
-
-    resp = requests.put(url, params=kwargs)
-    resp.raise_for_status()
-
-    return DatakickProduct(resp.json())
+    return default_client.add_product(gtin14, **kwargs)
 
 
 def find_product(gtin14):
@@ -135,12 +616,7 @@ def find_product(gtin14):
     :return: :class:`DatakickProduct <DatakickProduct>` object
     :rtype: datakick.models.DatakickProduct
     """
-    url = _FIND_PRODUCT_URL.format(gtin14=gtin14)
-
-    resp = requests.get(url)
-    resp.raise_for_status()
-
-    return DatakickProduct(resp.json())
+    return default_client.find_product(gtin14)
 
 
 def list_products(page=1):
@@ -153,32 +629,66 @@ def list_products(page=1):
         objects
     :rtype: :class:`list <list>`
     """
-    if page < 1:
-        page = 1
-    
-    url = _LIST_PRODUCTS_URL.format(page=page)
+    return default_client.list_products(page)
 
-    resp = requests.get(url)
-    resp.raise_for_status()
 
-    return [DatakickProduct(product) for product in resp.json()]
+def find_products(gtin14s, concurrency=8, ordered=True, deadline=None):
+    """
+    Finds many products concurrently and yields ``(gtin14, product)`` pairs
+    as the lookups complete. Barcodes are read lazily, so a file or stdin
+    can be streamed through.
+
+    If a lookup fails, i.e. the product isn't found, the exception is
+    yielded in place of the product. Once the deadline passes, the lookups
+    still running time out and the remaining barcodes are yielded with a
+    :exc:`DeadlineExceededError <datakick.exceptions.DeadlineExceededError>`
+    without being sent.
+
+    :param gtin14s: iterable of barcodes (ean/upc)
+    :param concurrency: number of lookups running at the same time
+    :param ordered: yield the products in the order of the barcodes instead
+        of as soon as they are found
+    :param deadline: optional :class:`Deadline <datakick.deadline.Deadline>`
+        or number of seconds all the lookups must be done in
+    :return: a generator of ``(gtin14, product)`` :class:`tuple <tuple>`
+    """
+    return default_client.find_products(
+        gtin14s, concurrency, ordered, deadline
+    )
 
 
-def search(key):
+def iter_products(start_page=1, end_page=None, deadline=None):
+    """
+    Lazily yields the products of every page from ``start_page`` until
+    ``end_page`` or the first empty page.
+
+    :param start_page: first page of products to retrieve
+    :type start_page: int
+    :param end_page: last page of products to retrieve or None for all pages
+    :type end_page: int
+    :param deadline: optional :class:`Deadline <datakick.deadline.Deadline>`
+        or number of seconds all the pages must be fetched in
+    :raises datakick.exceptions.DeadlineExceededError: once the deadline
+        passed, its ``page`` attribute is the first page not fetched
+    :return: a generator of :class:`DatakickProduct<DatakickProduct>` objects
+    """
+    return default_client.iter_products(start_page, end_page, deadline)
+
+
+def search(key, index=None):
     """
     Returns a list of all products in the Datakick database matching the
     supplied query.
 
+    If a local :class:`SearchIndex <datakick.index.SearchIndex>` is supplied,
+    the query is answered from it and the Datakick database is only queried
+    when the index has no matches. Products found remotely are added to the
+    index.
+
     :param key: the query to search for
+    :param index: optional :class:`SearchIndex <datakick.index.SearchIndex>`
     :return: a :class:`list <list>` of :class:`DatakickProduct<DatakickProduct>`
         objects
     :rtype: :class:`list <list>`
     """
-    url_safe_key = key.replace(" ", "+")
-
-    url = _SEARCH_URL.format(key=url_safe_key)
-
-    resp = requests.get(url)
-    resp.raise_for_status()
-
-    return [DatakickProduct(product) for product in resp.json()]
+    return default_client.search(key, index)
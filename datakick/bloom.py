@@ -0,0 +1,230 @@
+"""
+datakick.bloom
+--------------
+
+This module contains a Bloom filter of the gtin14s known to the Datakick
+database, letting :class:`datakick.api.Client` answer lookups of unknown
+barcodes locally instead of waiting for a 404.
+
+A Bloom filter never forgets a gtin14 it was given, so a gtin14 it doesn't
+contain is definitely unknown, while a gtin14 it contains is only known with
+a probability set by its false-positive rate.
+
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+
+_MAGIC = b"DKBLOOM1"
+# magic, number of bits, number of hash functions, number of gtin14s added
+_HEADER = struct.Struct("<8sQIQ")
+_HEADER_SIZE = 64
+_HASHES = struct.Struct("<QQ")
+
+
+def _key(gtin14):
+    """Returns the bytes hashed for a gtin14, padding upc and ean barcodes to
+    14 digits so that they match the gtin14s of the catalog."""
+    gtin14 = u"{}".format(gtin14).strip()
+
+    if gtin14.isdigit():
+        gtin14 = gtin14.zfill(14)
+
+    return gtin14.encode("utf-8")
+
+
+def _sizes(capacity, error_rate, max_bytes):
+    """Returns the number of bits and hash functions of a filter holding
+    ``capacity`` gtin14s."""
+    capacity = max(capacity, 1)
+    num_bits = -capacity * math.log(error_rate) / math.log(2) ** 2
+
+    if max_bytes is not None:
+        num_bits = min(num_bits, max_bytes * 8)
+
+    # whole bytes, so that the bits fill the file exactly
+    num_bits = max(int(math.ceil(num_bits / 8.0)) * 8, 8)
+    num_hashes = max(int(round(num_bits / float(capacity) * math.log(2))), 1)
+
+    return num_bits, num_hashes
+
+
+class BloomFilter(object):
+    """Bloom filter of gtin14s, stored in a bit array that can be saved to
+    disk and memory-mapped back.
+
+    Barcodes made of fewer than 14 digits, i.e. upc-a, are padded with zeros,
+    so ``"016000275287"`` and ``"00016000275287"`` are the same gtin14.
+    """
+
+    def __init__(self, capacity, error_rate=0.01, max_bytes=None):
+        """
+        :param capacity: number of gtin14s the filter is sized for
+        :param error_rate: probability that a gtin14 never added is reported
+            as known once ``capacity`` gtin14s were added
+        :param max_bytes: optional memory budget of the bit array, lowering
+            the number of bits, and so raising the error rate, if needed
+        """
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1.")
+
+        self.num_bits, self.num_hashes = _sizes(
+            capacity, error_rate, max_bytes
+        )
+        self.count = 0
+        self._bits = bytearray(self.num_bits // 8)
+        self._lock = threading.Lock()
+        self._map = None
+
+    @classmethod
+    def build(cls, gtin14s, error_rate=0.01, max_bytes=None):
+        """
+        Creates a filter sized for, and holding, the gtin14s supplied, i.e.
+        the products of a crawl read with
+        :func:`read_snapshot <datakick.crawler.read_snapshot>`.
+
+        :param gtin14s: iterable of gtin14s or of
+            :class:`DatakickProduct <datakick.models.DatakickProduct>` objects
+        :param error_rate: false-positive rate, see :class:`BloomFilter`
+        :param max_bytes: optional memory budget of the bit array
+        :return: :class:`BloomFilter <BloomFilter>` object
+        """
+        gtin14s = [getattr(item, "gtin14", item) for item in gtin14s]
+        bloom = cls(len(gtin14s), error_rate, max_bytes)
+        bloom.update(gtin14s)
+
+        return bloom
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, gtin14):
+        bits = self._bits
+
+        for position in self._positions(gtin14):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+
+        return True
+
+    def _positions(self, gtin14):
+        """Returns the bits of a gtin14, derived from a single digest by double
+        hashing."""
+        first, second = _HASHES.unpack(
+            hashlib.blake2b(_key(gtin14), digest_size=16).digest()
+        )
+        second |= 1
+
+        return [
+            (first + i * second) % self.num_bits
+            for i in range(self.num_hashes)
+        ]
+
+    def add(self, gtin14):
+        """Adds a gtin14, i.e. of a product just added to the database.
+
+        :param gtin14: barcode (ean/upc)
+        :return: None
+        """
+        positions = self._positions(gtin14)
+
+        with self._lock:
+            for position in positions:
+                self._bits[position >> 3] |= 1 << (position & 7)
+
+            self.count += 1
+
+    def update(self, gtin14s):
+        """Adds gtin14s.
+
+        :param gtin14s: iterable of gtin14s
+        :return: None
+        """
+        for gtin14 in gtin14s:
+            self.add(gtin14)
+
+    @property
+    def error_rate(self):
+        """False-positive rate expected for the number of gtin14s added so
+        far."""
+        filled = 1.0 - math.exp(
+            -self.num_hashes * self.count / float(self.num_bits)
+        )
+
+        return filled ** self.num_hashes
+
+    def save(self, path):
+        """Writes the filter to a file, replacing it atomically so that
+        processes mapping the previous version keep a consistent view.
+
+        :param path: path of the file
+        :return: None
+        """
+        header = _HEADER.pack(
+            _MAGIC, self.num_bits, self.num_hashes, self.count
+        )
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+
+        with open(tmp_path, "wb") as output:
+            output.write(header.ljust(_HEADER_SIZE, b"\0"))
+            output.write(self._bits)
+
+        os.rename(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, use_mmap=False):
+        """
+        Reads a filter written by :meth:`save`.
+
+        With ``use_mmap``, the bit array is mapped instead of read, so that
+        every process loading the same file shares the pages of a single
+        copy. Gtin14s added afterwards only change the pages of the process
+        adding them, until the filter is saved again.
+
+        :param path: path of the file
+        :param use_mmap: map the file instead of reading it
+        :return: :class:`BloomFilter <BloomFilter>` object
+        """
+        bloom = cls.__new__(cls)
+
+        with open(path, "rb") as source:
+            header = source.read(_HEADER_SIZE)
+
+            if len(header) < _HEADER.size:
+                raise ValueError("{} isn't a bloom filter.".format(path))
+
+            magic, num_bits, num_hashes, count = _HEADER.unpack_from(header)
+
+            if magic != _MAGIC:
+                raise ValueError("{} isn't a bloom filter.".format(path))
+
+            if use_mmap:
+                bloom._map = mmap.mmap(
+                    source.fileno(), 0, access=mmap.ACCESS_COPY
+                )
+                bits = memoryview(bloom._map)[_HEADER_SIZE:]
+            else:
+                bloom._map = None
+                bits = bytearray(source.read())
+
+        if len(bits) != num_bits // 8:
+            raise ValueError("{} is truncated.".format(path))
+
+        bloom.num_bits = num_bits
+        bloom.num_hashes = num_hashes
+        bloom.count = count
+        bloom._bits = bits
+        bloom._lock = threading.Lock()
+
+        return bloom
+
+    def close(self):
+        """Unmaps the file of a filter loaded with ``use_mmap``."""
+        if self._map is not None:
+            self._bits.release()
+            self._map.close()
+            self._map = None
@@ -0,0 +1,132 @@
+"""
+datakick.breaker
+----------------
+
+This module contains the circuit breaker :class:`datakick.api.Client` uses to
+stop calling the Datakick database while it is failing or too slow.
+
+"""
+
+import collections
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitBreaker(object):
+    """Circuit breaker driven by the error rate and latency of the last calls.
+
+    While closed, calls go through and their outcome is recorded in a sliding
+    window. Once the window holds at least ``min_calls`` calls and either the
+    share of failed calls reaches ``failure_rate`` or the share of calls
+    slower than ``slow_call_duration`` reaches ``slow_call_rate``, the breaker
+    opens and calls fail fast. After ``reset_timeout`` seconds it lets
+    ``half_open_calls`` probe calls through: once they all succeeded the
+    breaker closes again, while the first failed probe reopens it.
+    """
+
+    def __init__(self, failure_rate=0.5, slow_call_duration=5.0,
+                 slow_call_rate=0.8, window=20, min_calls=10,
+                 reset_timeout=30.0, half_open_calls=1):
+        """
+        :param failure_rate: share of failed calls opening the breaker
+        :param slow_call_duration: number of seconds making a call slow
+        :param slow_call_rate: share of slow calls opening the breaker
+        :param window: number of recent calls considered
+        :param min_calls: number of calls needed before opening
+        :param reset_timeout: number of seconds the breaker stays open
+        :param half_open_calls: number of probe calls while half-open
+        """
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+
+        self._calls = collections.deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """One of ``"closed"``, ``"open"`` or ``"half-open"``."""
+        with self._lock:
+            self._update()
+            return self._state
+
+    def _update(self):
+        """Moves from open to half-open once the reset timeout elapsed."""
+        if (self._state == OPEN and
+                time.time() - self._opened_at >= self.reset_timeout):
+            self._state = HALF_OPEN
+            self._probes = 0
+            self._successes = 0
+
+    def allow(self):
+        """Returns True if a call may go through. While half-open, each True
+        returned is a probe whose outcome must be recorded.
+
+        :rtype: :class:`bool <bool>`
+        """
+        with self._lock:
+            self._update()
+
+            if self._state == CLOSED:
+                return True
+
+            if self._state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+
+            return False
+
+    def record(self, success, duration=0.0):
+        """Records the outcome of a call let through by :meth:`allow`.
+
+        :param success: False if the call failed
+        :param duration: number of seconds the call took
+        :return: None
+        """
+        slow = duration >= self.slow_call_duration
+
+        with self._lock:
+            if self._state == HALF_OPEN:
+                if not success or slow:
+                    self._open()
+                    return
+
+                self._successes += 1
+
+                if self._successes >= self.half_open_calls:
+                    self._state = CLOSED
+                    self._calls.clear()
+                return
+
+            self._calls.append((not success, slow))
+
+            if self._state == CLOSED and self._should_open():
+                self._open()
+
+    def _should_open(self):
+        calls = len(self._calls)
+
+        if calls < self.min_calls:
+            return False
+
+        failures = sum(failed for failed, _ in self._calls)
+        slow = sum(slow for _, slow in self._calls)
+
+        return (float(failures) / calls >= self.failure_rate or
+                float(slow) / calls >= self.slow_call_rate)
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.time()
+        self._calls.clear()
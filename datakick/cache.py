@@ -0,0 +1,350 @@
+"""
+datakick.cache
+--------------
+
+This module contains the caches :class:`datakick.api.Client` can keep the
+products it finds in.
+
+Every cache maps a gtin14 to a ``(product, stored_at)`` pair, where
+``stored_at`` is the :func:`time.time` the product was stored at. Deciding
+whether an entry is still fresh is left to the client.
+
+"""
+
+import collections
+import contextlib
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from .models import DatakickProduct
+
+
+class Cache(object):
+    """Interface of the caches."""
+
+    def get(self, key):
+        """Returns the ``(product, stored_at)`` pair stored for the key or None.
+        """
+        raise NotImplementedError
+
+    def set(self, key, product, stored_at=None):
+        """Stores a product, ``stored_at`` defaults to now. Returns False if
+        the product couldn't be stored."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Removes the entry of the key, if any."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Removes every entry."""
+        raise NotImplementedError
+
+
+class MemoryCache(Cache):
+    """Least recently used cache local to the process."""
+
+    def __init__(self, max_size=10000):
+        """
+        :param max_size: number of products kept before the least recently
+            used ones are evicted
+        """
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+            return entry
+
+    def set(self, key, product, stored_at=None):
+        with self._lock:
+            self._entries[key] = (product, stored_at or time.time())
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_MAGIC = b"DKCACHE1"
+# magic, number of buckets, slots per bucket, slot size, lock stripes
+_HEADER = struct.Struct("<8sIIII")
+_HEADER_SIZE = 64
+# sequence number, key length, flags, value length, stored at
+_SLOT = struct.Struct("<IHHId")
+_SEQ = struct.Struct("<I")
+_KEY_SIZE = 32
+_VALUE_OFFSET = _SLOT.size + _KEY_SIZE
+_COMPRESSED = 1
+# values written by DatakickProduct.to_bytes rather than as JSON
+_BINARY = 2
+_READ_ATTEMPTS = 8
+
+
+class SharedMemoryCache(Cache):
+    """Cache shared by every process on a host, stored in a memory-mapped hash
+    table.
+
+    The file is split into buckets of a few fixed-size slots. Writers lock the
+    stripe of the bucket they write to, both with a thread lock and a
+    :func:`fcntl.lockf` byte-range lock, so writes from different processes
+    only contend when they hit the same stripe. Readers don't lock at all:
+    every slot carries a sequence number that is odd while the slot is being
+    written, and a read is retried when the number changed under it.
+
+    When a bucket is full, its oldest entry is evicted. Products too large for
+    a slot, even compressed, aren't cached.
+
+    Open a file once per process and share the instance between threads:
+    fcntl locks belong to the process, so a second instance opening or
+    closing the same file releases the locks the first one holds.
+    """
+
+    def __init__(self, path, num_buckets=16384, bucket_size=8,
+                 slot_size=2048, stripes=64):
+        """
+        Opens the cache stored at ``path``, creating it if it doesn't exist.
+        The other arguments only apply when the file is created; processes
+        opening an existing file use its layout. Put the file on a memory
+        backed file system, i.e. ``/dev/shm`` on Linux.
+
+        :param path: path of the memory-mapped file
+        :param num_buckets: number of buckets
+        :param bucket_size: number of slots per bucket
+        :param slot_size: size in bytes of a slot
+        :param stripes: number of write locks
+        """
+        import fcntl
+
+        self._fcntl = fcntl
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+
+        try:
+            if os.fstat(self._fd).st_size == 0:
+                self._create(num_buckets, bucket_size, slot_size, stripes)
+
+            # read through the locked descriptor, closing another one would
+            # release the locks of the process
+            fields = _HEADER.unpack(os.pread(self._fd, _HEADER.size, 0))
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+        magic, num_buckets, bucket_size, slot_size, stripes = fields
+
+        if magic != _MAGIC:
+            os.close(self._fd)
+            raise ValueError("{} isn't a datakick cache.".format(path))
+
+        self.num_buckets = num_buckets
+        self.bucket_size = bucket_size
+        self.slot_size = slot_size
+        self.stripes = stripes
+
+        self._map = mmap.mmap(self._fd, 0)
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def _create(self, num_buckets, bucket_size, slot_size, stripes):
+        """Writes the header and sizes a new file."""
+        if slot_size <= _VALUE_OFFSET:
+            raise ValueError(
+                "slot_size must be larger than {}.".format(_VALUE_OFFSET)
+            )
+
+        size = _HEADER_SIZE + num_buckets * bucket_size * slot_size
+        os.ftruncate(self._fd, size)
+        os.pwrite(
+            self._fd,
+            _HEADER.pack(_MAGIC, num_buckets, bucket_size, slot_size, stripes),
+            0
+        )
+
+    def _bucket(self, key):
+        """Returns the bucket of the key."""
+        return zlib.crc32(key) % self.num_buckets
+
+    def _offsets(self, bucket):
+        """Returns the offsets of the slots of a bucket."""
+        start = _HEADER_SIZE + bucket * self.bucket_size * self.slot_size
+        return [
+            start + slot * self.slot_size for slot in range(self.bucket_size)
+        ]
+
+    def _read(self, offset):
+        """Returns a consistent ``(key, flags, value, stored_at)`` copy of a
+        slot, None if it is empty or kept changing while being read."""
+        for _ in range(_READ_ATTEMPTS):
+            seq, key_len, flags, value_len, stored_at = _SLOT.unpack_from(
+                self._map, offset
+            )
+
+            if seq % 2:
+                continue
+
+            if not key_len:
+                return None
+
+            key_start = offset + _SLOT.size
+            value_start = offset + _VALUE_OFFSET
+            key = self._map[key_start:key_start + key_len]
+            value = self._map[value_start:value_start + value_len]
+
+            if _SEQ.unpack_from(self._map, offset)[0] == seq:
+                return key, flags, value, stored_at
+
+        return None
+
+    def _write(self, offset, key, flags, value, stored_at):
+        """Writes a slot, marking it as being written meanwhile."""
+        seq = _SEQ.unpack_from(self._map, offset)[0]
+        writing = (seq + 1) & 0xFFFFFFFF
+        _SEQ.pack_into(self._map, offset, writing)
+
+        key_start = offset + _SLOT.size
+        value_start = offset + _VALUE_OFFSET
+        self._map[key_start:key_start + len(key)] = key
+        self._map[value_start:value_start + len(value)] = value
+        _SLOT.pack_into(
+            self._map, offset, writing, len(key), flags, len(value), stored_at
+        )
+
+        _SEQ.pack_into(self._map, offset, (writing + 1) & 0xFFFFFFFF)
+
+    @contextlib.contextmanager
+    def _locked(self, bucket):
+        """Locks the stripe of a bucket against the other threads and
+        processes."""
+        stripe = bucket % self.stripes
+
+        with self._locks[stripe]:
+            self._fcntl.lockf(self._fd, self._fcntl.LOCK_EX, 1, stripe)
+
+            try:
+                yield
+            finally:
+                self._fcntl.lockf(self._fd, self._fcntl.LOCK_UN, 1, stripe)
+
+    def _encode_key(self, key):
+        key = key.encode("utf-8")
+
+        if len(key) > _KEY_SIZE:
+            raise ValueError(
+                "Keys must be at most {} bytes long.".format(_KEY_SIZE)
+            )
+
+        return key
+
+    def _encode(self, product):
+        """Serializes a product, returning its flags and bytes."""
+        return _BINARY, product.to_bytes()
+
+    def _decode(self, flags, value):
+        """Deserializes the bytes written by :meth:`_encode`."""
+        if flags & _COMPRESSED:
+            value = zlib.decompress(value)
+
+        return DatakickProduct.from_bytes(value)
+
+    def get(self, key):
+        key = self._encode_key(key)
+
+        for offset in self._offsets(self._bucket(key)):
+            slot = self._read(offset)
+
+            if slot is not None and slot[0] == key:
+                _, flags, value, stored_at = slot
+                return self._decode(flags, value), stored_at
+
+        return None
+
+    def set(self, key, product, stored_at=None):
+        key = self._encode_key(key)
+        flags, value = self._encode(product)
+
+        if len(value) > self.slot_size - _VALUE_OFFSET:
+            value = zlib.compress(value)
+            flags |= _COMPRESSED
+
+        if len(value) > self.slot_size - _VALUE_OFFSET:
+            return False
+
+        bucket = self._bucket(key)
+
+        with self._locked(bucket):
+            offset = self._victim(bucket, key)
+            self._write(offset, key, flags, value, stored_at or time.time())
+
+        return True
+
+    def _victim(self, bucket, key):
+        """Returns the slot of the bucket to write the key to: its current
+        slot, else an empty slot, else the oldest slot. Called with the
+        stripe locked."""
+        empty = oldest = None
+
+        # the key may sit past a slot freed by a deletion, so the whole bucket
+        # is scanned before settling for another slot
+        for offset in self._offsets(bucket):
+            _, key_len, _, _, stored_at = _SLOT.unpack_from(self._map, offset)
+
+            if not key_len:
+                if empty is None:
+                    empty = offset
+                continue
+
+            key_start = offset + _SLOT.size
+
+            if self._map[key_start:key_start + key_len] == key:
+                return offset
+
+            if oldest is None or stored_at < oldest[0]:
+                oldest = (stored_at, offset)
+
+        return empty if empty is not None else oldest[1]
+
+    def delete(self, key):
+        key = self._encode_key(key)
+        bucket = self._bucket(key)
+
+        with self._locked(bucket):
+            for offset in self._offsets(bucket):
+                slot = self._read(offset)
+
+                if slot is not None and slot[0] == key:
+                    self._write(offset, b"", 0, b"", 0.0)
+
+    def clear(self):
+        for bucket in range(self.num_buckets):
+            with self._locked(bucket):
+                for offset in self._offsets(bucket):
+                    if _SLOT.unpack_from(self._map, offset)[1]:
+                        self._write(offset, b"", 0, b"", 0.0)
+
+    def close(self):
+        """Unmaps the file. Entries stay in it for the other processes."""
+        self._map.close()
+        os.close(self._fd)
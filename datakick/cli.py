@@ -0,0 +1,410 @@
+"""
+datakick.cli
+------------
+
+This module contains the ``datakick`` command line tool.
+
+"""
+
+import argparse
+import functools
+import io
+import json
+import sys
+import time
+
+from . import export as _export
+
+
+class _Progress(object):
+    """Periodically writes the number of items processed and the throughput
+    to a stream, usually stderr."""
+
+    def __init__(self, stream, enabled=True, interval=1.0):
+        self.count = 0
+        self.errors = 0
+        self._stream = stream
+        self._enabled = enabled
+        self._interval = interval
+        self._start = self._last = time.time()
+
+    def update(self, error=False):
+        """Records one processed item and refreshes the readout if it is
+        due."""
+        self.count += 1
+        self.errors += bool(error)
+
+        now = time.time()
+
+        if self._enabled and now - self._last >= self._interval:
+            self._last = now
+            self._write(now, "\r")
+
+    def finish(self):
+        """Writes the final readout."""
+        if self._enabled:
+            self._write(time.time(), "\r")
+            self._stream.write("\n")
+
+    def _write(self, now, prefix):
+        elapsed = max(now - self._start, 1e-9)
+        self._stream.write(
+            "{}{} done, {} errors, {:.1f}/s".format(
+                prefix, self.count, self.errors, self.count / elapsed
+            )
+        )
+        self._stream.flush()
+
+
+def _read_lines(paths):
+    """Lazily yields the stripped, non-empty lines of the files, reading
+    stdin if there are none or the path is ``-``."""
+    for path in paths or ["-"]:
+        if path == "-":
+            lines = sys.stdin
+        else:
+            lines = io.open(path, encoding="utf-8")
+
+        try:
+            for line in lines:
+                line = line.strip()
+
+                if line:
+                    yield line
+        finally:
+            if lines is not sys.stdin:
+                lines.close()
+
+
+def _write(output, dct):
+    """Writes a dictionary as one line of NDJSON."""
+    output.write(json.dumps(dct, sort_keys=True) + "\n")
+
+
+def _error(error, **kwargs):
+    """Returns the NDJSON record of a failed item."""
+    kwargs["error"] = "{}: {}".format(type(error).__name__, error)
+    return kwargs
+
+
+def _open_output(args):
+    """Returns the stream results are written to."""
+    if args.output in (None, "-"):
+        return sys.stdout
+
+    return io.open(args.output, "w", encoding="utf-8")
+
+
+def _close_output(output):
+    """Flushes the results and closes them unless written to stdout."""
+    if output is sys.stdout:
+        output.flush()
+    else:
+        output.close()
+
+
+def _pooled_client(pool_size, **kwargs):
+    """Returns a :class:`Client <datakick.api.Client>` reusing up to
+    ``pool_size`` connections, one per concurrent request."""
+    import requests
+
+    from .api import Client
+    from .transport import RequestsTransport
+
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return Client(RequestsTransport(session), **kwargs)
+
+
+def _lookup(args):
+    """Finds the products of every barcode read from the input."""
+    client = _pooled_client(args.concurrency)
+    output = _open_output(args)
+    progress = _Progress(sys.stderr, args.progress)
+
+    try:
+        results = client.find_products(
+            _read_lines(args.input), args.concurrency, args.ordered,
+            args.deadline
+        )
+
+        for gtin14, product in results:
+            if isinstance(product, Exception):
+                _write(output, _error(product, gtin14=gtin14))
+                progress.update(error=True)
+            else:
+                _write(output, product.as_dict())
+                progress.update()
+    finally:
+        client.close()
+
+    progress.finish()
+    _close_output(output)
+
+    return 1 if progress.errors and args.strict else 0
+
+
+def _search(args):
+    """Writes the products matching the query."""
+    client = _pooled_client(1)
+    output = _open_output(args)
+
+    try:
+        for product in client.search(args.key):
+            _write(output, product.as_dict())
+    finally:
+        client.close()
+
+    _close_output(output)
+
+    return 0
+
+
+def _crawl(args):
+    """Crawls the whole catalog and optionally merges the partitions."""
+    from .crawler import crawl, merge, unfinished_pages
+
+    crawl(
+        args.output_dir, workers=args.workers, chunk_size=args.chunk_size,
+        rate=args.rate, start_page=args.start_page, max_page=args.max_page,
+        deadline=args.deadline
+    )
+
+    for first, stop in unfinished_pages(args.output_dir):
+        sys.stderr.write("Unfinished pages {} to {}.\n".format(
+            first, stop - 1 if stop else "the end"
+        ))
+
+    if args.merge:
+        count = merge(args.output_dir, args.merge)
+        sys.stderr.write("Merged {} products.\n".format(count))
+
+    return 0
+
+
+def _upload(line, client=None):
+    """Uploads the image of a ``GTIN14 PATH`` line, through the client if
+    any."""
+    from . import api
+
+    add_image = client.add_image if client is not None else api.add_image
+    gtin14, path = line.split(None, 1)
+
+    return add_image(gtin14, path)
+
+
+def _upload_images(args):
+    """Uploads the images of every ``GTIN14 PATH`` line read from the
+    input."""
+    from .parallel import imap
+
+    upload = _upload
+    client = None
+
+    if args.manifest:
+        from .api import Client
+        from .images import ImageManifest
+
+        client = Client(image_manifest=ImageManifest(args.manifest))
+        upload = functools.partial(_upload, client=client)
+
+    output = _open_output(args)
+    progress = _Progress(sys.stderr, args.progress)
+
+    try:
+        results = imap(
+            upload, _read_lines(args.input), args.concurrency, args.ordered
+        )
+
+        for line, result in results:
+            fields = line.split(None, 1)
+            record = dict(zip(("gtin14", "path"), fields))
+
+            if isinstance(result, Exception):
+                _write(output, _error(result, **record))
+                progress.update(error=True)
+            else:
+                record["image_url"] = result
+                _write(output, record)
+                progress.update()
+    finally:
+        if client is not None:
+            client.close()
+
+    progress.finish()
+    _close_output(output)
+
+    return 1 if progress.errors and args.strict else 0
+
+
+def _serve(args):
+    """Runs the caching proxy until interrupted."""
+    from .cache import MemoryCache, SharedMemoryCache
+    from .server import ProxyServer
+
+    if args.cache:
+        cache = SharedMemoryCache(args.cache)
+    else:
+        cache = MemoryCache(args.cache_size)
+
+    client = _pooled_client(
+        args.concurrency, cache=cache, ttl=args.ttl, stale_ttl=args.stale_ttl
+    )
+    server = ProxyServer(
+        (args.host, args.port), client, concurrency=args.concurrency,
+        access_log=args.access_log
+    )
+    sys.stderr.write("Serving on {}\n".format(server.url))
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+    return 0
+
+
+def _add_output_argument(parser):
+    """Adds the argument of the commands writing NDJSON."""
+    parser.add_argument(
+        "-o", "--output", help="file to write NDJSON to (default: stdout)"
+    )
+
+
+def _add_batch_arguments(parser):
+    """Adds the arguments shared by the commands reading from stdin."""
+    _add_output_argument(parser)
+    parser.add_argument(
+        "input", nargs="*",
+        help="files to read, one item per line (default: stdin)"
+    )
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=8,
+        help="number of requests running at the same time (default: 8)"
+    )
+    parser.add_argument(
+        "--ordered", action="store_true",
+        help="write results in input order instead of as they complete"
+    )
+    parser.add_argument(
+        "--strict", action="store_true",
+        help="exit with status 1 if any item failed"
+    )
+    parser.add_argument(
+        "--progress", dest="progress", action="store_true",
+        default=sys.stderr.isatty(),
+        help="write progress and throughput to stderr (default: on a tty)"
+    )
+    parser.add_argument(
+        "--no-progress", dest="progress", action="store_false"
+    )
+
+
+def _add_deadline_argument(parser):
+    """Adds the deadline argument of the commands sending many requests."""
+    parser.add_argument(
+        "--deadline", type=float, metavar="SECONDS",
+        help="give up on the requests not done within SECONDS"
+    )
+
+
+def build_parser():
+    """Returns the :class:`argparse.ArgumentParser` of the ``datakick``
+    command."""
+    parser = argparse.ArgumentParser(
+        prog="datakick",
+        description="Command line tool for the Datakick product database."
+    )
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    lookup = commands.add_parser(
+        "lookup", help="find the products of barcodes read from stdin"
+    )
+    _add_batch_arguments(lookup)
+    _add_deadline_argument(lookup)
+    lookup.set_defaults(func=_lookup)
+
+    search = commands.add_parser("search", help="search for products")
+    search.add_argument("key", help="the query to search for")
+    _add_output_argument(search)
+    search.set_defaults(func=_search)
+
+    crawl = commands.add_parser("crawl", help="download the whole catalog")
+    crawl.add_argument("output_dir", help="directory of the partition files")
+    crawl.add_argument("-w", "--workers", type=int, default=4)
+    crawl.add_argument("--chunk-size", type=int, default=10)
+    crawl.add_argument(
+        "--rate", type=float, help="maximum number of requests per second"
+    )
+    crawl.add_argument("--start-page", type=int, default=1)
+    crawl.add_argument("--max-page", type=int)
+    crawl.add_argument(
+        "--merge", metavar="PATH", help="merge the partitions into PATH"
+    )
+    _add_deadline_argument(crawl)
+    crawl.set_defaults(func=_crawl)
+
+    upload = commands.add_parser(
+        "upload-images",
+        help="upload images from 'GTIN14 PATH' lines read from stdin"
+    )
+    _add_batch_arguments(upload)
+    upload.add_argument(
+        "--manifest", metavar="PATH",
+        help="skip images already uploaded, recording them in PATH"
+    )
+    upload.set_defaults(func=_upload_images)
+
+    serve = commands.add_parser(
+        "serve", help="run a caching proxy of the Datakick API"
+    )
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("-p", "--port", type=int, default=8080)
+    serve.add_argument(
+        "-c", "--concurrency", type=int, default=16,
+        help="number of upstream connections and of requests a batch sends "
+             "at the same time (default: 16)"
+    )
+    serve.add_argument(
+        "--cache", metavar="PATH",
+        help="memory-mapped cache file shared with other processes "
+             "(default: in-process cache)"
+    )
+    serve.add_argument(
+        "--cache-size", type=int, default=10000,
+        help="number of products kept by the in-process cache"
+    )
+    serve.add_argument(
+        "--ttl", type=float, default=86400,
+        help="seconds a cached product is fresh for (default: 86400)"
+    )
+    serve.add_argument(
+        "--stale-ttl", type=float, default=0,
+        help="seconds past the ttl a product is served while refetched"
+    )
+    serve.add_argument(
+        "--access-log", action="store_true",
+        help="write a line per request to stderr"
+    )
+    serve.set_defaults(func=_serve)
+
+    export = commands.add_parser(
+        "export", help="export products to NDJSON, CSV or Parquet"
+    )
+    _export.configure_parser(export)
+
+    return parser
+
+
+def main(argv=None):
+    """Entry point of the ``datakick`` command."""
+    args = build_parser().parse_args(argv)
+
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return 130
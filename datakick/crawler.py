@@ -0,0 +1,384 @@
+"""
+datakick.crawler
+----------------
+
+This module contains a multi-process crawler that downloads the whole Datakick
+catalog by sharding the page space across worker processes.
+
+"""
+
+import glob
+import io
+import json
+import multiprocessing
+import os
+import time
+
+from .api import Client
+from .deadline import Deadline, as_deadline
+from .exceptions import CrawlError, DeadlineExceededError
+from .models import DatakickProduct
+from .transport import RequestsTransport
+
+_PARTITION_NAME = "part-{worker:05d}.ndjson"
+_PARTITION_GLOB = "part-*.ndjson"
+_UNFINISHED_NAME = "unfinished-{worker:05d}.json"
+_UNFINISHED_GLOB = "unfinished-*.json"
+_UNFINISHED = "unfinished.json"
+
+
+class _RateLimiter(object):
+    """Spaces requests evenly across every process sharing the limiter."""
+
+    def __init__(self, rate=None):
+        self._interval = 1.0 / rate if rate else 0.0
+        self._next_slot = multiprocessing.Value("d", 0.0)
+
+    def wait(self):
+        """Blocks until the caller is allowed to make its next request."""
+        if not self._interval:
+            return
+
+        with self._next_slot.get_lock():
+            now = time.time()
+            slot = max(now, self._next_slot.value)
+            self._next_slot.value = slot + self._interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class _PageClaims(object):
+    """Hands out unclaimed page ranges to the workers and records where the
+    catalog ends."""
+
+    def __init__(self, start_page=1, chunk_size=10, max_page=None):
+        self._chunk_size = chunk_size
+        self._next_page = multiprocessing.Value("l", max(start_page, 1))
+        # 0 means the end of the catalog hasn't been found yet
+        self._end_page = multiprocessing.Value(
+            "l", max_page + 1 if max_page else 0
+        )
+
+    def claim(self):
+        """Returns the next ``(first, stop)`` range of pages to fetch or None
+        when there are no pages left."""
+        with self._next_page.get_lock():
+            first = self._next_page.value
+            end = self._end_page.value
+
+            if end and first >= end:
+                return None
+
+            stop = first + self._chunk_size
+
+            if end:
+                stop = min(stop, end)
+
+            self._next_page.value = stop
+
+        return first, stop
+
+    def mark_end(self, page):
+        """Records that ``page`` is past the last page of the catalog."""
+        with self._end_page.get_lock():
+            if not self._end_page.value or page < self._end_page.value:
+                self._end_page.value = page
+
+    def end(self):
+        """Returns the page past the end of the catalog or None if it isn't
+        known yet."""
+        return self._end_page.value or None
+
+    def unclaimed(self):
+        """Returns the ``(first, stop)`` range of pages nobody claimed, stop
+        being None if the end of the catalog isn't known, or None when every
+        page was claimed."""
+        first = self._next_page.value
+        end = self.end()
+
+        if end and first >= end:
+            return None
+
+        return first, end
+
+    def is_past_end(self, page):
+        """Returns True if ``page`` is known to be past the end of the
+        catalog."""
+        end = self._end_page.value
+        return bool(end) and page >= end
+
+
+def _fetch_page(client, page, retries, deadline=None):
+    """Fetches a page of products, retrying with a backoff on errors."""
+    import requests
+
+    for attempt in range(retries + 1):
+        try:
+            return client.list_products(page, deadline)
+        except requests.RequestException:
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceededError("The deadline passed.")
+            if attempt == retries:
+                raise
+
+            backoff = 2 ** attempt
+
+            if deadline is not None:
+                backoff = min(backoff, deadline.remaining())
+
+            time.sleep(backoff)
+
+
+def _pooled_transport():
+    """Returns the default transport of a worker, reusing its connections."""
+    import requests
+
+    return RequestsTransport(requests.Session())
+
+
+def _crawl_worker(worker_id, output_dir, claims, limiter, retries,
+                  transport=None, expires_at=None):
+    """Claims page ranges until the catalog is exhausted, or the deadline
+    passed, and writes every product found to the worker's own partition
+    file. Pages left unfinished are written to the worker's own file."""
+    path = os.path.join(output_dir, _PARTITION_NAME.format(worker=worker_id))
+    client = Client((transport or _pooled_transport)())
+    deadline = Deadline.at(expires_at) if expires_at is not None else None
+    unfinished = None
+
+    with io.open(path, "w", encoding="utf-8") as output:
+        while unfinished is None:
+            if deadline is not None and deadline.expired:
+                break
+
+            claim = claims.claim()
+
+            if claim is None:
+                break
+
+            for page in range(*claim):
+                if claims.is_past_end(page):
+                    break
+
+                limiter.wait()
+
+                try:
+                    products = _fetch_page(client, page, retries, deadline)
+                except DeadlineExceededError:
+                    unfinished = [page, claim[1]]
+                    break
+
+                if not products:
+                    claims.mark_end(page)
+                    break
+
+                for product in products:
+                    output.write(_dumps(product.as_dict()))
+
+    if unfinished is not None:
+        name = _UNFINISHED_NAME.format(worker=worker_id)
+
+        with open(os.path.join(output_dir, name), "w") as output:
+            json.dump(unfinished, output)
+
+    client.close()
+
+
+def _collect_unfinished(output_dir, claims):
+    """Gathers the pages the workers left unfinished and the pages nobody
+    claimed into a single file, returning the ranges."""
+    end = claims.end()
+    ranges = []
+
+    for path in glob.glob(os.path.join(output_dir, _UNFINISHED_GLOB)):
+        with open(path) as lines:
+            first, stop = json.load(lines)
+
+        os.remove(path)
+
+        if end:
+            stop = min(stop, end)
+
+        if first < stop:
+            ranges.append([first, stop])
+
+    unclaimed = claims.unclaimed()
+
+    if unclaimed is not None:
+        ranges.append(list(unclaimed))
+
+    ranges.sort()
+
+    if ranges:
+        with open(os.path.join(output_dir, _UNFINISHED), "w") as output:
+            json.dump(ranges, output)
+
+    return ranges
+
+
+def _clear(output_dir):
+    """Removes the partition and unfinished files of a previous crawl, which
+    a crawl with fewer workers wouldn't overwrite."""
+    for pattern in (_PARTITION_GLOB, _UNFINISHED_GLOB, _UNFINISHED):
+        for path in glob.glob(os.path.join(output_dir, pattern)):
+            os.remove(path)
+
+
+def _dumps(dct):
+    """Serializes a product dictionary as one line of NDJSON."""
+    line = json.dumps(dct, sort_keys=True, ensure_ascii=False)
+
+    if not isinstance(line, type(u"")):
+        line = line.decode("utf-8")
+
+    return line + u"\n"
+
+
+def crawl(output_dir, workers=4, chunk_size=10, rate=None, start_page=1,
+          max_page=None, retries=3, transport=None, deadline=None):
+    """
+    Downloads every page of products using several worker processes and
+    writes them to partition files in ``output_dir``.
+
+    Workers claim ranges of ``chunk_size`` pages from a shared counter, so a
+    fast worker simply claims more ranges than a slow one. The first empty
+    page marks the end of the catalog and stops every worker.
+
+    The partition and unfinished files of a previous crawl to ``output_dir``
+    are removed first.
+
+    Once the deadline passes, the workers stop and the partition files hold
+    the pages crawled so far; the ranges of pages left unfinished are
+    returned by :func:`unfinished_pages`.
+
+    :param output_dir: directory the partition files are written to
+    :param workers: number of worker processes
+    :param chunk_size: number of pages claimed by a worker at a time
+    :param rate: maximum number of requests per second shared by all the
+        workers or None for no limit
+    :param start_page: first page to fetch
+    :param max_page: last page to fetch or None to crawl until the end
+    :param retries: number of times a failed page is retried
+    :param transport: :class:`Transport <datakick.transport.Transport>` class
+        or factory called by each worker to create the transport of its own
+        :class:`Client <datakick.api.Client>`, i.e.
+        :class:`Urllib3Transport <datakick.transport.Urllib3Transport>`; a
+        :class:`RequestsTransport <datakick.transport.RequestsTransport>`
+        with its own :class:`requests.Session` is used if None
+    :param deadline: optional :class:`Deadline <datakick.deadline.Deadline>`
+        or number of seconds the crawl must be done in
+    :raises datakick.exceptions.CrawlError: if a worker fails
+    :return: a :class:`list <list>` of the partition file paths
+    :rtype: :class:`list <list>`
+    """
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    _clear(output_dir)
+
+    deadline = as_deadline(deadline)
+    expires_at = deadline.expires_at if deadline is not None else None
+    claims = _PageClaims(start_page, chunk_size, max_page)
+    limiter = _RateLimiter(rate)
+
+    processes = [
+        multiprocessing.Process(
+            target=_crawl_worker,
+            args=(
+                worker_id, output_dir, claims, limiter, retries, transport,
+                expires_at
+            )
+        )
+        for worker_id in range(workers)
+    ]
+
+    for process in processes:
+        process.start()
+
+    for process in processes:
+        process.join()
+
+    failed = [process for process in processes if process.exitcode != 0]
+
+    if failed:
+        raise CrawlError(
+            "{} of {} crawler workers failed.".format(len(failed), workers)
+        )
+
+    if deadline is not None:
+        _collect_unfinished(output_dir, claims)
+
+    return partitions(output_dir)
+
+
+def unfinished_pages(output_dir):
+    """
+    Returns the ranges of pages a :func:`crawl` to ``output_dir`` left
+    unfinished because its deadline passed.
+
+    :param output_dir: directory the partition files were written to
+    :return: a sorted :class:`list <list>` of ``[first, stop]`` ranges, stop
+        being excluded or None if the end of the catalog wasn't reached
+    :rtype: :class:`list <list>`
+    """
+    path = os.path.join(output_dir, _UNFINISHED)
+
+    if not os.path.exists(path):
+        return []
+
+    with open(path) as lines:
+        return json.load(lines)
+
+
+def partitions(output_dir):
+    """
+    Returns the partition files written by :func:`crawl` to ``output_dir``.
+
+    :param output_dir: directory the partition files were written to
+    :return: a sorted :class:`list <list>` of paths
+    :rtype: :class:`list <list>`
+    """
+    return sorted(glob.glob(os.path.join(output_dir, _PARTITION_GLOB)))
+
+
+def merge(output_dir, path):
+    """
+    Merges the partition files in ``output_dir`` into a single NDJSON
+    snapshot, dropping products that were seen more than once.
+
+    :param output_dir: directory the partition files were written to
+    :param path: path of the merged snapshot
+    :return: number of products written
+    :rtype: :class:`int <int>`
+    """
+    seen = set()
+    count = 0
+
+    with io.open(path, "w", encoding="utf-8") as output:
+        for partition in partitions(output_dir):
+            with io.open(partition, encoding="utf-8") as lines:
+                for line in lines:
+                    gtin14 = json.loads(line).get("gtin14")
+
+                    if gtin14 in seen:
+                        continue
+
+                    seen.add(gtin14)
+                    output.write(line)
+                    count += 1
+
+    return count
+
+
+def read_snapshot(path):
+    """
+    Lazily reads the products of an NDJSON snapshot written by :func:`merge`.
+
+    :param path: path of the snapshot
+    :return: a generator of :class:`DatakickProduct <DatakickProduct>` objects
+    """
+    with io.open(path, encoding="utf-8") as lines:
+        for line in lines:
+            if line.strip():
+                yield DatakickProduct.from_dict(json.loads(line))
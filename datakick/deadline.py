@@ -0,0 +1,89 @@
+"""
+datakick.deadline
+-----------------
+
+This module contains the deadline batch operations share between their
+requests, so that a whole batch finishes within a time budget.
+
+"""
+
+import time
+
+from .exceptions import DeadlineExceededError
+
+
+class Deadline(object):
+    """Point in time by which an operation and all of its requests must be
+    done.
+
+    Each request gets its timeouts cut down to the time remaining, and no
+    request is sent once the deadline has passed.
+    """
+
+    def __init__(self, seconds):
+        """
+        :param seconds: number of seconds from now until the deadline
+        """
+        self.expires_at = time.time() + seconds
+
+    @classmethod
+    def at(cls, expires_at):
+        """Creates a :class:`Deadline <Deadline>` expiring at a
+        :func:`time.time` timestamp, i.e. one shared with another process.
+
+        :param expires_at: timestamp of the deadline
+        :return: :class:`Deadline <Deadline>` object
+        """
+        deadline = cls(0)
+        deadline.expires_at = expires_at
+
+        return deadline
+
+    def remaining(self):
+        """Returns the number of seconds left, 0 once the deadline passed.
+
+        :rtype: :class:`float <float>`
+        """
+        return max(self.expires_at - time.time(), 0.0)
+
+    @property
+    def expired(self):
+        """True once the deadline passed."""
+        return time.time() >= self.expires_at
+
+    def timeout(self, timeout=None):
+        """Returns the timeout of a request, cut down to the time remaining.
+
+        :param timeout: number of seconds, ``(connect, read)``
+            :class:`tuple <tuple>` or None for no timeout
+        :raises datakick.exceptions.DeadlineExceededError: if the deadline
+            passed
+        :return: ``(connect, read)`` :class:`tuple <tuple>`
+        """
+        remaining = self.remaining()
+
+        if not remaining:
+            raise DeadlineExceededError("The deadline passed.")
+
+        if timeout is None:
+            return remaining, remaining
+
+        if not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+
+        return tuple(
+            remaining if part is None else min(part, remaining)
+            for part in timeout
+        )
+
+
+def as_deadline(deadline):
+    """Returns a :class:`Deadline <Deadline>` from a number of seconds, or
+    the deadline itself. None is returned unchanged.
+
+    :param deadline: :class:`Deadline <Deadline>`, number of seconds or None
+    """
+    if deadline is None or isinstance(deadline, Deadline):
+        return deadline
+
+    return Deadline(deadline)
@@ -0,0 +1,300 @@
+"""
+datakick.encoding
+-----------------
+
+This module contains the compact binary encoding of products used by
+:meth:`DatakickProduct.to_bytes <datakick.models.DatakickProduct.to_bytes>`.
+
+An encoded product starts with a version byte and a flags byte, followed by
+one entry per attribute. Each entry starts with a single byte holding the id
+of the attribute in :data:`FIELDS` (5 bits) and the type of its value
+(3 bits):
+
+* integers fitting in 32 bits are stored as 4 bytes, other numbers as
+  8 byte doubles,
+* strings are stored as their UTF-8 length, as a varint, and bytes,
+* ``None``, ``True`` and ``False`` are stored in the type alone,
+* image urls are stored as a count followed, for each url, by the length of
+  the prefix it shares with the previous url and the rest of the url,
+* any other value is stored as a JSON string.
+
+Attributes missing from :data:`FIELDS` use the id 31 and store their name as
+a string between the entry byte and the value.
+
+"""
+
+import json
+import struct
+
+#: Attributes with their own id, by id. New attributes must be appended so
+#: that products encoded before can still be decoded.
+FIELDS = (
+    "alcohol_by_volume",
+    "author",
+    "brand_name",
+    "calories",
+    "carbohydrate",
+    "cholesterol",
+    "fat",
+    "fat_calories",
+    "fiber",
+    "gtin14",
+    "images",
+    "ingredients",
+    "monounsaturated_fat",
+    "name",
+    "pages",
+    "polyunsaturated_fat",
+    "potassium",
+    "protein",
+    "publisher",
+    "saturated_fat",
+    "serving_size",
+    "servings_per_container",
+    "size",
+    "sodium",
+    "sugars",
+    "trans_fat",
+)
+
+VERSION = 1
+
+#: Set in the flags byte when the product is marked as stale.
+STALE = 1
+
+_IDS = dict((name, field_id) for field_id, name in enumerate(FIELDS))
+_EXTRA = 31
+_IMAGES = _IDS["images"]
+
+_NULL = 0
+_FALSE = 1
+_TRUE = 2
+_INT = 3
+_FLOAT = 4
+_STRING = 5
+_URLS = 6
+_JSON = 7
+
+# entry byte of each type of each attribute
+_TAGS = [
+    [bytes((field_id << 3 | kind,)) for kind in range(8)]
+    for field_id in range(_EXTRA + 1)
+]
+
+_HEADER = struct.Struct("<BB")
+_INT32 = struct.Struct("<i")
+_FLOAT64 = struct.Struct("<d")
+_INT_MIN = -2 ** 31
+_INT_MAX = 2 ** 31 - 1
+
+
+def _varint(value):
+    """Returns the LEB128 encoding of a non-negative integer."""
+    if value < 0x80:
+        return bytes((value,))
+
+    out = bytearray()
+
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+
+    out.append(value)
+
+    return bytes(out)
+
+
+def _read_varint(data, offset):
+    """Returns the integer encoded at the offset and the offset after it."""
+    byte = data[offset]
+
+    if byte < 0x80:
+        return byte, offset + 1
+
+    value = 0
+    shift = 0
+
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+
+        if byte < 0x80:
+            return value, offset
+
+        shift += 7
+
+
+def _string(value):
+    """Returns the length prefixed UTF-8 encoding of a string."""
+    value = value.encode("utf-8")
+    return _varint(len(value)) + value
+
+
+def _shared_prefix(first, second):
+    """Returns the length of the prefix two byte strings share, comparing
+    slices by bisection rather than byte by byte."""
+    low = 0
+    high = min(len(first), len(second))
+
+    while low < high:
+        middle = (low + high + 1) // 2
+
+        if first[low:middle] == second[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+
+    return low
+
+
+def _urls(urls):
+    """Encodes a list of urls, each one as the length of the prefix it
+    shares with the previous one and its remaining bytes."""
+    out = [_varint(len(urls))]
+    previous = b""
+
+    for url in urls:
+        url = url.encode("utf-8")
+        shared = _shared_prefix(previous, url)
+
+        out.append(_varint(shared))
+        out.append(_varint(len(url) - shared))
+        out.append(url[shared:])
+        previous = url
+
+    return b"".join(out)
+
+
+def encode(response, flags=0):
+    """
+    Encodes the attributes of a product.
+
+    :param response: :class:`dict <dict>` of the attributes, with the images
+        as a list of urls
+    :param flags: flags byte, i.e. :data:`STALE`
+    :return: the encoded product
+    :rtype: :class:`bytes <bytes>`
+    """
+    out = [_HEADER.pack(VERSION, flags)]
+    append = out.append
+
+    for name, value in response.items():
+        field_id = _IDS.get(name, _EXTRA)
+        tags = _TAGS[field_id]
+        kind = type(value)
+
+        if kind is str:
+            value = value.encode("utf-8")
+            length = len(value)
+            tag = tags[_STRING]
+            payload = (
+                bytes((length,)) if length < 0x80 else _varint(length)
+            ) + value
+        elif value is None:
+            tag, payload = tags[_NULL], b""
+        elif kind is int and _INT_MIN <= value <= _INT_MAX:
+            tag, payload = tags[_INT], _INT32.pack(value)
+        elif kind is float or kind is int:
+            tag, payload = tags[_FLOAT], _FLOAT64.pack(value)
+        elif kind is bool:
+            tag, payload = tags[_TRUE if value else _FALSE], b""
+        elif field_id == _IMAGES and kind is list and all(
+            type(url) is str for url in value
+        ):
+            tag, payload = tags[_URLS], _urls(value)
+        else:
+            tag = tags[_JSON]
+            payload = _string(json.dumps(value, separators=(",", ":")))
+
+        append(tag)
+
+        if field_id == _EXTRA:
+            append(_string(name))
+
+        append(payload)
+
+    return b"".join(out)
+
+
+def decode(data):
+    """
+    Decodes a product encoded by :func:`encode`.
+
+    :param data: the encoded product
+    :raises ValueError: if the data was encoded by another version
+    :return: the attributes and the flags
+    :rtype: :class:`tuple <tuple>`
+    """
+    version, flags = _HEADER.unpack_from(data, 0)
+
+    if version != VERSION:
+        raise ValueError(
+            "Unsupported product encoding version {}.".format(version)
+        )
+
+    response = {}
+    offset = _HEADER.size
+    size = len(data)
+
+    while offset < size:
+        tag = data[offset]
+        offset += 1
+        field_id = tag >> 3
+
+        if field_id == _EXTRA:
+            length, offset = _read_varint(data, offset)
+            name = data[offset:offset + length].decode("utf-8")
+            offset += length
+        else:
+            name = FIELDS[field_id]
+
+        kind = tag & 0x07
+
+        if kind == _STRING:
+            length = data[offset]
+
+            if length < 0x80:
+                offset += 1
+            else:
+                length, offset = _read_varint(data, offset)
+
+            value = data[offset:offset + length].decode("utf-8")
+            offset += length
+        elif kind == _INT:
+            value = _INT32.unpack_from(data, offset)[0]
+            offset += 4
+        elif kind == _FLOAT:
+            value = _FLOAT64.unpack_from(data, offset)[0]
+            offset += 8
+        elif kind == _NULL:
+            value = None
+        elif kind == _URLS:
+            value, offset = _read_urls(data, offset)
+        elif kind == _JSON:
+            length, offset = _read_varint(data, offset)
+            value = json.loads(data[offset:offset + length].decode("utf-8"))
+            offset += length
+        else:
+            value = kind == _TRUE
+
+        response[name] = value
+
+    return response, flags
+
+
+def _read_urls(data, offset):
+    """Returns the urls encoded at the offset and the offset after them."""
+    count, offset = _read_varint(data, offset)
+    urls = []
+    previous = b""
+
+    for _ in range(count):
+        shared, offset = _read_varint(data, offset)
+        length, offset = _read_varint(data, offset)
+        url = previous[:shared] + data[offset:offset + length]
+        offset += length
+        urls.append(url.decode("utf-8"))
+        previous = url
+
+    return urls, offset
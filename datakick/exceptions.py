@@ -7,6 +7,18 @@ This module contains the set of datakick's exceptions.
 """
 
 
+class CircuitOpenError(Exception):
+    """The circuit breaker of the endpoint is open, the request wasn't sent."""
+
+
+class CrawlError(Exception):
+    """One or more crawler workers failed."""
+
+
+class DeadlineExceededError(Exception):
+    """The deadline of the operation passed before the request was sent."""
+
+
 class ImageTooLargeError(Exception):
     """The image was too large."""
 
@@ -0,0 +1,327 @@
+"""
+datakick.export
+---------------
+
+This module contains a streaming exporter that writes products to NDJSON, CSV
+or Parquet files in constant memory.
+
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import threading
+
+from six.moves import queue
+
+from .models import ATTRIBUTES, NUMERIC_ATTRIBUTES
+from .nutrition import _to_number
+
+FORMATS = ("ndjson", "csv", "parquet")
+
+_EXTENSIONS = {
+    ".csv": "csv",
+    ".json": "ndjson",
+    ".jsonl": "ndjson",
+    ".ndjson": "ndjson",
+    ".parquet": "parquet",
+}
+
+_DONE = object()
+
+
+def _format_from_path(path):
+    """Guesses the export format from the extension of the path."""
+    _, ext = os.path.splitext(path)
+
+    try:
+        return _EXTENSIONS[ext.lower()]
+    except KeyError:
+        raise ValueError(
+            "Can't guess the format of {}, use one of the following: "
+            "{}".format(path, FORMATS)
+        )
+
+
+def _row(product):
+    """Returns the values of every attribute of the product, in the order of
+    :data:`datakick.models.ATTRIBUTES`."""
+    return [getattr(product, attribute) for attribute in ATTRIBUTES]
+
+
+class _NDJSONWriter(object):
+    """Writes one JSON object per line."""
+
+    def __init__(self, path):
+        self._file = io.open(path, "w", encoding="utf-8")
+
+    def write(self, rows):
+        lines = [
+            json.dumps(dict(zip(ATTRIBUTES, row)), ensure_ascii=False)
+            for row in rows
+        ]
+        self._file.write(u"\n".join(lines) + u"\n")
+
+    def close(self):
+        self._file.close()
+
+
+class _CSVWriter(object):
+    """Writes a header followed by one line per product. Image urls are
+    separated by spaces."""
+
+    def __init__(self, path):
+        self._file = io.open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(ATTRIBUTES)
+        self._images = ATTRIBUTES.index("images")
+
+    def write(self, rows):
+        for row in rows:
+            row = list(row)
+            row[self._images] = " ".join(row[self._images] or [])
+            self._writer.writerow(row)
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter(object):
+    """Writes every batch of rows as a Parquet row group. Numeric attributes
+    are stored as doubles, non-numeric values of them are stored as nulls."""
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError(
+                "Exporting to Parquet requires pyarrow, install it with "
+                "pip install datakick[parquet]"
+            )
+
+        self._pyarrow = pyarrow
+        self._schema = pyarrow.schema([
+            (attribute, self._type(attribute)) for attribute in ATTRIBUTES
+        ])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+
+    def _type(self, attribute):
+        if attribute in NUMERIC_ATTRIBUTES:
+            return self._pyarrow.float64()
+        if attribute == "images":
+            return self._pyarrow.list_(self._pyarrow.string())
+        return self._pyarrow.string()
+
+    def write(self, rows):
+        columns = []
+
+        for i, attribute in enumerate(ATTRIBUTES):
+            values = [row[i] for row in rows]
+
+            if attribute in NUMERIC_ATTRIBUTES:
+                values = [_to_number(value) for value in values]
+            elif attribute != "images":
+                values = [
+                    value if value is None else u"{}".format(value)
+                    for value in values
+                ]
+
+            columns.append(values)
+
+        self._writer.write_table(
+            self._pyarrow.Table.from_arrays(
+                [
+                    self._pyarrow.array(values, type=field.type)
+                    for values, field in zip(columns, self._schema)
+                ],
+                schema=self._schema
+            )
+        )
+
+    def close(self):
+        self._writer.close()
+
+
+_WRITERS = {
+    "csv": _CSVWriter,
+    "ndjson": _NDJSONWriter,
+    "parquet": _ParquetWriter,
+}
+
+
+class _BackgroundWriter(threading.Thread):
+    """Encodes and writes row groups on its own thread so that encoding
+    overlaps with fetching the next products."""
+
+    def __init__(self, writer, queue_size):
+        super(_BackgroundWriter, self).__init__()
+        self.daemon = True
+        self.error = None
+        self._writer = writer
+        self._queue = queue.Queue(maxsize=queue_size)
+
+    def run(self):
+        try:
+            while True:
+                rows = self._queue.get()
+
+                if rows is _DONE:
+                    break
+
+                self._writer.write(rows)
+        except Exception as error:
+            self.error = error
+        finally:
+            self._writer.close()
+
+    def put(self, rows):
+        """Queues a row group, blocking while the queue is full."""
+        while self.is_alive():
+            try:
+                self._queue.put(rows, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+        raise self.error or RuntimeError("The export writer has stopped.")
+
+    def finish(self):
+        """Waits for every queued row group to be written."""
+        if self.is_alive():
+            self.put(_DONE)
+            self.join()
+
+        if self.error is not None:
+            raise self.error
+
+
+def export(products, path, format=None, row_group_size=1000, queue_size=4):
+    """
+    Writes products to a file while they are being fetched.
+
+    Products are consumed lazily and written in groups of ``row_group_size``
+    on a background thread, so at most ``queue_size + 2`` row groups are held
+    in memory no matter how many products are exported. The columns are the
+    attributes of :class:`DatakickProduct <DatakickProduct>`.
+
+    :param products: iterable of :class:`DatakickProduct <DatakickProduct>`
+        objects, i.e. from :func:`iter_products` or :func:`search`
+    :param path: path of the file to write
+    :param format: one of ``"ndjson"``, ``"csv"`` or ``"parquet"``; guessed
+        from the extension of the path if None
+    :param row_group_size: number of products written at a time
+    :param queue_size: number of row groups waiting to be written before
+        fetching blocks
+    :raises ValueError: if the format is unknown
+    :raises ImportError: if exporting to Parquet without pyarrow installed
+    :return: number of products written
+    :rtype: :class:`int <int>`
+    """
+    format = format or _format_from_path(path)
+
+    if format not in _WRITERS:
+        raise ValueError(
+            "Format must be one of the following: {}".format(FORMATS)
+        )
+
+    writer = _BackgroundWriter(_WRITERS[format](path), queue_size)
+    writer.start()
+
+    count = 0
+    rows = []
+
+    try:
+        for product in products:
+            rows.append(_row(product))
+
+            if len(rows) == row_group_size:
+                writer.put(rows)
+                count += len(rows)
+                rows = []
+
+        if rows:
+            writer.put(rows)
+            count += len(rows)
+    finally:
+        writer.finish()
+
+    return count
+
+
+def _page_range(text):
+    """Parses a ``START:END`` page range where either side may be omitted."""
+    start, _, end = text.partition(":")
+    return int(start or 1), int(end) if end else None
+
+
+def _products(args):
+    """Returns the products selected by the command line arguments. Barcodes
+    that aren't found are skipped."""
+    from .api import find_products, iter_products, search
+    from .crawler import read_snapshot
+
+    if args.snapshot:
+        return read_snapshot(args.snapshot)
+    if args.search:
+        return iter(search(args.search))
+    if args.gtin14s:
+        gtin14s = (line.strip() for line in args.gtin14s if line.strip())
+        return (
+            product for _, product in find_products(gtin14s)
+            if not isinstance(product, Exception)
+        )
+
+    return iter_products(*_page_range(args.pages))
+
+
+def configure_parser(parser):
+    """Adds the command line arguments of :func:`export` to an
+    :class:`argparse.ArgumentParser`."""
+    parser.add_argument("output", help="path of the file to write")
+    parser.add_argument("--format", choices=FORMATS)
+    parser.add_argument("--row-group-size", type=int, default=1000)
+
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--pages", default="1:",
+        help="START:END range of pages to export (default: every page)"
+    )
+    source.add_argument("--search", help="export the results of a search")
+    source.add_argument(
+        "--gtin14s", type=argparse.FileType("r"),
+        help="file with one barcode per line ('-' for stdin)"
+    )
+    source.add_argument("--snapshot", help="NDJSON snapshot to convert")
+
+    parser.set_defaults(func=run)
+
+
+def run(args):
+    """Runs :func:`export` with the parsed command line arguments."""
+    count = export(
+        _products(args), args.output, format=args.format,
+        row_group_size=args.row_group_size
+    )
+
+    sys.stderr.write("Exported {} products.\n".format(count))
+
+    return 0
+
+
+def main(argv=None):
+    """Command line interface of :func:`export`."""
+    parser = argparse.ArgumentParser(
+        prog="python -m datakick.export",
+        description="Export Datakick products to NDJSON, CSV or Parquet."
+    )
+    configure_parser(parser)
+
+    return run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+datakick.images
+---------------
+
+This module contains the manifest of the images already uploaded, letting
+:class:`datakick.api.Client` skip uploading an image the Datakick database
+already has.
+
+Images are identified by the SHA-256 hash of their content, so a renamed copy
+of an uploaded image is recognized as well.
+
+"""
+
+import hashlib
+import io
+import json
+import mmap
+import os
+import threading
+
+
+def hash_image(img_path):
+    """
+    Returns the SHA-256 hash of an image. The file is memory-mapped and hashed
+    in place rather than read into a buffer.
+
+    :param img_path: path to the image
+    :return: hexadecimal digest
+    :rtype: :class:`str <str>`
+    """
+    digest = hashlib.sha256()
+
+    with open(img_path, "rb") as image:
+        if os.fstat(image.fileno()).st_size:
+            with mmap.mmap(
+                image.fileno(), 0, access=mmap.ACCESS_READ
+            ) as content:
+                digest.update(content)
+
+    return digest.hexdigest()
+
+
+class ImageManifest(object):
+    """Maps the gtin14 and content hash of every image uploaded to the
+    ``image_url`` the Datakick database returned.
+
+    The manifest is kept in memory and, if a path is given, appended to an
+    NDJSON file as images are uploaded, so it survives restarts. A line left
+    incomplete by a crash is ignored when the file is read back.
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: optional path of the NDJSON file, created if it doesn't
+            exist
+        """
+        self.path = path
+        self._urls = {}
+        self._lock = threading.Lock()
+        # the last line was left incomplete and must be ended before appending
+        self._partial = False
+
+        if path is not None and os.path.exists(path):
+            self._read(path)
+
+    def _read(self, path):
+        with io.open(path, encoding="utf-8") as lines:
+            for line in lines:
+                self._partial = not line.endswith(u"\n")
+
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+
+                self._urls[record["gtin14"], record["sha256"]] = (
+                    record["image_url"]
+                )
+
+    def __len__(self):
+        return len(self._urls)
+
+    def get(self, gtin14, digest):
+        """Returns the url of an image uploaded before or None.
+
+        :param gtin14: barcode (ean/upc)
+        :param digest: hash of the image, see :func:`hash_image`
+        :return: url :class:`str <str>` or None
+        """
+        return self._urls.get((gtin14, digest))
+
+    def record(self, gtin14, digest, image_url):
+        """Records the url of an uploaded image.
+
+        :param gtin14: barcode (ean/upc)
+        :param digest: hash of the image, see :func:`hash_image`
+        :param image_url: url returned by the Datakick database
+        :return: None
+        """
+        with self._lock:
+            self._urls[gtin14, digest] = image_url
+
+            if self.path is None:
+                return
+
+            line = json.dumps({
+                "gtin14": gtin14, "sha256": digest, "image_url": image_url
+            }, separators=(",", ":"))
+
+            with io.open(self.path, "a", encoding="utf-8") as output:
+                if self._partial:
+                    output.write(u"\n")
+                    self._partial = False
+
+                output.write(u"{}\n".format(line))
@@ -0,0 +1,276 @@
+"""
+datakick.index
+--------------
+
+This module contains a local full-text search index over products, used to
+answer repeated searches without a round trip to the Datakick database.
+
+"""
+
+import bisect
+import gzip
+import json
+import math
+import re
+import threading
+
+from .models import DatakickProduct
+
+INDEXED_FIELDS = ("name", "brand_name", "ingredients")
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    """
+    Splits text into lowercase word tokens.
+
+    :param text: the text to tokenize
+    :return: a :class:`list <list>` of tokens
+    :rtype: :class:`list <list>`
+    """
+    if not text:
+        return []
+
+    return _TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex(object):
+    """Inverted index over the name, brand name and ingredients of products,
+    ranked with BM25 and supporting prefix matches.
+
+    The index is thread-safe, so :meth:`add` can be registered as a hook
+    with :func:`register_hook <datakick.api.register_hook>` even though hooks
+    run on the threads of batch lookups and background refreshes.
+    """
+
+    def __init__(self, products=(), k1=1.2, b=0.75, prefix_weight=0.5,
+                 max_expansions=50):
+        """Creates a :class:`SearchIndex <SearchIndex>` containing the
+        products supplied.
+
+        :param products: iterable of :class:`DatakickProduct
+            <DatakickProduct>` objects
+        :param k1: BM25 term frequency saturation
+        :param b: BM25 document length normalization
+        :param prefix_weight: weight of a term matched by prefix only
+        :param max_expansions: maximum number of terms a prefix expands to
+        """
+        self.k1 = k1
+        self.b = b
+        self.prefix_weight = prefix_weight
+        self.max_expansions = max_expansions
+
+        self._products = {}
+        self._lengths = {}
+        self._postings = {}
+        self._total_length = 0
+        self._terms = []
+        self._terms_dirty = False
+        # re-entrant since add removes the previous version of a product
+        self._lock = threading.RLock()
+
+        self.update(products)
+
+    def __contains__(self, gtin14):
+        return gtin14 in self._products
+
+    def __len__(self):
+        return len(self._products)
+
+    def add(self, product):
+        """Adds a product to the index, replacing any previous version of it.
+
+        :param product: :class:`DatakickProduct <DatakickProduct>` object
+        :return: None
+        """
+        gtin14 = product.gtin14
+        counts = {}
+
+        for field in INDEXED_FIELDS:
+            for token in tokenize(getattr(product, field)):
+                counts[token] = counts.get(token, 0) + 1
+
+        length = sum(counts.values())
+
+        with self._lock:
+            if gtin14 in self._products:
+                self.remove(gtin14)
+
+            for token, count in counts.items():
+                postings = self._postings.get(token)
+
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    self._terms_dirty = True
+
+                postings[gtin14] = count
+
+            self._products[gtin14] = product
+            self._lengths[gtin14] = length
+            self._total_length += length
+
+    def update(self, products):
+        """Adds several products to the index.
+
+        :param products: iterable of :class:`DatakickProduct
+            <DatakickProduct>` objects
+        :return: None
+        """
+        for product in products:
+            self.add(product)
+
+    def remove(self, gtin14):
+        """Removes a product from the index.
+
+        :param gtin14: barcode (ean/upc) of the product
+        :return: None
+        """
+        with self._lock:
+            product = self._products.pop(gtin14, None)
+
+            if product is None:
+                return
+
+            for field in INDEXED_FIELDS:
+                for token in tokenize(getattr(product, field)):
+                    postings = self._postings.get(token)
+
+                    if postings is None:
+                        continue
+
+                    postings.pop(gtin14, None)
+
+                    if not postings:
+                        del self._postings[token]
+                        self._terms_dirty = True
+
+            self._total_length -= self._lengths.pop(gtin14)
+
+    def _expand(self, token):
+        """Returns the indexed terms starting with the token."""
+        if self._terms_dirty:
+            self._terms = sorted(self._postings)
+            self._terms_dirty = False
+
+        start = bisect.bisect_left(self._terms, token)
+        terms = []
+
+        for term in self._terms[start:start + self.max_expansions]:
+            if not term.startswith(token):
+                break
+            terms.append(term)
+
+        return terms
+
+    def _bm25(self, term, num_docs, avg_length):
+        """Yields the BM25 score of every product containing the term."""
+        postings = self._postings[term]
+        idf = math.log(
+            1.0 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5)
+        )
+
+        for gtin14, count in postings.items():
+            norm = 1.0 - self.b + self.b * self._lengths[gtin14] / avg_length
+            yield gtin14, idf * count * (self.k1 + 1) / (count + self.k1 * norm)
+
+    def scores(self, key):
+        """Returns the BM25 score of every product matching the query.
+
+        Each word of the query matches indexed terms exactly or by prefix and
+        every word must match for a product to be returned.
+
+        :param key: the query to search for
+        :return: :class:`dict <dict>` mapping gtin14 to score
+        :rtype: :class:`dict <dict>`
+        """
+        tokens = tokenize(key)
+
+        with self._lock:
+            return self._scores(tokens)
+
+    def _scores(self, tokens):
+        """Scores the tokens of a query, with the index locked."""
+        if not tokens or not self._products:
+            return {}
+
+        num_docs = len(self._products)
+        avg_length = float(self._total_length) / num_docs or 1.0
+        scores = None
+
+        for token in tokens:
+            token_scores = {}
+
+            for term in self._expand(token):
+                weight = 1.0 if term == token else self.prefix_weight
+
+                for gtin14, score in self._bm25(term, num_docs, avg_length):
+                    score *= weight
+
+                    if score > token_scores.get(gtin14, 0.0):
+                        token_scores[gtin14] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = dict(
+                    (gtin14, score + token_scores[gtin14])
+                    for gtin14, score in scores.items()
+                    if gtin14 in token_scores
+                )
+
+            if not scores:
+                return {}
+
+        return scores
+
+    def search(self, key, limit=None):
+        """Returns the products matching the query, best matches first.
+
+        :param key: the query to search for
+        :param limit: maximum number of products to return
+        :return: a :class:`list <list>` of :class:`DatakickProduct
+            <DatakickProduct>` objects
+        :rtype: :class:`list <list>`
+        """
+        with self._lock:
+            scores = self.scores(key)
+            ranked = sorted(
+                scores, key=lambda gtin14: (-scores[gtin14], gtin14)
+            )
+
+            if limit is not None:
+                ranked = ranked[:limit]
+
+            return [self._products[gtin14] for gtin14 in ranked]
+
+    def save(self, path):
+        """Writes the indexed products to a gzip compressed NDJSON file.
+
+        :param path: path of the file
+        :return: None
+        """
+        with self._lock:
+            products = list(self._products.values())
+
+        with gzip.open(path, "wb") as output:
+            for product in products:
+                line = json.dumps(product.as_dict(), separators=(",", ":"))
+                output.write(line.encode("utf-8") + b"\n")
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Creates a :class:`SearchIndex <SearchIndex>` from a file written
+        by :meth:`save`.
+
+        :param path: path of the file
+        :return: :class:`SearchIndex <SearchIndex>` object
+        """
+        with gzip.open(path, "rb") as lines:
+            products = [
+                DatakickProduct.from_dict(json.loads(line.decode("utf-8")))
+                for line in lines
+                if line.strip()
+            ]
+
+        return cls(products, **kwargs)
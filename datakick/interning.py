@@ -0,0 +1,98 @@
+"""
+datakick.interning
+------------------
+
+This module contains a pool that deduplicates the strings repeated across
+products, i.e. brand names and sizes, when loading large numbers of them.
+
+"""
+
+import sys
+
+#: Attributes whose values are deduplicated by default.
+INTERNED_ATTRIBUTES = (
+    "author",
+    "brand_name",
+    "publisher",
+    "serving_size",
+    "servings_per_container",
+    "size",
+)
+
+
+class InternPool(object):
+    """Pool of strings shared by the products built through it.
+
+    Keys of the json responses and the values of :data:`INTERNED_ATTRIBUTES`
+    are replaced by the first equal string seen, so that products loaded in
+    bulk share one copy of each repeated value. Image urls are unique to each
+    image and are left alone, pooling them would only cost memory.
+    """
+
+    def __init__(self, attributes=INTERNED_ATTRIBUTES):
+        """
+        :param attributes: attributes whose values are deduplicated
+        """
+        self.attributes = frozenset(attributes)
+        self.lookups = 0
+        self.hits = 0
+        self.saved_bytes = 0
+        self._strings = {}
+
+    def __len__(self):
+        return len(self._strings)
+
+    def intern(self, value):
+        """Returns the pooled string equal to the value, adding it to the pool
+        if needed. Values that aren't strings are returned unchanged.
+
+        :param value: the value to deduplicate
+        :return: the pooled value
+        """
+        if not isinstance(value, str):
+            return value
+
+        self.lookups += 1
+        pooled = self._strings.setdefault(value, value)
+
+        if pooled is not value:
+            self.hits += 1
+            self.saved_bytes += sys.getsizeof(value)
+
+        return pooled
+
+    def intern_response(self, json_response):
+        """Returns a copy of a product json response sharing its keys and
+        repeated values with the pool.
+
+        :param json_response: :class:`dict <dict>` as returned by the Datakick
+            database
+        :return: the deduplicated json response
+        :rtype: :class:`dict <dict>`
+        """
+        return dict(
+            (
+                sys.intern(key),
+                self.intern(value) if key in self.attributes else value
+            )
+            for key, value in json_response.items()
+        )
+
+    def stats(self):
+        """Returns the number of lookups, hits, pooled strings and bytes saved.
+
+        :rtype: :class:`dict <dict>`
+        """
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "strings": len(self._strings),
+            "saved_bytes": self.saved_bytes,
+        }
+
+    def clear(self):
+        """Empties the pool and resets its statistics."""
+        self._strings.clear()
+        self.lookups = 0
+        self.hits = 0
+        self.saved_bytes = 0
@@ -9,16 +9,45 @@ Datakick database.
 
 import copy
 
+from . import encoding
+from .quantities import parse_quantity
+
+NUMERIC_ATTRIBUTES = (
+    "alcohol_by_volume",
+    "calories",
+    "carbohydrate",
+    "cholesterol",
+    "fat",
+    "fat_calories",
+    "fiber",
+    "monounsaturated_fat",
+    "pages",
+    "polyunsaturated_fat",
+    "potassium",
+    "protein",
+    "saturated_fat",
+    "servings_per_container",
+    "sodium",
+    "sugars",
+    "trans_fat",
+)
+
 
 class DatakickProduct(object):
     """Object which contains all the attributes of a product from the Datakick
     database."""
 
+    __slots__ = ("_response", "stale")
+
     def __init__(self, json_response):
         """Creates a :class:`DatakickProduct <DatakickProduct>` object using the
         json response from the request to the Datakick database."""
         self._response = json_response
 
+        #: True if the product is an expired cached copy, served because the
+        #: Datakick database couldn't be reached.
+        self.stale = False
+
         # convert images from list of dictionaries to list of urls
         self._response["images"] = [
             dct["url"] for dct in self._response.get("images", [])
@@ -33,6 +62,56 @@ class DatakickProduct(object):
         """:class:`dict <dict>` of all the attributes."""
         return copy.deepcopy(self._response)
 
+    @classmethod
+    def from_dict(cls, dct):
+        """Creates a :class:`DatakickProduct <DatakickProduct>` object from the
+        output of :meth:`as_dict`."""
+        json_response = copy.deepcopy(dct)
+        json_response["images"] = [
+            {"url": url} for url in json_response.get("images", [])
+        ]
+
+        return cls(json_response)
+
+    def to_bytes(self):
+        """Encodes the product in the compact binary format of
+        :mod:`datakick.encoding`, much smaller than its JSON or pickle.
+
+        :rtype: :class:`bytes <bytes>`
+        """
+        return encoding.encode(
+            self._response, encoding.STALE if self.stale else 0
+        )
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Creates a :class:`DatakickProduct <DatakickProduct>` object from the
+        output of :meth:`to_bytes`."""
+        json_response, flags = encoding.decode(data)
+
+        product = cls.__new__(cls)
+        product._response = json_response
+        product.stale = bool(flags & encoding.STALE)
+
+        return product
+
+    def __reduce__(self):
+        # the response dict pickles several times faster than the compact
+        # format, which is meant for cache slots, not for process pools
+        return _restore, (self._response, self.stale)
+
+    def __copy__(self):
+        return _restore(copy.copy(self._response), self.stale)
+
+    def _stale_copy(self):
+        """Returns a copy of the product, sharing its attributes, marked as
+        stale."""
+        product = DatakickProduct.__new__(DatakickProduct)
+        product._response = self._response
+        product.stale = True
+
+        return product
+
     @property
     def author(self):
         """Name of the author (of the book)."""
@@ -133,6 +212,13 @@ class DatakickProduct(object):
         """The serving size."""
         return self._response.get("serving_size")
     
+    @property
+    def serving_quantity(self):
+        """The serving size parsed into a
+        :class:`Quantity <datakick.quantities.Quantity>` in grams, millilitres
+        or items, None if it couldn't be parsed."""
+        return parse_quantity(self._response.get("serving_size"))
+    
     @property
     def servings_per_container(self):
         """The servings per container."""
@@ -143,6 +229,13 @@ class DatakickProduct(object):
         """The net weight or volume."""
         return self._response.get("size")
     
+    @property
+    def size_quantity(self):
+        """The net weight or volume parsed into a
+        :class:`Quantity <datakick.quantities.Quantity>` in grams, millilitres
+        or items, None if it couldn't be parsed."""
+        return parse_quantity(self._response.get("size"))
+    
     @property
     def sodium(self):
         """Amount of sodium in milligrams (mg)."""
@@ -157,3 +250,23 @@ class DatakickProduct(object):
     def trans_fat(self):
         """Amount of trans fat in grams (g)."""
         return self._response.get("trans_fat")
+
+
+def _restore(json_response, stale):
+    """Unpickles a product pickled by :meth:`DatakickProduct.__reduce__`."""
+    product = DatakickProduct.__new__(DatakickProduct)
+    product._response = json_response
+    product.stale = stale
+
+    return product
+
+
+#: Properties computed from other attributes rather than stored.
+DERIVED_ATTRIBUTES = ("serving_quantity", "size_quantity")
+
+ATTRIBUTES = tuple(
+    sorted(
+        name for name, value in vars(DatakickProduct).items()
+        if isinstance(value, property) and name not in DERIVED_ATTRIBUTES
+    )
+)
@@ -0,0 +1,194 @@
+"""
+datakick.nutrition
+------------------
+
+This module contains a secondary index answering range queries over the
+numeric attributes of a local store of products, i.e. all products with less
+than 100 calories and less than 140mg of sodium.
+
+"""
+
+import array
+import bisect
+import re
+
+from .models import NUMERIC_ATTRIBUTES
+
+_OPERATORS = ("lt", "lte", "gt", "gte", "eq")
+_NONZERO_RE = re.compile(b"[^\x00]")
+
+
+def _to_number(value):
+    """Returns the value as a float or None if it isn't numeric."""
+    if value is None or isinstance(value, bool):
+        return None
+
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_predicate(name, value):
+    """Returns the ``(field, low, low_inclusive, high, high_inclusive)`` bounds
+    of a keyword predicate such as ``calories__lt=100``."""
+    field, _, operator = name.partition("__")
+
+    if field not in NUMERIC_ATTRIBUTES:
+        raise ValueError("{} is not a numeric attribute.".format(field))
+
+    if not operator:
+        low, high = value
+        return field, low, True, high, True
+
+    if operator not in _OPERATORS:
+        raise ValueError(
+            "Operator must be one of the following: {}".format(_OPERATORS)
+        )
+
+    if operator == "eq":
+        return field, value, True, value, True
+    if operator in ("lt", "lte"):
+        return field, None, True, value, operator == "lte"
+
+    return field, value, operator == "gte", None, True
+
+
+class _Column(object):
+    """Values of a numeric attribute sorted alongside the rows holding them."""
+
+    def __init__(self, pairs):
+        pairs.sort()
+        self.values = array.array("d", [value for value, _ in pairs])
+        self.rows = array.array("l", [row for _, row in pairs])
+
+    def span(self, low, low_inclusive, high, high_inclusive):
+        """Returns the ``(start, stop)`` slice of rows within the bounds."""
+        start = 0
+        stop = len(self.values)
+
+        if low is not None:
+            find = bisect.bisect_left if low_inclusive else bisect.bisect_right
+            start = find(self.values, low)
+
+        if high is not None:
+            find = bisect.bisect_right if high_inclusive else bisect.bisect_left
+            stop = find(self.values, high)
+
+        return start, max(start, stop)
+
+
+class NutritionIndex(object):
+    """Sorted columnar index over the numeric attributes of products."""
+
+    def __init__(self, products):
+        """Creates a :class:`NutritionIndex <NutritionIndex>` over the
+        products supplied.
+
+        :param products: iterable of :class:`DatakickProduct
+            <DatakickProduct>` objects
+        """
+        self._products = list(products)
+        self._columns = {}
+
+        for field in NUMERIC_ATTRIBUTES:
+            pairs = []
+
+            for row, product in enumerate(self._products):
+                value = _to_number(getattr(product, field))
+
+                if value is not None:
+                    pairs.append((value, row))
+
+            self._columns[field] = _Column(pairs)
+
+    def __len__(self):
+        return len(self._products)
+
+    def _bitmap(self, rows):
+        """Returns the rows as a bitmap stored in an :class:`int <int>`."""
+        bits = bytearray((len(self._products) + 7) // 8)
+
+        for row in rows:
+            bits[row >> 3] |= 1 << (row & 7)
+
+        return int.from_bytes(bytes(bits), "little")
+
+    def _rows(self, bitmap):
+        """Returns the sorted rows set in a bitmap."""
+        data = bitmap.to_bytes((len(self._products) + 7) // 8, "little")
+        rows = []
+
+        for match in _NONZERO_RE.finditer(data):
+            byte = data[match.start()]
+            base = match.start() << 3
+
+            for bit in range(8):
+                if byte & (1 << bit):
+                    rows.append(base + bit)
+
+        return rows
+
+    def _match(self, predicates):
+        """Returns the sorted rows matching every predicate."""
+        spans = []
+
+        for name, value in predicates.items():
+            field, low, low_inc, high, high_inc = _parse_predicate(name, value)
+            column = self._columns[field]
+            start, stop = column.span(low, low_inc, high, high_inc)
+
+            if start == stop:
+                return []
+
+            spans.append((stop - start, column.rows[start:stop]))
+
+        if not spans:
+            return list(range(len(self._products)))
+
+        # the most selective predicate bounds the size of the result
+        spans.sort(key=lambda span: span[0])
+
+        if len(spans) == 1:
+            return sorted(spans[0][1])
+
+        bitmap = self._bitmap(spans[0][1])
+
+        for _, rows in spans[1:]:
+            bitmap &= self._bitmap(rows)
+
+            if not bitmap:
+                return []
+
+        return self._rows(bitmap)
+
+    def query(self, **predicates):
+        """
+        Returns the gtin14 of every product matching all the predicates.
+
+        Predicates are keyword arguments named after a numeric attribute and
+        optionally suffixed by an operator (``__lt``, ``__lte``, ``__gt``,
+        ``__gte`` or ``__eq``). A bare attribute name takes an inclusive
+        ``(low, high)`` range where either bound may be None. Products missing
+        an attribute never match a predicate on it.
+
+            >>> index.query(calories__lt=100, sodium__lt=140)
+
+        :raises ValueError: if a predicate isn't on a numeric attribute or uses
+            an unknown operator
+        :return: a :class:`list <list>` of gtin14s
+        :rtype: :class:`list <list>`
+        """
+        return [
+            self._products[row].gtin14 for row in self._match(predicates)
+        ]
+
+    def query_products(self, **predicates):
+        """
+        Returns every product matching all the predicates, see :meth:`query`.
+
+        :return: a :class:`list <list>` of :class:`DatakickProduct
+            <DatakickProduct>` objects
+        :rtype: :class:`list <list>`
+        """
+        return [self._products[row] for row in self._match(predicates)]
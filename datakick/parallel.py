@@ -0,0 +1,81 @@
+"""
+datakick.parallel
+-----------------
+
+This module contains helpers to run many Datakick requests concurrently
+without reading their whole input into memory.
+
+"""
+
+from six.moves import queue
+
+
+def _call(func, seq, item):
+    """Calls func with the item, returning the exception instead of raising
+    it."""
+    try:
+        return seq, item, func(item)
+    except Exception as error:
+        return seq, item, error
+
+
+def imap(func, items, concurrency=8, ordered=True):
+    """
+    Calls ``func`` with each of the items on a pool of threads and yields
+    ``(item, result)`` pairs as they complete. If a call raises an exception,
+    the exception is yielded as its result.
+
+    Items are read lazily: at most ``2 * concurrency`` of them are being
+    processed or waiting to be yielded at any time, so arbitrarily long
+    iterators can be streamed through.
+
+    :param func: callable accepting a single item
+    :param items: iterable of items
+    :param concurrency: number of threads
+    :param ordered: yield results in the order of the items instead of the
+        order in which they complete
+    :return: a generator of ``(item, result)`` :class:`tuple <tuple>`
+    """
+    from multiprocessing.pool import ThreadPool
+
+    window = concurrency * 2
+    done = queue.Queue()
+    pool = ThreadPool(concurrency)
+    items = iter(items)
+    buffered = {}
+    submitted = 0
+    yielded = 0
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and submitted - yielded < window:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+
+                pool.apply_async(
+                    _call, (func, submitted, item), callback=done.put
+                )
+                submitted += 1
+
+            if submitted == yielded:
+                break
+
+            seq, item, result = done.get()
+
+            if not ordered:
+                yielded += 1
+                yield item, result
+                continue
+
+            buffered[seq] = (item, result)
+
+            while yielded in buffered:
+                item, result = buffered.pop(yielded)
+                yielded += 1
+                yield item, result
+    finally:
+        pool.terminate()
@@ -0,0 +1,418 @@
+"""
+datakick.pipeline
+-----------------
+
+This module contains a small streaming pipeline chaining processing stages,
+i.e. fetch, normalize, enrich and write, through bounded queues.
+
+Every stage reads from a bounded queue and writes to the next one, so a slow
+stage, or a slow consumer at the end, fills the queues before it and stalls
+the stages upstream instead of letting items pile up in memory.
+
+"""
+
+import inspect
+import threading
+import time
+
+from six.moves import queue
+
+# seconds blocking queue operations wait before checking for a stop
+_POLL = 0.1
+
+_DONE = object()
+
+
+class _Stopped(Exception):
+    """The pipeline was closed while a stage was waiting."""
+
+
+class _Failure(object):
+    """Exception raised by a stage, carried downstream in place of a value."""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _put(target, element, stopped):
+    """Puts an element in a queue, blocking while it is full."""
+    while not stopped.is_set():
+        try:
+            target.put(element, timeout=_POLL)
+            return
+        except queue.Full:
+            pass
+
+    raise _Stopped()
+
+
+def _get(source, stopped):
+    """Gets an element from a queue, blocking while it is empty."""
+    while not stopped.is_set():
+        try:
+            return source.get(timeout=_POLL)
+        except queue.Empty:
+            pass
+
+    raise _Stopped()
+
+
+class _Stage(object):
+    """Runs a function over the elements of its input queue on ``concurrency``
+    threads, or as ``concurrency`` tasks of an event loop for coroutine
+    functions, and writes the results to its output queue."""
+
+    def __init__(self, func, concurrency, ordered, name, source, target,
+                 stopped):
+        self.func = func
+        self.concurrency = concurrency
+        self.ordered = ordered
+        self.name = name
+        self.source = source
+        self.target = target
+        self.processed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.started_at = None
+        self.finished_at = None
+        self._stopped = stopped
+        # elements taken but not emitted yet, including those waiting for
+        # an earlier one when ordered
+        self._window = threading.Semaphore(concurrency * 2)
+        self._intake_lock = threading.Lock()
+        self._emit_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._taken = 0
+        self._emitted = 0
+        self._buffer = {}
+        self._exhausted = False
+        self._active = 0
+
+    @property
+    def is_async(self):
+        return inspect.iscoroutinefunction(self.func)
+
+    def start(self):
+        self.started_at = time.time()
+
+        if self.is_async:
+            workers = [self._run_loop]
+        else:
+            workers = [self._work] * self.concurrency
+
+        self._active = len(workers)
+
+        for work in workers:
+            thread = threading.Thread(target=work, name=self.name)
+            thread.daemon = True
+            thread.start()
+
+    def stats(self):
+        """Returns the counters of the stage."""
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+
+        return {
+            "name": self.name,
+            "concurrency": self.concurrency,
+            "processed": self.processed,
+            "failed": self.failed,
+            "throughput": self.processed / elapsed if elapsed else 0.0,
+            "queue_depth": self.source.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+    def _take(self):
+        """Waits for a window slot and returns the next ``(seq, element)``,
+        None at the end of the stream."""
+        while not self._window.acquire(timeout=_POLL):
+            if self._stopped.is_set():
+                raise _Stopped()
+
+        with self._intake_lock:
+            if not self._exhausted:
+                self.max_queue_depth = max(
+                    self.max_queue_depth, self.source.qsize()
+                )
+                element = _get(self.source, self._stopped)
+
+                if element is not _DONE:
+                    seq = self._taken
+                    self._taken += 1
+                    return seq, element
+
+                self._exhausted = True
+
+        self._window.release()
+
+        return None
+
+    def _record(self, element, value):
+        """Counts a processed element and returns its result element."""
+        with self._stats_lock:
+            self.processed += 1
+
+            if isinstance(value, _Failure):
+                self.failed += 1
+
+        return element[0], value
+
+    def _call(self, element):
+        item, value = element
+
+        if isinstance(value, _Failure):
+            return element
+
+        try:
+            value = self.func(value)
+        except Exception as error:
+            value = _Failure(error)
+
+        return self._record(element, value)
+
+    def _emit(self, seq, element):
+        """Writes the element downstream, after the elements taken before it
+        if the stage is ordered."""
+        with self._emit_lock:
+            if not self.ordered:
+                ready = [element]
+            else:
+                self._buffer[seq] = element
+                ready = []
+
+                while self._emitted in self._buffer:
+                    ready.append(self._buffer.pop(self._emitted))
+                    self._emitted += 1
+
+            for element in ready:
+                _put(self.target, element, self._stopped)
+                self._window.release()
+
+    def _finish(self):
+        """Ends the stream downstream once the last worker is done."""
+        with self._stats_lock:
+            self._active -= 1
+
+            if self._active:
+                return
+
+            self.finished_at = time.time()
+
+        try:
+            _put(self.target, _DONE, self._stopped)
+        except _Stopped:
+            pass
+
+    def _work(self):
+        try:
+            while True:
+                taken = self._take()
+
+                if taken is None:
+                    break
+
+                seq, element = taken
+                self._emit(seq, self._call(element))
+        except _Stopped:
+            pass
+        finally:
+            self._finish()
+
+    def _run_loop(self):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        loop = asyncio.new_event_loop()
+        # threads blocking on the queues, one per task and one for intake
+        executor = ThreadPoolExecutor(self.concurrency + 1)
+
+        try:
+            loop.run_until_complete(self._work_async(loop, executor))
+        except _Stopped:
+            pass
+        finally:
+            loop.close()
+            executor.shutdown(wait=False)
+            self._finish()
+
+    async def _work_async(self, loop, executor):
+        import asyncio
+
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+
+        try:
+            while True:
+                await slots.acquire()
+                taken = await loop.run_in_executor(executor, self._take)
+
+                if taken is None:
+                    break
+
+                task = loop.create_task(
+                    self._call_async(loop, executor, slots, *taken)
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _call_async(self, loop, executor, slots, seq, element):
+        try:
+            item, value = element
+
+            if not isinstance(value, _Failure):
+                try:
+                    value = await self.func(value)
+                except Exception as error:
+                    value = _Failure(error)
+
+                element = self._record(element, value)
+
+            await loop.run_in_executor(executor, self._emit, seq, element)
+        finally:
+            slots.release()
+
+
+class Pipeline(object):
+    """Chain of stages processing the items of a source concurrently, each
+    stage connected to the next by a bounded queue.
+
+    Iterating over the pipeline starts it and yields ``(item, result)``
+    pairs, ``item`` being the source item and ``result`` the value returned
+    by the last stage. If a stage raises an exception, the later stages are
+    skipped for that item and the exception is yielded as its result.
+    """
+
+    def __init__(self, source, queue_size=100):
+        """
+        :param source: iterable of items, read lazily
+        :param queue_size: default number of items each queue holds
+        """
+        self.queue_size = queue_size
+        self._source = source
+        self._specs = []
+        self._stages = []
+        self._stopped = threading.Event()
+        self._source_error = None
+        self._started = False
+
+    def stage(self, func, concurrency=1, ordered=True, name=None,
+              queue_size=None):
+        """
+        Appends a stage calling ``func`` with the result of the previous
+        stage, or with the source item for the first one.
+
+        :param func: callable or coroutine function; coroutine functions run
+            as tasks of an event loop on the stage's own thread
+        :param concurrency: number of threads, or tasks, running ``func``
+        :param ordered: keep the order of the items instead of passing them
+            on as soon as they are done
+        :param name: name of the stage in :meth:`stats`, defaults to the name
+            of the function
+        :param queue_size: number of items the queue in front of the stage
+            holds, defaults to the pipeline's ``queue_size``
+        :return: the pipeline, so that stages can be chained
+        """
+        if self._started:
+            raise RuntimeError("Stages can't be added to a running pipeline.")
+
+        self._specs.append((
+            func, concurrency, ordered,
+            name or getattr(func, "__name__", "stage{}".format(
+                len(self._specs)
+            )),
+            queue_size or self.queue_size
+        ))
+
+        return self
+
+    def __iter__(self):
+        if self._started:
+            raise RuntimeError("A pipeline can only run once.")
+
+        self._started = True
+
+        return self._run()
+
+    def _run(self):
+        # the queue in front of each stage, then the output queue
+        queues = [
+            queue.Queue(maxsize=queue_size)
+            for queue_size in [spec[4] for spec in self._specs] +
+            [self.queue_size]
+        ]
+
+        for i, spec in enumerate(self._specs):
+            func, concurrency, ordered, name, _ = spec
+            self._stages.append(_Stage(
+                func, concurrency, ordered, name, queues[i], queues[i + 1],
+                self._stopped
+            ))
+
+        head, tail = queues[0], queues[-1]
+        feeder = threading.Thread(target=self._feed, args=(head,))
+        feeder.daemon = True
+        feeder.start()
+
+        for stage in self._stages:
+            stage.start()
+
+        try:
+            while True:
+                element = _get(tail, self._stopped)
+
+                if element is _DONE:
+                    break
+
+                item, value = element
+
+                if isinstance(value, _Failure):
+                    value = value.error
+
+                yield item, value
+
+            if self._source_error is not None:
+                raise self._source_error
+        finally:
+            self.close()
+
+    def _feed(self, target):
+        """Reads the source into the first queue."""
+        try:
+            for item in self._source:
+                _put(target, (item, item), self._stopped)
+        except _Stopped:
+            return
+        except Exception as error:
+            self._source_error = error
+
+        try:
+            _put(target, _DONE, self._stopped)
+        except _Stopped:
+            pass
+
+    def stats(self):
+        """
+        Returns the counters of every stage: its name, concurrency, number of
+        items processed and failed, throughput in items per second, current
+        and maximum depth of the queue in front of it.
+
+        :return: a :class:`list <list>` of :class:`dict <dict>`, one per stage
+        :rtype: :class:`list <list>`
+        """
+        return [stage.stats() for stage in self._stages]
+
+    def close(self):
+        """Stops every stage. Called when iterating over the pipeline ends,
+        including when it is left early."""
+        self._stopped.set()
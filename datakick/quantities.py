@@ -0,0 +1,316 @@
+"""
+datakick.quantities
+-------------------
+
+This module contains the parser turning the free text ``size`` and
+``serving_size`` of products, i.e. "20oz", "500g" or "3/4 cup (28g)", into
+amounts in grams or millilitres, and the batch helpers converting the columns
+of many products at once.
+
+"""
+
+import array
+import collections
+import re
+
+#: Unit code of text that couldn't be parsed.
+UNKNOWN = 0
+#: Unit code of amounts in grams.
+GRAMS = 1
+#: Unit code of amounts in millilitres.
+MILLILITRES = 2
+#: Unit code of amounts counting items.
+COUNT = 3
+
+#: Symbol of each unit code.
+UNITS = ("", "g", "ml", "ct")
+
+#: Nutrients normalized by :func:`per_100`.
+NUTRIENTS = (
+    "calories",
+    "carbohydrate",
+    "cholesterol",
+    "fat",
+    "fat_calories",
+    "fiber",
+    "monounsaturated_fat",
+    "polyunsaturated_fat",
+    "potassium",
+    "protein",
+    "saturated_fat",
+    "sodium",
+    "sugars",
+    "trans_fat",
+)
+
+#: Amount and unit code of a parsed size.
+Quantity = collections.namedtuple("Quantity", ["amount", "unit"])
+
+# unit spellings, longest first so that i.e. "fl oz" wins over "oz", with
+# whether the unit is metric
+_FACTORS = (
+    (r"fl\.?\s*oz|fluid\s*ounces?", MILLILITRES, 29.5735295625, False),
+    (r"milligrams?|mg", GRAMS, 0.001, True),
+    (r"kilograms?|kilos?|kg", GRAMS, 1000.0, True),
+    (r"grams?|gr|g", GRAMS, 1.0, True),
+    (r"ounces?|ozs?", GRAMS, 28.349523125, False),
+    (r"pounds?|lbs?", GRAMS, 453.59237, False),
+    (r"millilit(?:er|re)s?|ml", MILLILITRES, 1.0, True),
+    (r"centilit(?:er|re)s?|cl", MILLILITRES, 10.0, True),
+    (r"decilit(?:er|re)s?|dl", MILLILITRES, 100.0, True),
+    (r"lit(?:er|re)s?|ltr|l", MILLILITRES, 1000.0, True),
+    (r"gallons?|gal", MILLILITRES, 3785.411784, False),
+    (r"quarts?|qt", MILLILITRES, 946.352946, False),
+    (r"pints?|pt", MILLILITRES, 473.176473, False),
+    (r"cups?", MILLILITRES, 236.5882365, False),
+    (r"tablespoons?|tbsp|tbs", MILLILITRES, 14.78676478125, False),
+    (r"teaspoons?|tsp", MILLILITRES, 4.92892159375, False),
+    (r"count|ct|pieces?|pcs|each|ea", COUNT, 1.0, False),
+)
+
+_NUMBER = (
+    r"\d+\s+\d+/\d+"        # mixed fraction, 1 1/2
+    r"|\d+/\d+"             # fraction, 3/4
+    r"|\d+,\d{1,2}(?!\d)"   # decimal comma, 1,5
+    r"|\d+(?:,\d{3})*(?:\.\d+)?"
+    r"|\.\d+"
+)
+
+_QUANTITY_RE = re.compile(
+    r"(?P<number>{})\s*(?P<unit>{})(?![a-z])".format(
+        _NUMBER, "|".join("(?:{})".format(units) for units, _, _, _ in _FACTORS)
+    )
+)
+_UNIT_RES = [
+    (re.compile(r"(?:{})\Z".format(units)), unit, factor, metric)
+    for units, unit, factor, metric in _FACTORS
+]
+_PACK_RE = re.compile(r"^\s*(\d+)\s*[x×]\s*")
+_PARENTHESES_RE = re.compile(r"\(([^)]*)\)")
+
+# parsed texts are memoized, up to this many at a time
+_MAX_MEMOIZED = 100000
+_memo = {}
+
+
+def _number(text):
+    """Converts a number matched by the quantity pattern to a float."""
+    if "/" in text:
+        whole, _, fraction = text.rpartition(" ")
+        numerator, denominator = fraction.split("/")
+        value = float(numerator) / float(denominator or 1)
+        return value + float(whole) if whole.strip() else value
+
+    if "," in text and not re.search(r",\d{3}", text):
+        return float(text.replace(",", "."))
+
+    return float(text.replace(",", ""))
+
+
+def _unit(text):
+    """Returns the unit code, factor and whether the unit is metric of a unit
+    matched by the pattern."""
+    text = text.replace(" ", "")
+
+    for pattern, unit, factor, metric in _UNIT_RES:
+        if pattern.match(text):
+            return unit, factor, metric
+
+    return UNKNOWN, 0.0, False
+
+
+def _quantities(text):
+    """Yields the ``(amount, unit, spelling, metric)`` of every quantity of
+    the text."""
+    for match in _QUANTITY_RE.finditer(text):
+        try:
+            amount = _number(match.group("number"))
+        except (ValueError, ZeroDivisionError):
+            continue
+
+        unit, factor, metric = _unit(match.group("unit"))
+
+        if unit != UNKNOWN:
+            yield amount * factor, unit, match.group("unit"), metric
+
+
+def _parse(text):
+    """Parses a size without memoizing it."""
+    text = text.lower()
+
+    # metric amounts in parentheses are the most precise, i.e. "1 cup (240ml)",
+    # imperial ones are at best as precise as the amount outside, i.e.
+    # "40 oz (2 lb 8 oz)"
+    quantity = _metric_in_parentheses(text) or _outside_parentheses(text)
+
+    if quantity is None:
+        return None
+
+    amount, unit = quantity
+    # the amount of a pack is the amount of an item, in or out of
+    # parentheses, i.e. "6 x 12 fl oz (355 ml)"
+    pack = _PACK_RE.match(text)
+
+    if pack and unit != COUNT:
+        amount *= int(pack.group(1))
+
+    return Quantity(amount, unit)
+
+
+def _metric_in_parentheses(text):
+    """Returns the first metric ``(amount, unit)`` in parentheses or None."""
+    for inner in _PARENTHESES_RE.findall(text):
+        for amount, unit, _, metric in _quantities(inner):
+            if metric:
+                return amount, unit
+
+    return None
+
+
+def _outside_parentheses(text):
+    """Returns the first ``(amount, unit)`` outside parentheses or None."""
+    found = list(_quantities(_PARENTHESES_RE.sub(" ", text)))
+
+    if not found:
+        return None
+
+    amount, unit, spelling, _ = found[0]
+
+    # compound imperial weights, i.e. "1 lb 4 oz"
+    if spelling.startswith(("lb", "pound")) and len(found) > 1:
+        extra, extra_unit, extra_spelling, _ = found[1]
+
+        if extra_unit == GRAMS and extra_spelling.startswith(("oz", "ounce")):
+            amount += extra
+
+    return amount, unit
+
+
+def parse_quantity(text):
+    """
+    Parses a size such as "20oz", "12 fl oz" or "3/4 cup (28g)" into an
+    amount in grams, millilitres or items. Results are memoized, so parsing
+    the few thousand distinct sizes of a catalog over and over is cheap.
+
+    :param text: the size or serving size
+    :return: a :class:`Quantity <Quantity>` or None if the text has no known
+        quantity
+    """
+    if not text:
+        return None
+
+    try:
+        return _memo[text]
+    except KeyError:
+        pass
+    except TypeError:
+        # not hashable, so not a size either
+        return None
+
+    if not isinstance(text, str):
+        return None
+
+    quantity = _parse(text)
+
+    if len(_memo) >= _MAX_MEMOIZED:
+        _memo.clear()
+
+    _memo[text] = quantity
+
+    return quantity
+
+
+def parse_quantities(texts):
+    """
+    Parses a column of sizes at once, each distinct text being parsed only
+    once.
+
+    Amounts are returned as an :class:`array.array` of doubles, NaN where the
+    text couldn't be parsed, alongside an :class:`array.array` of unit codes.
+    Both support the buffer protocol, i.e. ``numpy.frombuffer(amounts)``
+    views them without copying.
+
+    :param texts: iterable of sizes
+    :return: the ``(amounts, units)`` arrays
+    :rtype: :class:`tuple <tuple>`
+    """
+    nan = float("nan")
+    parsed = {}
+    amounts = array.array("d")
+    units = array.array("b")
+
+    for text in texts:
+        try:
+            quantity = parsed[text]
+        except KeyError:
+            quantity = parsed[text] = parse_quantity(text) or (nan, UNKNOWN)
+        except TypeError:
+            quantity = (nan, UNKNOWN)
+
+        amounts.append(quantity[0])
+        units.append(quantity[1])
+
+    return amounts, units
+
+
+def quantity_columns(products):
+    """
+    Parses the ``size`` and ``serving_size`` of products, i.e. the result of
+    :func:`list_products <datakick.api.list_products>` or
+    :func:`search <datakick.api.search>`.
+
+    :param products: sequence of
+        :class:`DatakickProduct <datakick.models.DatakickProduct>` objects
+    :return: a :class:`dict <dict>` mapping ``"size"`` and ``"serving_size"``
+        to their ``(amounts, units)`` arrays, see :func:`parse_quantities`
+    :rtype: :class:`dict <dict>`
+    """
+    return {
+        "size": parse_quantities(product.size for product in products),
+        "serving_size": parse_quantities(
+            product.serving_size for product in products
+        ),
+    }
+
+
+def per_100(products, attributes=NUTRIENTS):
+    """
+    Normalizes nutrients, given per serving, to amounts per 100 grams or per
+    100 millilitres of the product, using the parsed ``serving_size``.
+
+    :param products: sequence of
+        :class:`DatakickProduct <datakick.models.DatakickProduct>` objects
+    :param attributes: names of the nutrients to normalize
+    :return: a :class:`dict <dict>` mapping each nutrient to an
+        :class:`array.array` of doubles, NaN where the nutrient or a serving
+        size in grams or millilitres is missing
+    :rtype: :class:`dict <dict>`
+    """
+    nan = float("nan")
+    amounts, units = parse_quantities(
+        product.serving_size for product in products
+    )
+    scales = [
+        100.0 / amount if unit in (GRAMS, MILLILITRES) and amount else nan
+        for amount, unit in zip(amounts, units)
+    ]
+    columns = {}
+
+    for attribute in attributes:
+        column = array.array("d")
+
+        for product, scale in zip(products, scales):
+            value = getattr(product, attribute)
+
+            if value is None or isinstance(value, bool):
+                column.append(nan)
+                continue
+
+            try:
+                column.append(float(value) * scale)
+            except (TypeError, ValueError):
+                column.append(nan)
+
+        columns[attribute] = column
+
+    return columns
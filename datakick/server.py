@@ -0,0 +1,432 @@
+"""
+datakick.server
+---------------
+
+This module contains the caching proxy run by ``datakick serve``: a local
+HTTP server answering the ``/api/items/{gtin14}`` and ``/api/items?query=``
+requests of many internal services through a single pooled
+:class:`datakick.api.Client` and its cache.
+
+Concurrent requests for the same product or query are coalesced into a single
+upstream request, and ``POST /api/items/batch`` looks up many gtin14s at once.
+Products and images added through the proxy are forwarded upstream and update
+its cache. Services using datakick point their client at the proxy with
+``Client(api_url="http://localhost:8080/api")``; products modified without
+going through it stay cached until ``DELETE /api/items/{gtin14}`` evicts them
+or their ``ttl`` passes.
+
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+from email.parser import BytesParser
+from email.policy import HTTP
+
+import requests
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import parse_qs, unquote, urlsplit
+
+from .exceptions import (
+    CircuitOpenError,
+    DeadlineExceededError,
+    ImageTooLargeError,
+    InvalidImageFormatError,
+)
+from .parallel import imap
+
+# largest request body accepted by the batch endpoint
+_MAX_BODY = 1048576
+# largest image upload, a 1MB image and its multipart headers
+_MAX_IMAGE_BODY = _MAX_BODY + 65536
+
+
+class _Call(object):
+    """Upstream call shared by the requests waiting on its result."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Coalescer(object):
+    """Runs at most one call per key at a time, handing its result, or
+    exception, to every caller that asked for the same key meanwhile."""
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def call(self, key, func, *args):
+        """
+        Returns ``func(*args)``, or the result of the call already running for
+        the key.
+
+        :param key: hashable identifying the call, i.e. ``("find", gtin14)``
+        :param func: callable
+        :return: the result of the call
+        """
+        with self._lock:
+            pending = self._pending.get(key)
+
+            if pending is None:
+                pending = self._pending[key] = _Call()
+                leader = True
+                self.calls += 1
+            else:
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            pending.done.wait()
+
+            if pending.error is not None:
+                raise pending.error
+
+            return pending.result
+
+        try:
+            pending.result = func(*args)
+        except Exception as error:
+            pending.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+            pending.done.set()
+
+        return pending.result
+
+
+def _response_body(product):
+    """Returns a product in the shape the Datakick database returns it."""
+    body = product.as_dict()
+    body["images"] = [{"url": url} for url in body.get("images", [])]
+
+    return body
+
+
+def _error_status(error):
+    """Returns the status code and message answering a failed request."""
+    if isinstance(error, requests.HTTPError):
+        status = getattr(error.response, "status_code", None) or 502
+        return status, "{}".format(error)
+    if isinstance(error, ImageTooLargeError):
+        return 413, "{}".format(error)
+    if isinstance(error, InvalidImageFormatError):
+        return 400, "{}".format(error)
+    if isinstance(error, CircuitOpenError):
+        return 503, "{}".format(error)
+    if isinstance(error, (DeadlineExceededError, requests.Timeout)):
+        return 504, "{}".format(error)
+
+    return 502, "{}: {}".format(type(error).__name__, error)
+
+
+def _image_part(content_type, body):
+    """Returns the ``(filename, content)`` of the ``image`` field of a
+    multipart body, None if it has none."""
+    message = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" +
+        body
+    )
+
+    if not message.is_multipart():
+        return None
+
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+
+        if name == "image":
+            return part.get_filename() or "image.jpg", part.get_payload(
+                decode=True
+            )
+
+    return None
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Routes the requests of the proxy."""
+
+    server_version = "datakick"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(
+                self, format, *args
+            )
+
+    def _send(self, status, body):
+        content = json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+
+        if self.close_connection:
+            self.send_header("Connection", "close")
+
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _reject(self, status, body):
+        """Answers without reading the request body, closing the connection
+        since the unread body would be taken for the next request."""
+        self.close_connection = True
+        self._send(status, body)
+
+    def _send_error(self, error):
+        status, message = _error_status(error)
+        self._send(status, {"error": message})
+
+    def _path(self):
+        """Returns the path segments under ``/api/items`` and the query, None
+        for other paths."""
+        parts = urlsplit(self.path)
+        path = [
+            unquote(segment) for segment in parts.path.strip("/").split("/")
+        ]
+
+        if path[:2] != ["api", "items"]:
+            return None, None
+
+        query = dict(
+            (key, values[0]) for key, values in parse_qs(parts.query).items()
+        )
+
+        return path[2:], query
+
+    def do_GET(self):
+        path, query = self._path()
+
+        if path is None or len(path) > 1:
+            return self._send(404, {"error": "Not Found"})
+
+        try:
+            page = int(query.get("page", 1))
+        except ValueError:
+            return self._send(400, {"error": "Invalid page."})
+
+        try:
+            if path:
+                product = self.server.find_product(path[0])
+                return self._send(200, _response_body(product))
+
+            if "query" in query:
+                products = self.server.search(query["query"])
+            else:
+                products = self.server.list_products(page)
+        except Exception as error:
+            return self._send_error(error)
+
+        self._send(200, [_response_body(product) for product in products])
+
+    def _read_body(self, limit):
+        """Reads the request body, or answers and returns None if its length
+        is invalid or over the limit."""
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+
+        if length < 0:
+            return self._reject(400, {"error": "Invalid Content-Length."})
+        if length > limit:
+            return self._reject(413, {"error": "Request body too large."})
+
+        return self.rfile.read(length)
+
+    def do_POST(self):
+        path, _ = self._path()
+
+        if path is not None and len(path) == 2 and path[1] == "images":
+            return self._add_image(path[0])
+
+        if path != ["batch"]:
+            return self._reject(404, {"error": "Not Found"})
+
+        body = self._read_body(_MAX_BODY)
+
+        if body is None:
+            return
+
+        try:
+            body = json.loads(body.decode("utf-8"))
+
+            if isinstance(body, dict):
+                body = body["gtin14s"]
+
+            gtin14s = [u"{}".format(gtin14) for gtin14 in body]
+        except (KeyError, TypeError, ValueError):
+            return self._send(400, {"error": "Expected a list of gtin14s."})
+
+        if len(gtin14s) > self.server.max_batch:
+            return self._send(413, {"error": "At most {} gtin14s.".format(
+                self.server.max_batch
+            )})
+
+        self._send(200, self.server.find_products(gtin14s))
+
+    def _add_image(self, gtin14):
+        """Forwards a multipart image upload to the Datakick database."""
+        body = self._read_body(_MAX_IMAGE_BODY)
+
+        if body is None:
+            return
+
+        image = _image_part(self.headers.get("Content-Type", ""), body)
+
+        if image is None:
+            return self._send(400, {"error": "Expected an image field."})
+
+        try:
+            image_url = self.server.add_image(gtin14, *image)
+        except Exception as error:
+            return self._send_error(error)
+
+        self._send(200, {"image_url": image_url})
+
+    def do_PUT(self):
+        path, query = self._path()
+
+        if path is None or len(path) != 1:
+            return self._reject(404, {"error": "Not Found"})
+
+        # attributes are sent in the query string, like the Datakick API
+        if self._read_body(_MAX_BODY) is None:
+            return
+
+        try:
+            product = self.server.add_product(path[0], **query)
+        except Exception as error:
+            return self._send_error(error)
+
+        self._send(200, _response_body(product))
+
+    def do_DELETE(self):
+        path, _ = self._path()
+
+        if path is None or len(path) != 1:
+            return self._reject(404, {"error": "Not Found"})
+
+        self.server.invalidate(path[0])
+        self._send(200, {"gtin14": path[0]})
+
+
+class ProxyServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Threaded HTTP server proxying lookups to the Datakick database through
+    a single client.
+
+    ``GET /api/items/{gtin14}``, ``GET /api/items?query=`` and
+    ``GET /api/items?page=`` answer like the Datakick database.
+    ``POST /api/items/batch`` takes a JSON list of gtin14s, or an object with
+    a ``gtin14s`` list, and returns a list in the same order holding each
+    product or an ``{"gtin14", "error", "status"}`` object.
+
+    ``PUT /api/items/{gtin14}`` and ``POST /api/items/{gtin14}/images`` are
+    forwarded upstream, so clients can send every request to the proxy; the
+    cached product is replaced, or evicted after an image upload.
+    ``DELETE /api/items/{gtin14}`` evicts a product modified elsewhere.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, client, concurrency=16, max_batch=1000,
+                 access_log=False):
+        """
+        :param address: ``(host, port)`` to listen on, port 0 picking a free
+            port
+        :param client: :class:`Client <datakick.api.Client>` sending the
+            upstream requests, usually with a cache and a pooled transport
+        :param concurrency: number of upstream requests a batch sends at the
+            same time
+        :param max_batch: maximum number of gtin14s per batch
+        :param access_log: write a line per request to stderr
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, address, _Handler)
+        self.client = client
+        self.concurrency = concurrency
+        self.max_batch = max_batch
+        self.access_log = access_log
+        self.coalescer = _Coalescer()
+
+    @property
+    def url(self):
+        """Base API url of the proxy, to pass as a client's ``api_url``."""
+        host, port = self.server_address[:2]
+        return "http://{}:{}/api".format(host, port)
+
+    def find_product(self, gtin14):
+        """Finds a product, coalescing concurrent lookups of the gtin14."""
+        return self.coalescer.call(
+            ("find", gtin14), self.client.find_product, gtin14
+        )
+
+    def search(self, key):
+        """Searches products, coalescing concurrent identical queries."""
+        return self.coalescer.call(("search", key), self.client.search, key)
+
+    def list_products(self, page):
+        """Lists a page of products, coalescing concurrent requests of the
+        page."""
+        return self.coalescer.call(
+            ("list", page), self.client.list_products, page
+        )
+
+    def add_product(self, gtin14, **kwargs):
+        """Adds or modifies a product upstream, caching the new version."""
+        return self.client.add_product(gtin14, **kwargs)
+
+    def add_image(self, gtin14, filename, content):
+        """Uploads an image upstream and evicts the cached product, whose
+        images changed."""
+        directory = tempfile.mkdtemp()
+        # the client checks the extension and size of the file
+        path = os.path.join(
+            directory, os.path.basename(filename) or "image.jpg"
+        )
+
+        try:
+            with open(path, "wb") as image:
+                image.write(content)
+
+            return self.client.add_image(gtin14, path)
+        finally:
+            shutil.rmtree(directory)
+            self.invalidate(gtin14)
+
+    def invalidate(self, gtin14):
+        """Evicts a product from the cache, i.e. after it was modified
+        without going through the proxy."""
+        if self.client.cache is not None:
+            self.client.cache.delete(gtin14)
+
+    def find_products(self, gtin14s):
+        """Returns the response body of a batch lookup."""
+        results = []
+
+        for gtin14, result in imap(
+            self.find_product, gtin14s, self.concurrency
+        ):
+            if isinstance(result, Exception):
+                status, message = _error_status(result)
+                results.append(
+                    {"gtin14": gtin14, "error": message, "status": status}
+                )
+            else:
+                results.append(_response_body(result))
+
+        return results
+
+    def server_close(self):
+        BaseHTTPServer.HTTPServer.server_close(self)
+        self.client.close()
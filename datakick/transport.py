@@ -0,0 +1,285 @@
+"""
+datakick.transport
+------------------
+
+This module contains the transports used by :class:`datakick.api.Client` to
+send requests to the Datakick database.
+
+Every transport returns responses with a ``status_code``, a ``json()`` method
+and a ``raise_for_status()`` method raising :class:`requests.HTTPError`, so the
+API behaves the same no matter which transport is used.
+
+"""
+
+import copy
+import itertools
+import json
+import os
+import threading
+
+from six.moves.urllib.parse import parse_qs, urlencode, urlsplit
+
+_PAGE_SIZE = 100
+
+
+class Response(object):
+    """Response returned by the transports that don't use requests."""
+
+    def __init__(self, status_code, content, url, reason=None):
+        self.status_code = status_code
+        self.content = content
+        self.url = url
+        self.reason = reason or ""
+
+    def json(self):
+        """Decodes the JSON body of the response."""
+        return json.loads(self.content.decode("utf-8"))
+
+    def raise_for_status(self):
+        """Raises :class:`requests.HTTPError` for 4xx and 5xx responses, just
+        like :meth:`requests.Response.raise_for_status`."""
+        if self.status_code < 400:
+            return
+
+        import requests
+
+        kind = "Client" if self.status_code < 500 else "Server"
+
+        raise requests.HTTPError(
+            "{} {} Error: {} for url: {}".format(
+                self.status_code, kind, self.reason, self.url
+            ),
+            response=self
+        )
+
+
+class Transport(object):
+    """Interface of the transports."""
+
+    def request(self, method, url, params=None, files=None, timeout=None):
+        """
+        Sends a request and returns its response.
+
+        :param method: ``"GET"``, ``"PUT"`` or ``"POST"``
+        :param url: the url of the request
+        :param params: :class:`dict <dict>` of query string parameters
+        :param files: :class:`dict <dict>` of files to upload as a multipart
+            form, mapping field names to open files
+        :param timeout: ``(connect, read)`` :class:`tuple <tuple>` of seconds
+            or None to wait forever
+        :raises requests.RequestException: if the request couldn't be sent,
+            :class:`requests.Timeout` if it timed out
+        :return: the response
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Releases the connections held by the transport."""
+
+
+class RequestsTransport(Transport):
+    """Sends requests with the requests package. By default the top-level
+    requests functions are used, pass a :class:`requests.Session` to reuse
+    connections."""
+
+    def __init__(self, session=None):
+        self.session = session
+
+    def request(self, method, url, params=None, files=None, timeout=None):
+        import requests
+
+        kwargs = {}
+
+        if params is not None:
+            kwargs["params"] = params
+        if files is not None:
+            kwargs["files"] = files
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+
+        sender = self.session if self.session is not None else requests
+
+        return getattr(sender, method.lower())(url, **kwargs)
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+
+
+def _requests_error(error):
+    """Returns the requests exception raised by requests for the urllib3
+    exception, so that both transports raise the same errors."""
+    import requests
+    import urllib3
+
+    exceptions = urllib3.exceptions
+
+    if isinstance(error, exceptions.MaxRetryError) and error.reason:
+        error = error.reason
+
+    # NewConnectionError subclasses ConnectTimeoutError, check it first
+    if isinstance(error, (exceptions.NewConnectionError,
+                          exceptions.ProtocolError)):
+        return requests.ConnectionError(error)
+    if isinstance(error, exceptions.ConnectTimeoutError):
+        return requests.ConnectTimeout(error)
+    if isinstance(error, exceptions.ReadTimeoutError):
+        return requests.ReadTimeout(error)
+    if isinstance(error, exceptions.TimeoutError):
+        return requests.Timeout(error)
+
+    return requests.ConnectionError(error)
+
+
+class Urllib3Transport(Transport):
+    """Sends requests straight through a :class:`urllib3.PoolManager`,
+    skipping the per-request overhead of requests. Meant for high throughput
+    use with many threads."""
+
+    def __init__(self, num_pools=10, maxsize=10, pool_manager=None):
+        """
+        :param num_pools: number of connection pools to cache
+        :param maxsize: number of connections kept per host, set it to the
+            number of threads making requests
+        :param pool_manager: a :class:`urllib3.PoolManager` to use instead of
+            creating one
+        """
+        if pool_manager is None:
+            import urllib3
+
+            pool_manager = urllib3.PoolManager(
+                num_pools=num_pools, maxsize=maxsize, retries=False
+            )
+
+        self.pool_manager = pool_manager
+
+    def request(self, method, url, params=None, files=None, timeout=None):
+        import urllib3
+
+        if params:
+            url = "{}{}{}".format(
+                url, "&" if "?" in url else "?", urlencode(params)
+            )
+
+        fields = None
+
+        if files is not None:
+            fields = dict(
+                (name, (os.path.basename(getattr(f, "name", name)), f.read()))
+                for name, f in files.items()
+            )
+
+        kwargs = {"fields": fields}
+
+        if timeout is not None:
+            connect, read = timeout
+            kwargs["timeout"] = urllib3.Timeout(connect=connect, read=read)
+
+        try:
+            resp = self.pool_manager.request(method, url, **kwargs)
+        except urllib3.exceptions.HTTPError as error:
+            raise _requests_error(error)
+
+        return Response(resp.status, resp.data, url, resp.reason)
+
+    def close(self):
+        self.pool_manager.clear()
+
+
+class FakeTransport(Transport):
+    """In-memory stand-in for the Datakick database, for tests and
+    benchmarks. Every request sent is recorded in :attr:`requests`."""
+
+    def __init__(self, products=()):
+        """
+        :param products: iterable of product :class:`dict <dict>` as returned
+            by the Datakick database
+        """
+        self.products = dict(
+            (product["gtin14"], copy.deepcopy(product)) for product in products
+        )
+        self.requests = []
+        self._image_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def request(self, method, url, params=None, files=None, timeout=None):
+        parts = urlsplit(url)
+        query = dict(
+            (key, values[0]) for key, values in parse_qs(parts.query).items()
+        )
+        path = parts.path.rstrip("/").split("/")[3:]
+
+        with self._lock:
+            self.requests.append((method, url))
+
+            if path and method == "GET" and len(path) == 1:
+                return self._find(url, path[0])
+            if path and method == "PUT" and len(path) == 1:
+                return self._add(url, path[0], params or {})
+            if path[1:] == ["images"] and method == "POST":
+                return self._add_image(url, path[0])
+            if not path and method == "GET" and "query" in query:
+                return self._search(url, query["query"])
+            if not path and method == "GET":
+                return self._list(url, int(query.get("page", 1)))
+
+        return self._response(url, 404, {"error": "Not Found"})
+
+    def _response(self, url, status_code, body):
+        reasons = {200: "OK", 404: "Not Found"}
+
+        return Response(
+            status_code, json.dumps(body).encode("utf-8"), url,
+            reasons.get(status_code)
+        )
+
+    def _find(self, url, gtin14):
+        product = self.products.get(gtin14)
+
+        if product is None:
+            return self._response(url, 404, {"error": "Not Found"})
+
+        return self._response(url, 200, product)
+
+    def _add(self, url, gtin14, params):
+        product = self.products.setdefault(
+            gtin14, {"gtin14": gtin14, "images": []}
+        )
+        product.update(params)
+
+        return self._response(url, 200, product)
+
+    def _add_image(self, url, gtin14):
+        product = self.products.get(gtin14)
+
+        if product is None:
+            return self._response(url, 404, {"error": "Not Found"})
+
+        image_id = next(self._image_ids)
+        image_url = "https://images.example.com/{}.jpg".format(image_id)
+        product.setdefault("images", []).append({"url": image_url})
+
+        return self._response(url, 200, {"id": image_id, "image_url": image_url})
+
+    def _list(self, url, page):
+        gtin14s = sorted(self.products)[(page - 1) * _PAGE_SIZE:][:_PAGE_SIZE]
+
+        return self._response(
+            url, 200, [self.products[gtin14] for gtin14 in gtin14s]
+        )
+
+    def _search(self, url, key):
+        words = key.lower().split()
+        matches = []
+
+        for gtin14 in sorted(self.products):
+            product = self.products[gtin14]
+            text = u" ".join(
+                u"{}".format(product.get(field) or "")
+                for field in ("name", "brand_name")
+            ).lower()
+
+            if all(word in text for word in words):
+                matches.append(product)
+
+        return self._response(url, 200, matches)
@@ -0,0 +1,269 @@
+"""
+datakick.warming
+----------------
+
+This module contains the tools to warm a cache after a restart: a compact
+sketch of the most requested products, which can be persisted to disk, and a
+warmer prefetching the hottest of them.
+
+"""
+
+import gzip
+import heapq
+import json
+import threading
+import time
+
+from .parallel import imap
+
+
+class SpaceSaving(object):
+    """Top-k sketch of the most frequently requested gtin14s, using the
+    Space-Saving algorithm.
+
+    At most ``k`` gtin14s are tracked. When a new gtin14 is recorded while the
+    sketch is full, it replaces the least frequent one and inherits its count,
+    so a count overestimates the true frequency by at most its ``error``.
+    """
+
+    def __init__(self, k=10000):
+        """
+        :param k: number of gtin14s tracked
+        """
+        self.k = k
+        self.total = 0
+        self._counts = {}
+        self._errors = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, gtin14):
+        return gtin14 in self._counts
+
+    def record(self, gtin14, count=1):
+        """Records requests of a gtin14.
+
+        :param gtin14: barcode (ean/upc)
+        :param count: number of requests
+        :return: None
+        """
+        with self._lock:
+            self.total += count
+
+            if gtin14 not in self._counts and len(self._counts) >= self.k:
+                minimum, evicted = self._pop_minimum()
+                del self._counts[evicted]
+                del self._errors[evicted]
+                self._counts[gtin14] = minimum
+                self._errors[gtin14] = minimum
+
+            self._counts[gtin14] = self._counts.get(gtin14, 0) + count
+            self._errors.setdefault(gtin14, 0)
+            heapq.heappush(self._heap, (self._counts[gtin14], gtin14))
+
+            # the heap holds outdated counts, rebuild it before it grows large
+            if len(self._heap) > 4 * self.k:
+                self._heap = [(c, g) for g, c in self._counts.items()]
+                heapq.heapify(self._heap)
+
+    def _pop_minimum(self):
+        """Pops the least frequent gtin14, skipping outdated heap entries."""
+        while True:
+            count, gtin14 = heapq.heappop(self._heap)
+
+            if self._counts.get(gtin14) == count:
+                return count, gtin14
+
+    def count(self, gtin14):
+        """Returns the estimated number of requests of a gtin14.
+
+        :param gtin14: barcode (ean/upc)
+        :rtype: :class:`int <int>`
+        """
+        return self._counts.get(gtin14, 0)
+
+    def top(self, n=None):
+        """Returns the ``n`` most requested gtin14s, most requested first.
+
+        :param n: number of gtin14s or None for all of them
+        :return: a :class:`list <list>` of ``(gtin14, count)``
+            :class:`tuple <tuple>`
+        :rtype: :class:`list <list>`
+        """
+        with self._lock:
+            items = sorted(
+                self._counts.items(), key=lambda item: (-item[1], item[0])
+            )
+
+        return items if n is None else items[:n]
+
+    def save(self, path):
+        """Writes the sketch to a gzip compressed JSON file.
+
+        :param path: path of the file
+        :return: None
+        """
+        with self._lock:
+            data = {
+                "k": self.k,
+                "total": self.total,
+                "entries": [
+                    [gtin14, count, self._errors[gtin14]]
+                    for gtin14, count in self._counts.items()
+                ],
+            }
+
+        with gzip.open(path, "wb") as output:
+            output.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+
+    @classmethod
+    def load(cls, path):
+        """Creates a :class:`SpaceSaving <SpaceSaving>` sketch from a file
+        written by :meth:`save`.
+
+        :param path: path of the file
+        :return: :class:`SpaceSaving <SpaceSaving>` object
+        """
+        with gzip.open(path, "rb") as lines:
+            data = json.loads(lines.read().decode("utf-8"))
+
+        sketch = cls(data["k"])
+        sketch.total = data["total"]
+
+        for gtin14, count, error in data["entries"]:
+            sketch._counts[gtin14] = count
+            sketch._errors[gtin14] = error
+            sketch._heap.append((count, gtin14))
+
+        heapq.heapify(sketch._heap)
+
+        return sketch
+
+
+def _throttle(items, rate):
+    """Yields the items no faster than ``rate`` per second."""
+    interval = 1.0 / rate if rate else 0.0
+    next_slot = time.time()
+
+    for item in items:
+        if interval:
+            now = time.time()
+
+            if next_slot > now:
+                time.sleep(next_slot - now)
+
+            next_slot = max(now, next_slot) + interval
+
+        yield item
+
+
+class Warming(threading.Thread):
+    """Background prefetch of the hottest products, started by :func:`warm`.
+    """
+
+    def __init__(self, client, entries, total, concurrency, rate):
+        super(Warming, self).__init__()
+        self.daemon = True
+        self.warmed = 0
+        self.failed = 0
+        self._client = client
+        self._entries = entries
+        self._total = total
+        self._concurrency = concurrency
+        self._rate = rate
+        self._weight = 0
+        self._progress = threading.Condition()
+
+    @property
+    def hit_rate(self):
+        """Share of the recorded requests that were for products warmed so
+        far, i.e. the hit rate expected if traffic doesn't change."""
+        return float(self._weight) / self._total if self._total else 1.0
+
+    def run(self):
+        counts = dict(self._entries)
+        gtin14s = _throttle((gtin14 for gtin14, _ in self._entries), self._rate)
+        # prefetches aren't requests, they mustn't add to the sketch
+        results = imap(
+            self._client._lookup, gtin14s, self._concurrency, ordered=False
+        )
+
+        try:
+            for gtin14, product in results:
+                with self._progress:
+                    if isinstance(product, Exception):
+                        self.failed += 1
+                    else:
+                        self.warmed += 1
+                        self._weight += counts[gtin14]
+
+                    self._progress.notify_all()
+        finally:
+            with self._progress:
+                self._progress.notify_all()
+
+    def wait(self, hit_rate=None, timeout=None):
+        """Blocks until the expected hit rate is reached or, if ``hit_rate``
+        is None, until every product was prefetched.
+
+        :param hit_rate: expected hit rate to wait for, between 0 and 1
+        :param timeout: maximum number of seconds to wait
+        :return: True if the target was reached, False on timeout or if
+            warming finished without reaching it
+        :rtype: :class:`bool <bool>`
+        """
+        if hit_rate is None:
+            self.join(timeout)
+            return not self.is_alive()
+
+        deadline = None if timeout is None else time.time() + timeout
+
+        with self._progress:
+            while self.hit_rate < hit_rate and self.is_alive():
+                remaining = None if deadline is None else deadline - time.time()
+
+                if remaining is not None and remaining <= 0:
+                    break
+
+                self._progress.wait(
+                    0.1 if remaining is None else min(remaining, 0.1)
+                )
+
+            return self.hit_rate >= hit_rate
+
+
+def warm(client, sketch, count=None, concurrency=8, rate=None, block=False,
+         target_hit_rate=None, timeout=None):
+    """
+    Prefetches the most requested products of the sketch through the client,
+    so that its cache is warm after a restart.
+
+    Products are fetched most requested first, like
+    :meth:`find_products <datakick.api.Client.find_products>` but without
+    recording them in the client's ``access_sketch``, starting at most
+    ``rate`` requests per second.
+
+    :param client: :class:`Client <datakick.api.Client>` with a cache
+    :param sketch: :class:`SpaceSaving <SpaceSaving>` sketch of the requests
+    :param count: number of products to prefetch or None for all of them
+    :param concurrency: number of requests running at the same time
+    :param rate: maximum number of requests per second or None for no limit
+    :param block: wait for warming to finish, or to reach
+        ``target_hit_rate``, before returning
+    :param target_hit_rate: expected hit rate to wait for when blocking,
+        the rest of the products are prefetched in the background
+    :param timeout: maximum number of seconds to block
+    :return: the running :class:`Warming <Warming>`
+    """
+    warming = Warming(
+        client, sketch.top(count), sketch.total, concurrency, rate
+    )
+    warming.start()
+
+    if block:
+        warming.wait(target_hit_rate, timeout)
+
+    return warming
@@ -22,20 +22,26 @@ setup(
         'Intended Audience :: Developers',
         'Topic :: Software Development :: Libraries :: Python Modules',
         'License :: OSI Approved :: MIT License',
-        'Programming Language :: Python :: 2.7',
-        'Programming Language :: Python :: 3.2',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
     keywords="datakick barcode upc ean product",
+    python_requires=">=3.7",
     packages=find_packages(exclude=["contrib", "docs", "tests"]),
     install_requires=["requests", "six"],
     extras_require={
         "dev": [],
+        "parquet": ["pyarrow"],
         "test": ["mock", "requests", "six"]
     },
     package_data={},
     data_files=[],
-    entry_points={},
+    entry_points={
+        "console_scripts": ["datakick=datakick.cli:main"],
+    },
 )
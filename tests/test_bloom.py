@@ -0,0 +1,117 @@
+"""Unittest for datakick.bloom module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+from datakick.api import Client
+from datakick.bloom import BloomFilter
+from datakick.models import DatakickProduct
+from datakick.transport import FakeTransport
+
+
+def _gtin14s(start, stop):
+    return ["{:014d}".format(i) for i in range(start, stop)]
+
+
+class TestBloomFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "known.bloom")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter.build(_gtin14s(0, 5000))
+
+        self.assertTrue(all(gtin14 in bloom for gtin14 in _gtin14s(0, 5000)))
+        self.assertEqual(5000, len(bloom))
+
+    def test_error_rate(self):
+        bloom = BloomFilter.build(_gtin14s(0, 5000), error_rate=0.01)
+        false_positives = sum(
+            gtin14 in bloom for gtin14 in _gtin14s(10000, 30000)
+        )
+
+        self.assertLess(false_positives / 20000.0, 0.02)
+        self.assertAlmostEqual(0.01, bloom.error_rate, places=2)
+
+    def test_memory_budget(self):
+        bloom = BloomFilter.build(_gtin14s(0, 5000), max_bytes=1024)
+
+        self.assertEqual(1024 * 8, bloom.num_bits)
+        self.assertGreater(bloom.error_rate, 0.01)
+        self.assertIn(_gtin14s(0, 1)[0], bloom)
+
+    def test_build_from_products(self):
+        bloom = BloomFilter.build([DatakickProduct({"gtin14": "1"})])
+
+        self.assertIn("1", bloom)
+
+    def test_upc_padded(self):
+        bloom = BloomFilter(10)
+        bloom.add("016000275287")
+
+        self.assertIn("00016000275287", bloom)
+
+    def test_invalid_error_rate(self):
+        self.assertRaises(ValueError, BloomFilter, 10, 0)
+
+    def test_save_load(self):
+        bloom = BloomFilter.build(_gtin14s(0, 100))
+        bloom.save(self.path)
+
+        for use_mmap in (False, True):
+            loaded = BloomFilter.load(self.path, use_mmap=use_mmap)
+
+            self.assertEqual(100, len(loaded))
+            self.assertEqual(bloom.num_hashes, loaded.num_hashes)
+            self.assertTrue(all(g in loaded for g in _gtin14s(0, 100)))
+
+            loaded.add("12345")
+            self.assertIn("12345", loaded)
+            loaded.close()
+
+        # gtin14s added to a mapped filter aren't written to the file
+        self.assertNotIn("12345", BloomFilter.load(self.path))
+
+    def test_load_invalid(self):
+        with open(self.path, "wb") as output:
+            output.write(b"not a bloom filter")
+
+        self.assertRaises(ValueError, BloomFilter.load, self.path)
+
+
+class TestClientKnownGtin14s(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeTransport([{"gtin14": "00000000000001"}])
+        self.bloom = BloomFilter.build(["00000000000001"])
+        self.client = Client(self.fake, known_gtin14s=self.bloom)
+
+    def test_unknown_answered_locally(self):
+        with self.assertRaises(requests.HTTPError) as context:
+            self.client.find_product("00000000000002")
+
+        self.assertEqual(404, context.exception.response.status_code)
+        self.assertEqual([], self.fake.requests)
+
+    def test_known_fetched(self):
+        product = self.client.find_product("00000000000001")
+
+        self.assertEqual("00000000000001", product.gtin14)
+        self.assertEqual(1, len(self.fake.requests))
+
+    def test_add_product_updates_filter(self):
+        self.client.add_product("00000000000002", name="new")
+
+        self.assertEqual("new", self.client.find_product("00000000000002").name)
+
+
+if __name__ == "__main__":
+    unittest.main()
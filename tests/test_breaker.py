@@ -0,0 +1,229 @@
+"""Unittest for datakick.breaker module."""
+
+import unittest
+
+import requests
+
+from datakick.api import Client
+from datakick.breaker import CircuitBreaker
+from datakick.cache import MemoryCache
+from datakick.exceptions import CircuitOpenError
+from datakick.models import DatakickProduct
+from datakick.transport import FakeTransport, Response
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+class _FlakyTransport(FakeTransport):
+    """Fake transport failing while :attr:`down` is True."""
+
+    down = False
+    status_code = None
+
+    def request(self, method, url, params=None, files=None, timeout=None):
+        if self.down:
+            self.requests.append((method, url))
+
+            if self.status_code is not None:
+                return Response(self.status_code, b"{}", url)
+
+            raise requests.ConnectionError("down")
+
+        return super(_FlakyTransport, self).request(method, url, params, files)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def test_opens_on_failure_rate(self):
+        breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4)
+
+        for success in (True, False, True):
+            self.assertTrue(breaker.allow())
+            breaker.record(success)
+
+        self.assertEqual("closed", breaker.state)
+        breaker.record(False)
+        self.assertEqual("open", breaker.state)
+        self.assertFalse(breaker.allow())
+
+    def test_needs_min_calls(self):
+        breaker = CircuitBreaker(window=10, min_calls=5)
+
+        for _ in range(4):
+            breaker.record(False)
+
+        self.assertEqual("closed", breaker.state)
+
+    def test_opens_on_slow_calls(self):
+        breaker = CircuitBreaker(
+            slow_call_duration=1.0, slow_call_rate=0.5, window=2, min_calls=2
+        )
+
+        breaker.record(True, 0.1)
+        breaker.record(True, 2.0)
+
+        self.assertEqual("open", breaker.state)
+
+    def test_window_forgets_old_calls(self):
+        breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4)
+
+        breaker.record(False)
+        for _ in range(4):
+            breaker.record(True)
+        breaker.record(False)
+
+        self.assertEqual("closed", breaker.state)
+
+    @mock.patch("datakick.breaker.time.time")
+    def test_half_open_probe_closes(self, time):
+        time.return_value = 100.0
+        breaker = CircuitBreaker(window=1, min_calls=1, reset_timeout=30)
+        breaker.record(False)
+
+        time.return_value = 129.0
+        self.assertFalse(breaker.allow())
+
+        time.return_value = 130.0
+        self.assertEqual("half-open", breaker.state)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+
+        breaker.record(True)
+        self.assertEqual("closed", breaker.state)
+        self.assertTrue(breaker.allow())
+
+    @mock.patch("datakick.breaker.time.time")
+    def test_half_open_needs_every_probe(self, time):
+        time.return_value = 100.0
+        breaker = CircuitBreaker(
+            window=1, min_calls=1, reset_timeout=30, half_open_calls=3
+        )
+        breaker.record(False)
+
+        time.return_value = 130.0
+
+        for _ in range(3):
+            self.assertTrue(breaker.allow())
+
+        breaker.record(True)
+        breaker.record(True)
+        self.assertEqual("half-open", breaker.state)
+        self.assertFalse(breaker.allow())
+
+        breaker.record(True)
+        self.assertEqual("closed", breaker.state)
+
+    @mock.patch("datakick.breaker.time.time")
+    def test_half_open_probe_reopens(self, time):
+        time.return_value = 100.0
+        breaker = CircuitBreaker(window=1, min_calls=1, reset_timeout=30)
+        breaker.record(False)
+
+        time.return_value = 130.0
+        self.assertTrue(breaker.allow())
+        breaker.record(False)
+
+        self.assertEqual("open", breaker.state)
+        self.assertFalse(breaker.allow())
+
+        time.return_value = 160.0
+        self.assertTrue(breaker.allow())
+
+
+class TestClientBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = _FlakyTransport([{"gtin14": "1", "name": "MyName"}])
+
+        def factory():
+            return CircuitBreaker(window=2, min_calls=2, reset_timeout=60)
+
+        self.cache = MemoryCache()
+        self.client = Client(
+            self.fake, cache=self.cache, ttl=60, circuit_breaker=factory
+        )
+
+    def _trip(self, endpoint="find_product"):
+        self.fake.down = True
+
+        for _ in range(2):
+            self.assertRaises(
+                requests.ConnectionError, self.client.find_product, "3"
+            )
+
+        self.assertEqual("open", self.client.breakers[endpoint].state)
+        del self.fake.requests[:]
+
+    def test_breaker_per_endpoint(self):
+        self._trip()
+
+        self.assertEqual("closed", self.client.breakers["search"].state)
+        self.fake.down = False
+        self.assertEqual(1, len(self.client.search("MyName")))
+
+    def test_fails_fast_when_open(self):
+        self._trip()
+
+        self.assertRaises(CircuitOpenError, self.client.find_product, "1")
+        self.assertEqual([], self.fake.requests)
+
+    def test_serves_stale_copy_when_open(self):
+        cached = DatakickProduct({"gtin14": "1", "name": "Old"})
+        self.cache.set("1", cached, stored_at=1.0)
+        self._trip()
+
+        product = self.client.find_product("1")
+
+        self.assertEqual("Old", product.name)
+        self.assertTrue(product.stale)
+        self.assertFalse(cached.stale)
+        self.assertEqual([], self.fake.requests)
+
+    def test_not_found_isnt_a_failure(self):
+        for _ in range(3):
+            self.assertRaises(
+                requests.HTTPError, self.client.find_product, "404"
+            )
+
+        self.assertEqual("closed", self.client.breakers["find_product"].state)
+
+    def test_server_errors_are_failures(self):
+        self.fake.down = True
+        self.fake.status_code = 503
+
+        for _ in range(2):
+            self.assertRaises(
+                requests.HTTPError, self.client.find_product, "1"
+            )
+
+        self.assertEqual("open", self.client.breakers["find_product"].state)
+
+    def test_overload_errors_are_failures(self):
+        self.fake.down = True
+
+        for status_code in (429, 408):
+            self.fake.status_code = status_code
+            self.assertRaises(
+                requests.HTTPError, self.client.find_product, "1"
+            )
+
+        self.assertEqual("open", self.client.breakers["find_product"].state)
+
+    def test_no_breakers_by_default(self):
+        client = Client(self.fake)
+        self.fake.down = True
+
+        for _ in range(5):
+            self.assertRaises(
+                requests.ConnectionError, client.find_product, "1"
+            )
+
+        self.assertEqual({}, client.breakers)
+        self.assertEqual(5, len(self.fake.requests))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,299 @@
+"""Unittest for datakick.cache module."""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from datakick.api import Client
+from datakick.cache import MemoryCache, SharedMemoryCache, _SEQ
+from datakick.models import DatakickProduct
+from datakick.transport import FakeTransport
+
+
+def _product(gtin14, **kwargs):
+    kwargs["gtin14"] = gtin14
+    kwargs.setdefault("images", [{"url": "someurl_1"}])
+    return DatakickProduct(kwargs)
+
+
+def _write_entries(path, first, last):
+    """Writes products to a shared cache from another process."""
+    cache = SharedMemoryCache(path)
+
+    for i in range(first, last):
+        cache.set(str(i), _product(str(i), name="Name {}".format(i)))
+
+    cache.close()
+
+
+class TestMemoryCache(unittest.TestCase):
+
+    def test_get_set(self):
+        cache = MemoryCache()
+        product = _product("1")
+
+        self.assertEqual(None, cache.get("1"))
+        self.assertTrue(cache.set("1", product, stored_at=10.0))
+        self.assertEqual((product, 10.0), cache.get("1"))
+
+    def test_evicts_least_recently_used(self):
+        cache = MemoryCache(max_size=2)
+        cache.set("1", _product("1"))
+        cache.set("2", _product("2"))
+        cache.get("1")
+        cache.set("3", _product("3"))
+
+        self.assertEqual(None, cache.get("2"))
+        self.assertNotEqual(None, cache.get("1"))
+        self.assertEqual(2, len(cache))
+
+    def test_delete_clear(self):
+        cache = MemoryCache()
+        cache.set("1", _product("1"))
+        cache.set("2", _product("2"))
+        cache.delete("1")
+
+        self.assertEqual(None, cache.get("1"))
+
+        cache.clear()
+
+        self.assertEqual(0, len(cache))
+
+
+class TestSharedMemoryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "cache")
+        self.cache = SharedMemoryCache(
+            self.path, num_buckets=64, bucket_size=4, slot_size=512, stripes=8
+        )
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.directory)
+
+    def test_get_set(self):
+        product = _product("00000000000001", name="MyName")
+
+        self.assertEqual(None, self.cache.get("00000000000001"))
+        self.assertTrue(self.cache.set("00000000000001", product, 10.0))
+
+        cached, stored_at = self.cache.get("00000000000001")
+
+        self.assertEqual(product.as_dict(), cached.as_dict())
+        self.assertEqual(10.0, stored_at)
+
+    def test_overwrite(self):
+        self.cache.set("1", _product("1", name="Old"))
+        self.cache.set("1", _product("1", name="New"))
+
+        self.assertEqual("New", self.cache.get("1")[0].name)
+
+    def test_shared_between_instances(self):
+        self.cache.set("1", _product("1", name="MyName"))
+        other = SharedMemoryCache(self.path, num_buckets=1)
+
+        try:
+            self.assertEqual(64, other.num_buckets)
+            self.assertEqual("MyName", other.get("1")[0].name)
+        finally:
+            other.close()
+
+    def test_shared_between_processes(self):
+        processes = [
+            multiprocessing.Process(
+                target=_write_entries, args=(self.path, i * 10, i * 10 + 10)
+            )
+            for i in range(3)
+        ]
+
+        for process in processes:
+            process.start()
+
+        for process in processes:
+            process.join()
+
+        found = dict(
+            (i, self.cache.get(str(i))) for i in range(30)
+            if self.cache.get(str(i)) is not None
+        )
+
+        self.assertEqual([0, 0, 0], [p.exitcode for p in processes])
+        # 30 keys in 256 slots, only a full bucket evicts entries
+        self.assertGreater(len(found), 25)
+
+        for i, (product, _) in found.items():
+            self.assertEqual("Name {}".format(i), product.name)
+
+    def test_evicts_oldest_in_bucket(self):
+        cache = SharedMemoryCache(
+            os.path.join(self.directory, "small"), num_buckets=1,
+            bucket_size=2, slot_size=512
+        )
+
+        try:
+            cache.set("1", _product("1"), stored_at=1.0)
+            cache.set("2", _product("2"), stored_at=2.0)
+            cache.set("3", _product("3"), stored_at=3.0)
+
+            self.assertEqual(None, cache.get("1"))
+            self.assertNotEqual(None, cache.get("2"))
+            self.assertNotEqual(None, cache.get("3"))
+        finally:
+            cache.close()
+
+    def test_overwrite_after_delete(self):
+        cache = SharedMemoryCache(
+            os.path.join(self.directory, "small"), num_buckets=1,
+            bucket_size=2, slot_size=512
+        )
+
+        try:
+            cache.set("1", _product("1"))
+            cache.set("2", _product("2", name="Old"))
+            cache.delete("1")
+            cache.set("2", _product("2", name="New"))
+
+            # the key was rewritten in place rather than in the freed slot
+            slots = [cache._read(offset) for offset in cache._offsets(0)]
+            self.assertEqual([b"2"], [slot[0] for slot in slots if slot])
+            self.assertEqual("New", cache.get("2")[0].name)
+        finally:
+            cache.close()
+
+    def test_compresses_large_products(self):
+        product = _product("1", ingredients="Sugar, " * 200)
+
+        self.assertTrue(self.cache.set("1", product))
+        self.assertEqual(
+            product.ingredients, self.cache.get("1")[0].ingredients
+        )
+
+    def test_rejects_too_large_products(self):
+        product = _product("1", ingredients=os.urandom(1024).hex())
+
+        self.assertFalse(self.cache.set("1", product))
+        self.assertEqual(None, self.cache.get("1"))
+
+    def test_read_retries_while_written(self):
+        self.cache.set("1", _product("1"))
+        bucket = self.cache._bucket(b"1")
+
+        for offset in self.cache._offsets(bucket):
+            seq = _SEQ.unpack_from(self.cache._map, offset)[0]
+            _SEQ.pack_into(self.cache._map, offset, seq | 1)
+
+        self.assertEqual(None, self.cache.get("1"))
+
+    def test_delete_clear(self):
+        self.cache.set("1", _product("1"))
+        self.cache.set("2", _product("2"))
+        self.cache.delete("1")
+
+        self.assertEqual(None, self.cache.get("1"))
+        self.assertNotEqual(None, self.cache.get("2"))
+
+        self.cache.clear()
+
+        self.assertEqual(None, self.cache.get("2"))
+
+    def test_not_a_cache(self):
+        path = os.path.join(self.directory, "other")
+
+        with open(path, "wb") as other:
+            other.write(b"x" * 64)
+
+        self.assertRaises(ValueError, SharedMemoryCache, path)
+
+    def test_key_too_long(self):
+        self.assertRaises(ValueError, self.cache.get, "1" * 33)
+
+
+class TestClientCache(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeTransport([{"gtin14": "1", "name": "MyName"}])
+
+    def test_find_product_cached(self):
+        client = Client(self.fake, cache=MemoryCache())
+
+        client.find_product("1")
+        product = client.find_product("1")
+
+        self.assertEqual("MyName", product.name)
+        self.assertEqual(1, len(self.fake.requests))
+
+    def test_find_product_expired(self):
+        cache = MemoryCache()
+        client = Client(self.fake, cache=cache, ttl=60)
+        cache.set("1", _product("1", name="Old"), stored_at=1.0)
+
+        self.assertEqual("MyName", client.find_product("1").name)
+        self.assertEqual(1, len(self.fake.requests))
+
+    def test_add_product_cached(self):
+        client = Client(self.fake, cache=MemoryCache())
+
+        client.add_product("1", name="NewName")
+
+        self.assertEqual("NewName", client.find_product("1").name)
+        self.assertEqual(1, len(self.fake.requests))
+
+    def test_find_product_stale_while_revalidate(self):
+        cache = MemoryCache()
+        client = Client(self.fake, cache=cache, ttl=60, stale_ttl=60)
+        cache.set("1", _product("1", name="Old"), stored_at=time.time() - 90)
+
+        self.assertEqual("Old", client.find_product("1").name)
+        self.assertTrue(client._refresher.wait(5))
+        self.assertEqual("MyName", client.find_product("1").name)
+        self.assertEqual(1, len(self.fake.requests))
+        client.close()
+
+    def test_find_product_too_stale(self):
+        cache = MemoryCache()
+        client = Client(self.fake, cache=cache, ttl=60, stale_ttl=60)
+        cache.set("1", _product("1", name="Old"), stored_at=time.time() - 150)
+
+        self.assertEqual("MyName", client.find_product("1").name)
+
+    def test_find_product_refresh_ahead_hot(self):
+        cache = MemoryCache()
+        client = Client(
+            self.fake, cache=cache, ttl=60, refresh_ahead=0.25, refresh_hits=2
+        )
+        cache.set("1", _product("1", name="Old"), stored_at=time.time() - 50)
+
+        self.assertEqual("Old", client.find_product("1").name)
+        self.assertEqual([], self.fake.requests)
+        self.assertEqual("Old", client.find_product("1").name)
+        self.assertTrue(client._refresher.wait(5))
+        self.assertEqual(1, len(self.fake.requests))
+        self.assertEqual("MyName", cache.get("1")[0].name)
+        client.close()
+
+    def test_find_product_refresh_ahead_not_due(self):
+        cache = MemoryCache()
+        client = Client(
+            self.fake, cache=cache, ttl=60, refresh_ahead=0.25, refresh_hits=1
+        )
+        cache.set("1", _product("1", name="Old"), stored_at=time.time() - 10)
+
+        client.find_product("1")
+
+        self.assertTrue(client._refresher.wait(5))
+        self.assertEqual([], self.fake.requests)
+
+    def test_refresh_failure_keeps_stale_product(self):
+        cache = MemoryCache()
+        client = Client(self.fake, cache=cache, ttl=60, stale_ttl=60)
+        cache.set("2", _product("2", name="Old"), stored_at=time.time() - 90)
+
+        self.assertEqual("Old", client.find_product("2").name)
+        self.assertTrue(client._refresher.wait(5))
+        self.assertEqual("Old", client.find_product("2").name)
+        client.close()
@@ -0,0 +1,196 @@
+"""Unittest for datakick.cli module."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+import requests
+
+from datakick import cli
+
+
+def _get(url, **kwargs):
+    """Fake Session.get that only knows barcode 1."""
+    resp = mock.MagicMock()
+    gtin14 = url.rsplit("/", 1)[1]
+
+    if gtin14 != "1":
+        resp.raise_for_status.side_effect = requests.HTTPError("404")
+
+    resp.json.return_value = {"gtin14": gtin14, "name": "MyName"}
+
+    return resp
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = os.path.join(self.directory, "output.ndjson")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write_input(self, lines):
+        path = os.path.join(self.directory, "input.txt")
+
+        with io.open(path, "w", encoding="utf-8") as output:
+            output.write(u"\n".join(lines) + u"\n")
+
+        return path
+
+    def _read_output(self):
+        with io.open(self.output, encoding="utf-8") as lines:
+            return [json.loads(line) for line in lines]
+
+    @mock.patch("requests.Session.get", side_effect=_get)
+    def test_lookup(self, get_request):
+        path = self._write_input(["1", "", "2"])
+
+        status = cli.main(
+            ["lookup", path, "-o", self.output, "--ordered", "--no-progress"]
+        )
+
+        records = self._read_output()
+
+        self.assertEqual(0, status)
+        self.assertEqual("MyName", records[0]["name"])
+        self.assertEqual("2", records[1]["gtin14"])
+        self.assertIn("HTTPError", records[1]["error"])
+
+    @mock.patch("requests.Session.get", side_effect=_get)
+    def test_lookup_strict(self, get_request):
+        path = self._write_input(["2"])
+
+        status = cli.main(
+            ["lookup", path, "-o", self.output, "--strict", "--no-progress"]
+        )
+
+        self.assertEqual(1, status)
+
+    @mock.patch("requests.Session.get", side_effect=_get)
+    def test_lookup_stdin(self, get_request):
+        with mock.patch("sys.stdin", io.StringIO(u"1\n1\n")):
+            cli.main(["lookup", "-o", self.output, "--no-progress"])
+
+        self.assertEqual(2, len(self._read_output()))
+
+    @mock.patch("requests.Session.get")
+    def test_search(self, get_request):
+        get_request.return_value.json.return_value = [{"gtin14": "1"}]
+
+        cli.main(["search", "Peanut Butter", "-o", self.output])
+
+        self.assertEqual([{"gtin14": "1", "images": []}], self._read_output())
+
+    @mock.patch("datakick.api.Client.close", autospec=True)
+    @mock.patch("datakick.api.Client.add_image", autospec=True)
+    def test_upload_images_manifest(self, add_image, close):
+        add_image.return_value = "https://img.jpg"
+        path = self._write_input(["1 image.jpg"])
+        manifest = os.path.join(self.directory, "manifest.ndjson")
+
+        cli.main([
+            "upload-images", path, "-o", self.output, "--no-progress",
+            "--manifest", manifest
+        ])
+
+        client = add_image.call_args[0][0]
+        self.assertEqual(manifest, client.image_manifest.path)
+        close.assert_called_once_with(client)
+        self.assertEqual("https://img.jpg", self._read_output()[0]["image_url"])
+
+    @mock.patch("datakick.api.add_image", return_value="https://img.jpg")
+    def test_upload_images(self, add_image):
+        path = self._write_input(["1 /path/to/my image.jpg"])
+
+        cli.main(["upload-images", path, "-o", self.output, "--no-progress"])
+
+        self.assertEqual(
+            [mock.call("1", "/path/to/my image.jpg")], add_image.call_args_list
+        )
+        self.assertEqual(
+            [{
+                "gtin14": "1",
+                "path": "/path/to/my image.jpg",
+                "image_url": "https://img.jpg",
+            }],
+            self._read_output()
+        )
+
+    @mock.patch("datakick.crawler.merge", return_value=0)
+    @mock.patch("datakick.crawler.crawl")
+    def test_crawl(self, crawl, merge):
+        with mock.patch("sys.stderr"):
+            cli.main(["crawl", self.directory, "-w", "2", "--merge", "out"])
+
+        self.assertEqual(2, crawl.call_args[1]["workers"])
+        self.assertEqual(
+            [mock.call(self.directory, "out")], merge.call_args_list
+        )
+
+    @mock.patch("datakick.crawler.unfinished_pages", return_value=[[3, None]])
+    @mock.patch("datakick.crawler.crawl")
+    def test_crawl_deadline(self, crawl, unfinished_pages):
+        with mock.patch("sys.stderr") as stderr:
+            cli.main(["crawl", self.directory, "--deadline", "60"])
+
+        self.assertEqual(60.0, crawl.call_args[1]["deadline"])
+        stderr.write.assert_any_call("Unfinished pages 3 to the end.\n")
+
+    @mock.patch(
+        "datakick.api.Client.find_products", return_value=iter([]),
+        autospec=True
+    )
+    def test_lookup_deadline(self, find_products):
+        path = self._write_input(["1"])
+
+        cli.main(["lookup", path, "-o", self.output, "--deadline", "2.5"])
+
+        self.assertEqual(2.5, find_products.call_args[0][4])
+
+    @mock.patch("datakick.api.Client.close", autospec=True)
+    @mock.patch("requests.Session.get", side_effect=_get)
+    def test_lookup_pooled_client(self, get_request, close):
+        path = self._write_input(["1"])
+
+        cli.main(["lookup", path, "-o", self.output, "-c", "3"])
+
+        client = close.call_args[0][0]
+        adapter = client.transport.session.get_adapter("https://")
+        self.assertEqual(3, adapter._pool_maxsize)
+
+    @mock.patch("datakick.server.ProxyServer")
+    def test_serve(self, server):
+        server.return_value.serve_forever.side_effect = KeyboardInterrupt
+
+        with mock.patch("sys.stderr"):
+            status = cli.main(["serve", "-p", "9000", "--ttl", "60"])
+
+        address, client = server.call_args[0]
+        self.assertEqual(130, status)
+        self.assertEqual(("127.0.0.1", 9000), address)
+        self.assertEqual(60.0, client.ttl)
+        self.assertIsNotNone(client.cache)
+        server.return_value.server_close.assert_called_once_with()
+
+    def test_progress(self):
+        stream = io.StringIO()
+        progress = cli._Progress(stream, interval=0)
+        progress.update()
+        progress.update(error=True)
+        progress.finish()
+
+        self.assertIn(u"2 done, 1 errors", stream.getvalue())
+
+    def test_no_command(self):
+        with mock.patch("sys.stderr"):
+            self.assertRaises(SystemExit, cli.main, [])
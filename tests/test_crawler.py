@@ -0,0 +1,176 @@
+"""Unittest for datakick.crawler module."""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+import datakick.crawler as crawler
+
+
+def _pages(last_page, per_page=2):
+    """Returns a fake Session.get that serves ``last_page`` pages."""
+    def get(url, **kwargs):
+        page = int(url.rsplit("=", 1)[1])
+        resp = mock.MagicMock()
+
+        if page > last_page:
+            resp.json.return_value = []
+        else:
+            resp.json.return_value = [
+                {"gtin14": "{:07d}{:07d}".format(page, item)}
+                for item in range(per_page)
+            ]
+
+        return resp
+
+    return get
+
+
+class TestCrawler(unittest.TestCase):
+
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def test_claims_chunks(self):
+        claims = crawler._PageClaims(start_page=1, chunk_size=3)
+
+        self.assertEqual((1, 4), claims.claim())
+        self.assertEqual((4, 7), claims.claim())
+
+    def test_claims_stop_at_end(self):
+        claims = crawler._PageClaims(start_page=1, chunk_size=3)
+        claims.claim()
+        claims.mark_end(2)
+
+        self.assertTrue(claims.is_past_end(2))
+        self.assertFalse(claims.is_past_end(1))
+        self.assertEqual(None, claims.claim())
+
+    def test_claims_max_page(self):
+        claims = crawler._PageClaims(start_page=1, chunk_size=3, max_page=4)
+
+        self.assertEqual((1, 4), claims.claim())
+        self.assertEqual((4, 5), claims.claim())
+        self.assertEqual(None, claims.claim())
+
+    def test_rate_limiter_unlimited(self):
+        limiter = crawler._RateLimiter()
+
+        with mock.patch("time.sleep") as sleep:
+            limiter.wait()
+            limiter.wait()
+
+        self.assertFalse(sleep.called)
+
+    def test_rate_limiter_spaces_requests(self):
+        limiter = crawler._RateLimiter(rate=10)
+
+        with mock.patch("time.sleep") as sleep:
+            limiter.wait()
+            limiter.wait()
+
+        self.assertEqual(1, sleep.call_count)
+        self.assertAlmostEqual(0.1, sleep.call_args[0][0], places=2)
+
+    @mock.patch("requests.Session.get", side_effect=_pages(5))
+    def test_worker_crawls_until_end(self, get_request):
+        claims = crawler._PageClaims(start_page=1, chunk_size=2)
+        limiter = crawler._RateLimiter()
+
+        crawler._crawl_worker(0, self.output_dir, claims, limiter, 0)
+
+        path = os.path.join(self.output_dir, "part-00000.ndjson")
+
+        with io.open(path, encoding="utf-8") as lines:
+            products = [json.loads(line) for line in lines]
+
+        self.assertEqual(10, len(products))
+        self.assertEqual(None, claims.claim())
+
+    @mock.patch("datakick.deadline.time.time")
+    def test_worker_stops_at_deadline(self, time):
+        clock = [0.0]
+        pages = _pages(10)
+
+        def get(url, **kwargs):
+            if url.endswith("=2"):
+                clock[0] = 100.0
+            return pages(url, **kwargs)
+
+        time.side_effect = lambda: clock[0]
+        claims = crawler._PageClaims(start_page=1, chunk_size=4)
+        limiter = crawler._RateLimiter()
+
+        with mock.patch(
+            "requests.Session.get", side_effect=get
+        ) as get_request:
+            crawler._crawl_worker(
+                0, self.output_dir, claims, limiter, 0, expires_at=50.0
+            )
+
+        self.assertEqual(2, get_request.call_count)
+        self.assertEqual(
+            [[3, 5], [5, None]],
+            crawler._collect_unfinished(self.output_dir, claims)
+        )
+        self.assertEqual(
+            [[3, 5], [5, None]], crawler.unfinished_pages(self.output_dir)
+        )
+
+    def test_crawl_removes_previous_files(self):
+        for name in (
+            "part-00000.ndjson", "part-00007.ndjson", "unfinished-00003.json",
+            "unfinished.json", "snapshot.ndjson"
+        ):
+            with open(os.path.join(self.output_dir, name), "w") as output:
+                output.write("[]")
+
+        with mock.patch("multiprocessing.Process") as process:
+            process.return_value.exitcode = 0
+            crawler.crawl(self.output_dir, workers=1)
+
+        self.assertEqual(
+            ["snapshot.ndjson"], sorted(os.listdir(self.output_dir))
+        )
+
+    def test_unfinished_pages_none(self):
+        self.assertEqual([], crawler.unfinished_pages(self.output_dir))
+
+    def test_merge_drops_duplicates(self):
+        for worker, gtin14s in enumerate([["1", "2"], ["2", "3"]]):
+            path = os.path.join(
+                self.output_dir, "part-{:05d}.ndjson".format(worker)
+            )
+
+            with io.open(path, "w", encoding="utf-8") as output:
+                for gtin14 in gtin14s:
+                    output.write(crawler._dumps({"gtin14": gtin14}))
+
+        snapshot = os.path.join(self.output_dir, "snapshot.ndjson")
+
+        self.assertEqual(3, crawler.merge(self.output_dir, snapshot))
+        self.assertEqual(
+            ["1", "2", "3"],
+            [product.gtin14 for product in crawler.read_snapshot(snapshot)]
+        )
+
+    def test_read_snapshot_images(self):
+        snapshot = os.path.join(self.output_dir, "snapshot.ndjson")
+
+        with io.open(snapshot, "w", encoding="utf-8") as output:
+            output.write(crawler._dumps({"gtin14": "1", "images": ["url"]}))
+
+        product = next(crawler.read_snapshot(snapshot))
+
+        self.assertEqual(["url"], product.images)
@@ -12,6 +12,7 @@ except ImportError:
     import mock
 
 from datakick.exceptions import ImageTooLargeError, InvalidImageFormatError
+from datakick.index import SearchIndex
 from datakick.models import DatakickProduct
 
 
@@ -93,7 +94,10 @@ class TestDatakick(unittest.TestCase):
             mock_file.assert_called_once_with(img, "rb")
 
         self.assertEqual(
-            [mock.call(url, files={"image": mock_file()})],
+            [mock.call(
+                url, files={"image": mock_file()},
+                timeout=dk.TIMEOUTS["add_image"]
+            )],
             post_request.call_args_list
         )
 
@@ -128,7 +132,10 @@ class TestDatakick(unittest.TestCase):
         url = "https://www.datakick.org/api/items/000000000000"
 
         self.assertEqual(
-            [mock.call(url, params=self.valid_add_params)],
+            [mock.call(
+                url, params=self.valid_add_params,
+                timeout=dk.TIMEOUTS["add_product"]
+            )],
             put_request.call_args_list
         )
 
@@ -149,7 +156,7 @@ class TestDatakick(unittest.TestCase):
         dk.find_product(self.valid_gtin14)
 
         self.assertEqual(
-            [mock.call(url)],
+            [mock.call(url, timeout=dk.TIMEOUTS["find_product"])],
             get_request.call_args_list
         )
 
@@ -166,7 +173,7 @@ class TestDatakick(unittest.TestCase):
         products = dk.list_products(-2)
 
         self.assertEqual(
-            [mock.call(url)],
+            [mock.call(url, timeout=dk.TIMEOUTS["list_products"])],
             get_request.call_args_list
         )
 
@@ -177,7 +184,7 @@ class TestDatakick(unittest.TestCase):
         products = dk.list_products(5)
 
         self.assertEqual(
-            [mock.call(url)],
+            [mock.call(url, timeout=dk.TIMEOUTS["list_products"])],
             get_request.call_args_list
         )
 
@@ -198,7 +205,7 @@ class TestDatakick(unittest.TestCase):
         products = dk.search(query)
 
         self.assertEqual(
-            [mock.call(url)],
+            [mock.call(url, timeout=dk.TIMEOUTS["search"])],
             get_request.call_args_list
         )
 
@@ -211,3 +218,86 @@ class TestDatakick(unittest.TestCase):
         products = dk.search(query)
 
         self.assertEqual(list, type(products))
+
+    @mock.patch("requests.get")
+    def test_search_index_hit(self, get_request):
+        index = SearchIndex([DatakickProduct(self.json_response)])
+
+        products = dk.search("MyName", index=index)
+
+        self.assertEqual(1, len(products))
+        self.assertFalse(get_request.called)
+
+    @mock.patch("requests.get")
+    def test_search_index_miss(self, get_request):
+        index = SearchIndex()
+        json_response = copy.deepcopy(self.json_response)
+        json_response["gtin14"] = self.valid_gtin14
+
+        get_request.return_value.json = mock.MagicMock(
+            return_value=[json_response]
+        )
+
+        dk.search("MyName", index=index)
+
+        self.assertTrue(get_request.called)
+        self.assertIn(self.valid_gtin14, index)
+
+    @mock.patch("requests.get")
+    def test_register_hook(self, get_request):
+        hook = mock.MagicMock()
+
+        get_request.return_value.json = mock.MagicMock(
+            return_value=self.json_response
+        )
+
+        dk.register_hook(hook)
+
+        try:
+            product = dk.find_product(self.valid_gtin14)
+        finally:
+            dk.unregister_hook(hook)
+
+        self.assertEqual([mock.call(product)], hook.call_args_list)
+
+    @mock.patch("requests.get")
+    def test_iter_products_stops_on_empty_page(self, get_request):
+        get_request.return_value.json = mock.MagicMock(
+            side_effect=[
+                [copy.deepcopy(self.json_response)],
+                [copy.deepcopy(self.json_response)],
+                [],
+            ]
+        )
+
+        products = list(dk.iter_products())
+
+        self.assertEqual(2, len(products))
+        self.assertEqual(3, get_request.call_count)
+
+    @mock.patch("requests.get")
+    def test_iter_products_end_page(self, get_request):
+        get_request.return_value.json = mock.MagicMock(
+            side_effect=lambda: [copy.deepcopy(self.json_response)]
+        )
+
+        products = list(dk.iter_products(2, 4))
+
+        self.assertEqual(3, len(products))
+        self.assertEqual(
+            "https://www.datakick.org/api/items?page=2",
+            get_request.call_args_list[0][0][0]
+        )
+
+    @mock.patch("requests.get")
+    def test_find_products(self, get_request):
+        get_request.return_value.json = mock.MagicMock(
+            side_effect=lambda: copy.deepcopy(self.json_response)
+        )
+
+        results = list(dk.find_products(["1", "2", "3"], concurrency=2))
+
+        self.assertEqual(["1", "2", "3"], [gtin14 for gtin14, _ in results])
+        self.assertEqual(
+            [DatakickProduct] * 3, [type(product) for _, product in results]
+        )
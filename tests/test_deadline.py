@@ -0,0 +1,152 @@
+"""Unittest for datakick.deadline module."""
+
+import unittest
+
+import requests
+
+from datakick.api import Client
+from datakick.cache import MemoryCache
+from datakick.deadline import Deadline, as_deadline
+from datakick.exceptions import DeadlineExceededError
+from datakick.models import DatakickProduct
+from datakick.transport import FakeTransport
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+
+def _products(count):
+    return [{"gtin14": "{:014d}".format(i)} for i in range(count)]
+
+
+class _TimingOutTransport(FakeTransport):
+    """Fake transport timing out, after the deadline passed if any."""
+
+    def __init__(self, products=(), deadline=None):
+        FakeTransport.__init__(self, products)
+        self.deadline = deadline
+
+    def request(self, method, url, params=None, files=None, timeout=None):
+        if self.deadline is not None:
+            self.deadline.expires_at = 0
+
+        raise requests.ReadTimeout("timed out")
+
+
+class TestDeadline(unittest.TestCase):
+
+    @mock.patch("datakick.deadline.time.time", return_value=100.0)
+    def test_timeout_cut_to_remaining(self, time):
+        deadline = Deadline(5)
+
+        self.assertEqual((3.05, 5.0), deadline.timeout((3.05, 30)))
+        self.assertEqual((2.0, 2.0), deadline.timeout(2))
+        self.assertEqual((5.0, 5.0), deadline.timeout(None))
+        self.assertEqual((5.0, 1.0), deadline.timeout((None, 1.0)))
+
+    @mock.patch("datakick.deadline.time.time", return_value=100.0)
+    def test_expired(self, time):
+        deadline = Deadline.at(100.0)
+
+        self.assertTrue(deadline.expired)
+        self.assertEqual(0.0, deadline.remaining())
+        self.assertRaises(DeadlineExceededError, deadline.timeout, (3, 30))
+
+    def test_as_deadline(self):
+        deadline = Deadline(5)
+
+        self.assertIs(deadline, as_deadline(deadline))
+        self.assertEqual(None, as_deadline(None))
+        self.assertIsInstance(as_deadline(5), Deadline)
+
+
+class TestClientDeadline(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeTransport(_products(250))
+
+    def test_timeouts_override(self):
+        transport = mock.MagicMock()
+        client = Client(transport, timeouts={"find_product": 5})
+
+        client.find_product("1")
+
+        self.assertEqual((5, 5), transport.request.call_args[1]["timeout"])
+
+    def test_timeouts_disabled(self):
+        transport = mock.MagicMock()
+        client = Client(transport, timeouts={"find_product": None})
+
+        client.find_product("1")
+
+        self.assertEqual(None, transport.request.call_args[1]["timeout"])
+
+    def test_find_products_marks_unfinished(self):
+        cache = MemoryCache()
+        cache.set("1", DatakickProduct({"gtin14": "1"}))
+        client = Client(self.fake, cache=cache)
+
+        results = dict(
+            client.find_products(["1", "00000000000002"], deadline=Deadline(0))
+        )
+
+        self.assertEqual("1", results["1"].gtin14)
+        self.assertIsInstance(
+            results["00000000000002"], DeadlineExceededError
+        )
+        self.assertEqual([], self.fake.requests)
+
+    def test_find_products_within_deadline(self):
+        client = Client(self.fake)
+
+        results = list(
+            client.find_products(["00000000000002"], deadline=60)
+        )
+
+        self.assertEqual("00000000000002", results[0][1].gtin14)
+
+    def test_iter_products_stops_at_deadline(self):
+        deadline = Deadline(60)
+        products = Client(self.fake).iter_products(deadline=deadline)
+
+        for _ in range(100):
+            next(products)
+
+        deadline.expires_at = 0
+
+        with self.assertRaises(DeadlineExceededError) as context:
+            next(products)
+
+        self.assertEqual(2, context.exception.page)
+        self.assertEqual(1, len(self.fake.requests))
+
+    def test_timeout_past_deadline(self):
+        deadline = Deadline(60)
+        client = Client(_TimingOutTransport(deadline=deadline))
+
+        results = list(client.find_products(["1"], deadline=deadline))
+
+        self.assertIsInstance(results[0][1], DeadlineExceededError)
+
+    def test_iter_products_timeout_past_deadline(self):
+        deadline = Deadline(60)
+        client = Client(_TimingOutTransport(deadline=deadline))
+        products = client.iter_products(start_page=3, deadline=deadline)
+
+        with self.assertRaises(DeadlineExceededError) as context:
+            next(products)
+
+        self.assertEqual(3, context.exception.page)
+
+    def test_timeout_within_deadline(self):
+        client = Client(_TimingOutTransport())
+
+        self.assertRaises(
+            requests.Timeout, client.find_product, "1", Deadline(60)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+"""Unittest and size and speed benchmarks for datakick.encoding module."""
+
+import copy
+import json
+import os
+import pickle
+import timeit
+import unittest
+
+from datakick import encoding
+from datakick.models import DatakickProduct
+
+
+def _response():
+    return {
+        "gtin14": "00016000275287",
+        "brand_name": "General Mills",
+        "name": "Cheerios Honey Nut Cereal",
+        "size": "12.25 oz",
+        "ingredients": "Whole Grain Oats, Sugar, Oat Bran, Corn Starch, "
+                       "Honey, Brown Sugar Syrup, Salt, Tripotassium "
+                       "Phosphate, Canola and/or Rice Bran Oil, Natural "
+                       "Almond Flavor.",
+        "serving_size": "3/4 cup (28g)",
+        "servings_per_container": 12,
+        "calories": 110,
+        "fat_calories": 15,
+        "fat": 1.5,
+        "saturated_fat": 0,
+        "trans_fat": 0,
+        "polyunsaturated_fat": 0.5,
+        "monounsaturated_fat": 0.5,
+        "cholesterol": 0,
+        "sodium": 160,
+        "potassium": 95,
+        "carbohydrate": 22,
+        "fiber": 2,
+        "sugars": 9,
+        "protein": 2,
+        "author": None,
+        "publisher": None,
+        "pages": None,
+        "alcohol_by_volume": None,
+        "images": [
+            {"url": "https://images.example.com/items/00016000275287/1.jpg"},
+            {"url": "https://images.example.com/items/00016000275287/2.jpg"},
+        ],
+    }
+
+
+class TestEncoding(unittest.TestCase):
+
+    def setUp(self):
+        self.product = DatakickProduct(_response())
+
+    def _round_trip(self, response):
+        data = encoding.encode(response)
+        return encoding.decode(data)[0]
+
+    def test_product_round_trip(self):
+        data = self.product.to_bytes()
+        product = DatakickProduct.from_bytes(data)
+
+        self.assertEqual(self.product.as_dict(), product.as_dict())
+        self.assertFalse(product.stale)
+
+    def test_values(self):
+        response = {
+            "name": u"Cr\xe8me br\xfbl\xe9e",
+            "ingredients": "x" * 300,
+            "calories": -5,
+            "sodium": 2 ** 40,
+            "fat": 0.1,
+            "pages": None,
+            "author": True,
+            "publisher": False,
+        }
+
+        self.assertEqual(response, self._round_trip(response))
+
+    def test_unknown_attributes(self):
+        response = {
+            "gtin14": "1",
+            "created_at": "2016-01-01",
+            "tags": ["a", {"b": 1}],
+        }
+
+        self.assertEqual(response, self._round_trip(response))
+
+    def test_images_prefix_compressed(self):
+        urls = [
+            u"https://images.example.com/items/1/{}.jpg".format(i)
+            for i in range(10)
+        ]
+
+        data = encoding.encode({"images": urls})
+
+        self.assertLess(len(data), len(urls[0]) + 10 * 8)
+        self.assertEqual(urls, encoding.decode(data)[0]["images"])
+
+    def test_images_unicode_and_empty(self):
+        for urls in ([], [u"https://x/\xe9", u"https://x/\xe8", u""]):
+            self.assertEqual(urls, self._round_trip({"images": urls})["images"])
+
+    def test_stale_flag(self):
+        product = DatakickProduct.from_bytes(
+            self.product._stale_copy().to_bytes()
+        )
+
+        self.assertTrue(product.stale)
+
+    def test_pickle(self):
+        product = pickle.loads(pickle.dumps(self.product))
+
+        self.assertEqual(self.product.as_dict(), product.as_dict())
+
+    def test_pickle_stale(self):
+        product = pickle.loads(pickle.dumps(self.product._stale_copy()))
+
+        self.assertTrue(product.stale)
+
+    def test_copy(self):
+        product = copy.copy(self.product)
+
+        self.assertEqual(self.product.as_dict(), product.as_dict())
+        self.assertIsNot(self.product._response, product._response)
+
+    def test_unsupported_version(self):
+        data = b"\x02" + self.product.to_bytes()[1:]
+
+        self.assertRaises(ValueError, DatakickProduct.from_bytes, data)
+
+
+class TestEncodingSize(unittest.TestCase):
+
+    def test_smaller_than_pickle_and_json(self):
+        product = DatakickProduct(_response())
+        size = len(product.to_bytes())
+
+        pickled = len(
+            pickle.dumps(product.as_dict(), pickle.HIGHEST_PROTOCOL)
+        )
+        dumped = len(json.dumps(product.as_dict()).encode("utf-8"))
+
+        self.assertLess(size, 0.7 * pickled)
+        self.assertLess(size, 0.7 * dumped)
+
+
+def _best(func, number=2000):
+    """Returns the best time in microseconds of a call to func."""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+@unittest.skipUnless(
+    os.environ.get("DATAKICK_BENCHMARKS"),
+    "timing benchmarks, set DATAKICK_BENCHMARKS=1 to run them"
+)
+class TestEncodingSpeed(unittest.TestCase):
+
+    def setUp(self):
+        self.product = DatakickProduct(_response())
+        self.response = self.product.as_dict()
+
+    def test_pickle_as_fast_as_dict(self):
+        product = _best(lambda: pickle.dumps(self.product))
+        response = _best(lambda: pickle.dumps(self.response))
+
+        self.assertLess(product, 3 * response)
+
+    def test_codec_against_pickle_and_json(self):
+        data = self.product.to_bytes()
+        pickled = pickle.dumps(self.response, pickle.HIGHEST_PROTOCOL)
+        dumped = json.dumps(self.response)
+
+        timings = {
+            "encode": _best(self.product.to_bytes),
+            "decode": _best(lambda: DatakickProduct.from_bytes(data)),
+            "pickle.dumps": _best(
+                lambda: pickle.dumps(self.response, pickle.HIGHEST_PROTOCOL)
+            ),
+            "pickle.loads": _best(lambda: pickle.loads(pickled)),
+            "json.dumps": _best(lambda: json.dumps(self.response)),
+            "json.loads": _best(lambda: json.loads(dumped)),
+        }
+
+        # the pure Python codec trades speed for size, but stays within a
+        # small factor of the C implemented json module
+        self.assertLess(timings["encode"], 4 * timings["json.dumps"], timings)
+        self.assertLess(timings["decode"], 4 * timings["json.loads"], timings)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""Unittest for datakick.export module."""
+
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+import datakick.export as export
+from datakick.models import ATTRIBUTES, DatakickProduct
+
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.products = [
+            DatakickProduct({
+                "gtin14": "{:014d}".format(i),
+                "name": u"Caf\xe9 {}".format(i),
+                "calories": i,
+                "images": [{"url": "url_1"}, {"url": "url_2"}],
+            })
+            for i in range(25)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_export_ndjson(self):
+        path = self._path("products.ndjson")
+
+        count = export.export(iter(self.products), path, row_group_size=10)
+
+        with io.open(path, encoding="utf-8") as lines:
+            rows = [json.loads(line) for line in lines]
+
+        self.assertEqual(25, count)
+        self.assertEqual(25, len(rows))
+        self.assertEqual(set(ATTRIBUTES), set(rows[0]))
+        self.assertEqual(self.products[3].as_dict()["name"], rows[3]["name"])
+        self.assertEqual(["url_1", "url_2"], rows[0]["images"])
+
+    def test_export_csv(self):
+        path = self._path("products.csv")
+
+        export.export(self.products, path, row_group_size=7)
+
+        with io.open(path, encoding="utf-8", newline="") as lines:
+            rows = list(csv.DictReader(lines))
+
+        self.assertEqual(25, len(rows))
+        self.assertEqual("url_1 url_2", rows[0]["images"])
+        self.assertEqual("24", rows[24]["calories"])
+        self.assertEqual("", rows[0]["sodium"])
+
+    def test_export_empty(self):
+        path = self._path("products.ndjson")
+
+        self.assertEqual(0, export.export([], path))
+
+    def test_export_unknown_extension(self):
+        self.assertRaises(
+            ValueError, export.export, self.products, self._path("out.txt")
+        )
+
+    def test_export_unknown_format(self):
+        self.assertRaises(
+            ValueError, export.export, self.products, self._path("out"),
+            format="xml"
+        )
+
+    def test_export_writer_error(self):
+        path = self._path("products.ndjson")
+
+        with mock.patch.object(
+            export._NDJSONWriter, "write", side_effect=IOError("disk full")
+        ):
+            self.assertRaises(
+                IOError, export.export, self.products, path, row_group_size=1,
+                queue_size=1
+            )
+
+    def test_export_parquet(self):
+        try:
+            import pyarrow.parquet
+        except ImportError:
+            self.skipTest("pyarrow isn't installed")
+
+        path = self._path("products.parquet")
+
+        export.export(self.products, path, row_group_size=10)
+
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+        table = parquet_file.read()
+
+        self.assertEqual(3, parquet_file.num_row_groups)
+        self.assertEqual(25, table.num_rows)
+        self.assertEqual(24.0, table.column("calories").to_pylist()[24])
+
+    def test_main_snapshot(self):
+        snapshot = self._path("snapshot.ndjson")
+        path = self._path("products.csv")
+
+        with io.open(snapshot, "w", encoding="utf-8") as output:
+            for product in self.products:
+                output.write(
+                    json.dumps(product.as_dict(), ensure_ascii=False) + u"\n"
+                )
+
+        with mock.patch("sys.stderr"):
+            self.assertEqual(0, export.main([path, "--snapshot", snapshot]))
+
+        with io.open(path, encoding="utf-8", newline="") as lines:
+            self.assertEqual(25, len(list(csv.DictReader(lines))))
+
+    def test_page_range(self):
+        self.assertEqual((1, None), export._page_range("1:"))
+        self.assertEqual((2, 5), export._page_range("2:5"))
+        self.assertEqual((1, 3), export._page_range(":3"))
@@ -0,0 +1,82 @@
+"""Unittest for datakick.images module."""
+
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from datakick.api import Client
+from datakick.images import ImageManifest, hash_image
+from datakick.transport import FakeTransport
+
+
+class TestImages(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.manifest_path = os.path.join(self.tmp_dir, "manifest.ndjson")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _image(self, name, content):
+        path = os.path.join(self.tmp_dir, name)
+
+        with open(path, "wb") as image:
+            image.write(content)
+
+        return path
+
+    def test_hash_image(self):
+        path = self._image("a.jpg", b"\xff\xd8image")
+
+        self.assertEqual(
+            hashlib.sha256(b"\xff\xd8image").hexdigest(), hash_image(path)
+        )
+
+    def test_hash_empty_image(self):
+        path = self._image("a.jpg", b"")
+
+        self.assertEqual(hashlib.sha256(b"").hexdigest(), hash_image(path))
+
+    def test_manifest_persisted(self):
+        manifest = ImageManifest(self.manifest_path)
+        manifest.record("1", "abc", "https://img/1.jpg")
+
+        manifest = ImageManifest(self.manifest_path)
+
+        self.assertEqual(1, len(manifest))
+        self.assertEqual("https://img/1.jpg", manifest.get("1", "abc"))
+        self.assertEqual(None, manifest.get("2", "abc"))
+
+    def test_manifest_incomplete_line(self):
+        manifest = ImageManifest(self.manifest_path)
+        manifest.record("1", "abc", "https://img/1.jpg")
+
+        with open(self.manifest_path, "a") as output:
+            output.write('{"gtin14":"2","sha')
+
+        ImageManifest(self.manifest_path).record("3", "def", "https://img/3.jpg")
+        manifest = ImageManifest(self.manifest_path)
+
+        self.assertEqual(2, len(manifest))
+        self.assertEqual("https://img/3.jpg", manifest.get("3", "def"))
+
+    def test_client_skips_uploaded_images(self):
+        fake = FakeTransport([{"gtin14": "1"}, {"gtin14": "2"}])
+        client = Client(fake, image_manifest=ImageManifest())
+        first = self._image("a.jpg", b"\xff\xd8one")
+        copy = self._image("b.jpg", b"\xff\xd8one")
+        other = self._image("c.jpg", b"\xff\xd8two")
+
+        url = client.add_image("1", first)
+
+        self.assertEqual(url, client.add_image("1", copy))
+        self.assertNotEqual(url, client.add_image("1", other))
+        self.assertNotEqual(url, client.add_image("2", copy))
+        self.assertEqual(3, len(fake.requests))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""Import time benchmark for the datakick package."""
+
+import subprocess
+import sys
+import unittest
+
+
+def _import_times(statement):
+    """Runs the statement in a fresh interpreter with ``-X importtime`` and
+    returns the cumulative import time in microseconds of every module."""
+    output = subprocess.check_output(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        stderr=subprocess.STDOUT
+    ).decode("utf-8")
+
+    times = {}
+
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+class TestImport(unittest.TestCase):
+
+    def test_import_skips_requests(self):
+        times = _import_times("import datakick")
+
+        self.assertIn("datakick", times)
+        self.assertNotIn("requests", times)
+        self.assertNotIn("six", times)
+
+    def test_snapshot_import_skips_requests(self):
+        times = _import_times("from datakick.crawler import read_snapshot")
+
+        self.assertNotIn("requests", times)
+
+    def test_api_import_skips_requests(self):
+        times = _import_times("import datakick; datakick.find_product")
+
+        self.assertIn("datakick.models", times)
+        self.assertNotIn("requests", times)
+
+    def test_import_faster_than_requests(self):
+        datakick_time = min(
+            _import_times("import datakick")["datakick"] for _ in range(3)
+        )
+        requests_time = min(
+            _import_times("import requests")["requests"] for _ in range(3)
+        )
+
+        self.assertLess(datakick_time, requests_time)
+
+    def test_lazy_attributes(self):
+        import datakick
+
+        self.assertIs(
+            datakick.api.find_product, datakick.find_product
+        )
+        self.assertIn("find_product", dir(datakick))
+        self.assertRaises(AttributeError, getattr, datakick, "missing")
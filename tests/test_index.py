@@ -0,0 +1,118 @@
+"""Unittest for datakick.index module."""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from datakick.index import SearchIndex, tokenize
+from datakick.models import DatakickProduct
+
+
+def _product(gtin14, name, brand_name=None, ingredients=None):
+    return DatakickProduct({
+        "gtin14": gtin14,
+        "name": name,
+        "brand_name": brand_name,
+        "ingredients": ingredients,
+    })
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SearchIndex([
+            _product("1", "Creamy Peanut Butter", "Jif", "Peanut, Peanut Oil"),
+            _product("2", "Crunchy Peanut Butter", "Skippy", "Peanuts"),
+            _product("3", "Strawberry Jam", "Smucker's", "Strawberries"),
+            _product("4", "Butter", "Land O Lakes", "Cream, Salt"),
+        ])
+
+    def _gtin14s(self, products):
+        return [product.gtin14 for product in products]
+
+    def test_tokenize(self):
+        self.assertEqual(["peanut", "butter"], tokenize("Peanut-Butter"))
+        self.assertEqual([], tokenize(None))
+
+    def test_search_all_terms_match(self):
+        self.assertEqual(
+            ["1", "2"], sorted(self._gtin14s(self.index.search("peanut butter")))
+        )
+
+    def test_search_ranks_by_bm25(self):
+        # "peanut" appears twice in the first product
+        self.assertEqual("1", self.index.search("peanut")[0].gtin14)
+
+    def test_search_prefix(self):
+        self.assertEqual(["3"], self._gtin14s(self.index.search("straw")))
+
+    def test_search_exact_beats_prefix(self):
+        # "cream" is exact in 4 and a prefix of "creamy" in 1
+        self.assertEqual("4", self.index.search("cream")[0].gtin14)
+
+    def test_search_limit(self):
+        self.assertEqual(1, len(self.index.search("butter", limit=1)))
+
+    def test_search_no_match(self):
+        self.assertEqual([], self.index.search("toothpaste"))
+
+    def test_add_replaces(self):
+        self.index.add(_product("3", "Grape Jelly"))
+
+        self.assertEqual([], self.index.search("strawberry"))
+        self.assertEqual(["3"], self._gtin14s(self.index.search("grape")))
+        self.assertEqual(4, len(self.index))
+
+    def test_remove(self):
+        self.index.remove("3")
+
+        self.assertNotIn("3", self.index)
+        self.assertEqual([], self.index.search("jam"))
+
+    def test_concurrent_add_and_search(self):
+        errors = []
+
+        def add(start):
+            for i in range(start, start + 500):
+                name = "Peanut Snack {}".format(i)
+                self.index.add(_product(str(i % 700), name))
+
+        def search():
+            try:
+                for _ in range(200):
+                    self.index.search("pea")
+            except Exception as error:
+                errors.append(error)
+
+        threads = [
+            threading.Thread(target=add, args=(i * 500,)) for i in range(3)
+        ]
+        threads.append(threading.Thread(target=search))
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([], errors)
+        self.assertEqual(
+            sum(self.index._lengths.values()), self.index._total_length
+        )
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "index.gz")
+
+        try:
+            self.index.save(path)
+            index = SearchIndex.load(path)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(len(self.index), len(index))
+        self.assertEqual(
+            self._gtin14s(self.index.search("peanut")),
+            self._gtin14s(index.search("peanut"))
+        )
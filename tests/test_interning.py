@@ -0,0 +1,75 @@
+"""Unittest for datakick.interning module."""
+
+import unittest
+
+from datakick.api import Client
+from datakick.interning import InternPool
+from datakick.transport import FakeTransport
+
+
+def _response(i):
+    # build the strings at runtime so that equal values aren't shared
+    return {
+        "gtin14": "{:014d}".format(i),
+        "brand_name": "".join(["My", "Brand"]),
+        "size": "{}oz".format(20),
+        "name": "Name {}".format(i),
+        "images": [{"url": "https://{}/{}.jpg".format("img", i % 2)}],
+    }
+
+
+class TestInternPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = InternPool()
+
+    def test_intern(self):
+        first = "".join(["My", "Brand"])
+        second = "".join(["My", "Brand"])
+
+        self.assertIsNot(first, second)
+        self.assertIs(first, self.pool.intern(first))
+        self.assertIs(first, self.pool.intern(second))
+
+    def test_intern_non_string(self):
+        self.assertEqual(5, self.pool.intern(5))
+        self.assertEqual(None, self.pool.intern(None))
+        self.assertEqual(0, self.pool.lookups)
+
+    def test_intern_response(self):
+        first = self.pool.intern_response(_response(0))
+        second = self.pool.intern_response(_response(2))
+
+        self.assertIs(first["brand_name"], second["brand_name"])
+        self.assertIs(first["size"], second["size"])
+        self.assertIsNot(first["name"], second["name"])
+        self.assertEqual(_response(0), first)
+
+    def test_stats(self):
+        for i in range(10):
+            self.pool.intern_response(_response(i))
+
+        stats = self.pool.stats()
+
+        # brand_name and size of 10 products, 2 unique values
+        self.assertEqual(20, stats["lookups"])
+        self.assertEqual(18, stats["hits"])
+        self.assertEqual(2, stats["strings"])
+        self.assertGreater(stats["saved_bytes"], 0)
+
+    def test_clear(self):
+        self.pool.intern("value")
+        self.pool.clear()
+
+        self.assertEqual(0, len(self.pool))
+        self.assertEqual(0, self.pool.stats()["lookups"])
+
+    def test_client_interns_products(self):
+        fake = FakeTransport(_response(i) for i in range(200))
+        pool = InternPool()
+        client = Client(fake, intern_pool=pool)
+
+        first, second = client.list_products(1)[:2]
+
+        self.assertIs(first.brand_name, second.brand_name)
+        self.assertGreater(pool.stats()["hits"], 0)
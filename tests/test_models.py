@@ -9,7 +9,7 @@ try:
 except ImportError:
     import mock
 
-from datakick.models import DatakickProduct
+from datakick.models import ATTRIBUTES, DatakickProduct
 
 
 class TestModels(unittest.TestCase):
@@ -195,3 +195,16 @@ class TestModels(unittest.TestCase):
         self.assertEqual(
             self.json_response.get("trans_fat"), self.product.trans_fat
         )
+
+    def test_from_dict(self):
+        product = DatakickProduct.from_dict(self.product.as_dict())
+
+        self.assertEqual(self.product.as_dict(), product.as_dict())
+
+    def test_attributes(self):
+        self.assertIn("gtin14", ATTRIBUTES)
+        self.assertIn("images", ATTRIBUTES)
+        self.assertNotIn("as_dict", ATTRIBUTES)
+        self.assertEqual(
+            set(self.json_response) | set(["gtin14"]), set(ATTRIBUTES)
+        )
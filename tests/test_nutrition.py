@@ -0,0 +1,72 @@
+"""Unittest for datakick.nutrition module."""
+
+import unittest
+
+from datakick.models import DatakickProduct
+from datakick.nutrition import NutritionIndex
+
+
+class TestNutritionIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = NutritionIndex([
+            DatakickProduct({"gtin14": "1", "calories": 90, "sodium": 200}),
+            DatakickProduct({"gtin14": "2", "calories": 50, "sodium": 100}),
+            DatakickProduct({"gtin14": "3", "calories": 100, "sodium": 10}),
+            DatakickProduct({"gtin14": "4", "calories": "80", "sodium": None}),
+            DatakickProduct({"gtin14": "5", "calories": "n/a", "sodium": 5}),
+        ])
+
+    def test_query_lt(self):
+        self.assertEqual(["1", "2", "4"], self.index.query(calories__lt=100))
+
+    def test_query_lte(self):
+        self.assertEqual(
+            ["1", "2", "3", "4"], self.index.query(calories__lte=100)
+        )
+
+    def test_query_gt_gte(self):
+        self.assertEqual(["1"], self.index.query(sodium__gt=100))
+        self.assertEqual(["1", "2"], self.index.query(sodium__gte=100))
+
+    def test_query_eq(self):
+        self.assertEqual(["3"], self.index.query(calories__eq=100))
+
+    def test_query_range(self):
+        self.assertEqual(["2", "4"], self.index.query(calories=(50, 80)))
+        self.assertEqual(["3", "5"], self.index.query(sodium=(None, 10)))
+
+    def test_query_intersection(self):
+        self.assertEqual(
+            ["2"], self.index.query(calories__lt=100, sodium__lt=140)
+        )
+
+    def test_query_no_match(self):
+        self.assertEqual([], self.index.query(calories__lt=10, sodium__lt=140))
+
+    def test_query_no_predicates(self):
+        self.assertEqual(5, len(self.index.query()))
+
+    def test_query_products(self):
+        products = self.index.query_products(sodium__lt=10)
+
+        self.assertEqual(["5"], [product.gtin14 for product in products])
+
+    def test_query_unknown_attribute(self):
+        self.assertRaises(ValueError, self.index.query, name__lt=1)
+
+    def test_query_unknown_operator(self):
+        self.assertRaises(ValueError, self.index.query, calories__ne=1)
+
+    def test_query_many_rows(self):
+        products = [
+            DatakickProduct({"gtin14": str(i), "calories": i, "sodium": -i})
+            for i in range(1000)
+        ]
+
+        index = NutritionIndex(products)
+
+        self.assertEqual(
+            [str(i) for i in range(11, 500)],
+            index.query(calories__lt=500, sodium__lt=-10)
+        )
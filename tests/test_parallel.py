@@ -0,0 +1,59 @@
+"""Unittest for datakick.parallel module."""
+
+import threading
+import time
+import unittest
+
+from datakick.parallel import imap
+
+
+class TestParallel(unittest.TestCase):
+
+    def test_imap_ordered(self):
+        def slow_first(item):
+            time.sleep(0.05 if item == 0 else 0)
+            return item * 2
+
+        results = list(imap(slow_first, range(10), concurrency=4))
+
+        self.assertEqual([(i, i * 2) for i in range(10)], results)
+
+    def test_imap_unordered(self):
+        def slow_first(item):
+            time.sleep(0.05 if item == 0 else 0)
+            return item
+
+        results = list(imap(slow_first, range(4), concurrency=4, ordered=False))
+
+        self.assertEqual(4, len(results))
+        self.assertEqual((0, 0), results[-1])
+
+    def test_imap_yields_exceptions(self):
+        def fail_odd(item):
+            if item % 2:
+                raise ValueError(item)
+            return item
+
+        results = dict(imap(fail_odd, range(4)))
+
+        self.assertEqual(0, results[0])
+        self.assertIsInstance(results[1], ValueError)
+
+    def test_imap_reads_lazily(self):
+        lock = threading.Lock()
+        consumed = []
+
+        def items():
+            for i in range(1000):
+                with lock:
+                    consumed.append(i)
+                yield i
+
+        results = imap(lambda item: item, items(), concurrency=2)
+        next(results)
+
+        self.assertLessEqual(len(consumed), 5)
+        results.close()
+
+    def test_imap_empty(self):
+        self.assertEqual([], list(imap(lambda item: item, [])))
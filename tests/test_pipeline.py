@@ -0,0 +1,167 @@
+"""Unittest for datakick.pipeline module."""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from datakick.api import Client
+from datakick.pipeline import Pipeline
+from datakick.transport import FakeTransport
+
+
+def _double(value):
+    # later items finish first
+    time.sleep(0.001 * (10 - value % 10))
+    return value * 2
+
+
+async def _increment(value):
+    await asyncio.sleep(0.001 * (10 - value % 10))
+    return value + 1
+
+
+class TestPipeline(unittest.TestCase):
+
+    def test_ordered(self):
+        pipeline = Pipeline(range(30)).stage(_double, concurrency=4)
+
+        self.assertEqual(
+            [(i, i * 2) for i in range(30)], list(pipeline)
+        )
+
+    def test_unordered(self):
+        pipeline = Pipeline(range(30)).stage(
+            _double, concurrency=4, ordered=False
+        )
+
+        results = list(pipeline)
+
+        self.assertEqual(
+            [(i, i * 2) for i in range(30)], sorted(results)
+        )
+
+    def test_async_stage(self):
+        pipeline = (
+            Pipeline(range(30))
+            .stage(_double, concurrency=2)
+            .stage(_increment, concurrency=10)
+        )
+
+        self.assertEqual(
+            [(i, i * 2 + 1) for i in range(30)], list(pipeline)
+        )
+
+    def test_no_stages(self):
+        self.assertEqual([(1, 1), (2, 2)], list(Pipeline([1, 2])))
+
+    def test_errors_skip_later_stages(self):
+        calls = []
+
+        def fail_on_two(value):
+            if value == 2:
+                raise ValueError("two")
+            return value
+
+        def record(value):
+            calls.append(value)
+            return value
+
+        pipeline = Pipeline([1, 2, 3]).stage(fail_on_two).stage(record)
+        results = dict(pipeline)
+
+        self.assertIsInstance(results[2], ValueError)
+        self.assertEqual([1, 3], calls)
+        self.assertEqual(1, pipeline.stats()[0]["failed"])
+        self.assertEqual(2, pipeline.stats()[1]["processed"])
+
+    def test_source_error(self):
+        def source():
+            yield 1
+            raise IOError("broken")
+
+        results = []
+
+        with self.assertRaises(IOError):
+            for result in Pipeline(source()).stage(_double):
+                results.append(result)
+
+        self.assertEqual([(1, 2)], results)
+
+    def test_backpressure(self):
+        pulled = []
+
+        def source():
+            for i in range(1000):
+                pulled.append(i)
+                yield i
+
+        pipeline = Pipeline(source(), queue_size=2).stage(
+            _double, concurrency=2
+        )
+        results = iter(pipeline)
+
+        next(results)
+        time.sleep(0.3)
+
+        # both queues and the window of the stage are full, nothing more
+        self.assertLess(len(pulled), 20)
+        pipeline.close()
+
+    def test_close_stops_stages(self):
+        before = set(threading.enumerate())
+        pipeline = Pipeline(range(1000)).stage(_double, concurrency=4)
+
+        for _ in pipeline:
+            break
+
+        started = set(threading.enumerate()) - before
+        deadline = time.time() + 5
+
+        while any(t.is_alive() for t in started) and time.time() < deadline:
+            time.sleep(0.05)
+
+        self.assertFalse(any(t.is_alive() for t in started))
+
+    def test_stats(self):
+        pipeline = (
+            Pipeline(range(10))
+            .stage(_double, concurrency=2, name="fetch")
+            .stage(_increment)
+        )
+
+        list(pipeline)
+        stats = pipeline.stats()
+
+        self.assertEqual(["fetch", "_increment"], [s["name"] for s in stats])
+        self.assertEqual([10, 10], [s["processed"] for s in stats])
+        self.assertEqual([0, 0], [s["queue_depth"] for s in stats])
+        self.assertTrue(all(s["throughput"] > 0 for s in stats))
+
+    def test_runs_once(self):
+        pipeline = Pipeline([1])
+        list(pipeline)
+
+        self.assertRaises(RuntimeError, iter, pipeline)
+        self.assertRaises(RuntimeError, pipeline.stage, _double)
+
+    def test_client_stages(self):
+        fake = FakeTransport([
+            {"gtin14": "1", "name": "one"}, {"gtin14": "2", "name": "two"}
+        ])
+        client = Client(fake)
+
+        pipeline = (
+            Pipeline(["1", "2", "3"])
+            .stage(client.find_product, concurrency=2)
+            .stage(lambda product: product.name.upper())
+        )
+        results = dict(pipeline)
+
+        self.assertEqual("ONE", results["1"])
+        self.assertEqual("TWO", results["2"])
+        self.assertIn("404", str(results["3"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+"""Unittest for datakick.quantities module."""
+
+import math
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+from datakick import quantities
+from datakick.models import DatakickProduct
+from datakick.quantities import (
+    COUNT, GRAMS, MILLILITRES, UNKNOWN, parse_quantities, parse_quantity,
+    per_100, quantity_columns
+)
+
+
+def _product(gtin14, **kwargs):
+    kwargs["gtin14"] = gtin14
+    return DatakickProduct(kwargs)
+
+
+class TestParseQuantity(unittest.TestCase):
+
+    def assertQuantity(self, amount, unit, text):
+        quantity = parse_quantity(text)
+
+        self.assertAlmostEqual(amount, quantity.amount, places=3)
+        self.assertEqual(unit, quantity.unit)
+
+    def test_mass(self):
+        self.assertQuantity(500, GRAMS, "500g")
+        self.assertQuantity(566.990, GRAMS, "20oz")
+        self.assertQuantity(2000, GRAMS, "2 KG")
+        self.assertQuantity(0.1, GRAMS, "100 mg")
+        self.assertQuantity(1000, GRAMS, "1,000 grams")
+
+    def test_volume(self):
+        self.assertQuantity(354.882, MILLILITRES, "12 fl oz")
+        self.assertQuantity(354.882, MILLILITRES, "12 FL. OZ")
+        self.assertQuantity(1500, MILLILITRES, "1.5 L")
+        self.assertQuantity(1500, MILLILITRES, "1,5 l")
+        self.assertQuantity(3785.412, MILLILITRES, "1 gallon")
+
+    def test_fractions(self):
+        self.assertQuantity(354.882, MILLILITRES, "1 1/2 cups")
+        self.assertQuantity(177.441, MILLILITRES, "3/4 cup")
+
+    def test_parentheses_preferred(self):
+        self.assertQuantity(28, GRAMS, "3/4 cup (28g)")
+        self.assertQuantity(500, MILLILITRES, "16.9 FL OZ (500mL)")
+
+    def test_compound_weight(self):
+        self.assertQuantity(566.990, GRAMS, "1 lb 4 oz")
+
+    def test_imperial_parentheses(self):
+        self.assertQuantity(1133.981, GRAMS, "40 oz (2 lb 8 oz)")
+        self.assertQuantity(680.389, GRAMS, "NET WT 24 OZ (1 LB 8 OZ) 680g")
+        self.assertQuantity(236.588, MILLILITRES, "1 cup (8 fl oz)")
+
+    def test_multipack(self):
+        self.assertQuantity(2129.294, MILLILITRES, "6 x 12 fl oz")
+        self.assertQuantity(2130, MILLILITRES, "6 x 12 fl oz (355 ml)")
+
+    def test_count(self):
+        self.assertQuantity(12, COUNT, "12 ct")
+
+    def test_unknown(self):
+        for text in (None, "", "abc", "12 widgets", 12, ["500g"]):
+            self.assertEqual(None, parse_quantity(text))
+
+    def test_memoized(self):
+        with mock.patch.object(
+            quantities, "_parse", wraps=quantities._parse
+        ) as parse:
+            parse_quantity("123.5 g")
+            parse_quantity("123.5 g")
+
+        self.assertEqual(1, parse.call_count)
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_parse_quantities(self):
+        amounts, units = parse_quantities(["500g", None, "1 l", "500g"])
+
+        self.assertEqual(
+            [500.0, 1000.0, 500.0], [amounts[i] for i in (0, 2, 3)]
+        )
+        self.assertTrue(math.isnan(amounts[1]))
+        self.assertEqual([GRAMS, UNKNOWN, MILLILITRES, GRAMS], list(units))
+
+    def test_parse_quantities_distinct_texts_once(self):
+        with mock.patch.object(
+            quantities, "parse_quantity", wraps=parse_quantity
+        ) as parse:
+            parse_quantities(["2 oz", "3 oz"] * 1000)
+
+        self.assertEqual(2, parse.call_count)
+
+    def test_quantity_columns(self):
+        products = [
+            _product("1", size="1 lb", serving_size="2 tbsp (32g)"),
+            _product("2", size="2 l"),
+        ]
+
+        columns = quantity_columns(products)
+
+        amounts, units = columns["size"]
+        self.assertAlmostEqual(453.592, amounts[0], places=3)
+        self.assertEqual([GRAMS, MILLILITRES], list(units))
+        amounts, units = columns["serving_size"]
+        self.assertEqual(32.0, amounts[0])
+        self.assertEqual([GRAMS, UNKNOWN], list(units))
+
+    def test_per_100(self):
+        products = [
+            _product("1", serving_size="1 cup (40g)", calories=150, sugars=10),
+            _product("2", serving_size="250 ml", calories=100, sugars=None),
+            _product("3", serving_size="1 bar", calories=200, sugars=5),
+        ]
+
+        columns = per_100(products, ("calories", "sugars"))
+
+        self.assertEqual(375.0, columns["calories"][0])
+        self.assertEqual(25.0, columns["sugars"][0])
+        self.assertEqual(40.0, columns["calories"][1])
+        self.assertTrue(math.isnan(columns["sugars"][1]))
+        self.assertTrue(math.isnan(columns["calories"][2]))
+
+
+class TestProductQuantities(unittest.TestCase):
+
+    def test_properties(self):
+        product = _product("1", size="12 fl oz", serving_size="8 fl oz")
+
+        self.assertEqual(MILLILITRES, product.size_quantity.unit)
+        self.assertAlmostEqual(236.588, product.serving_quantity.amount, 3)
+
+    def test_missing(self):
+        product = _product("1")
+
+        self.assertEqual(None, product.size_quantity)
+        self.assertEqual(None, product.serving_quantity)
+
+
+if __name__ == "__main__":
+    unittest.main()
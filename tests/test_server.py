@@ -0,0 +1,243 @@
+"""Unittest for datakick.server module."""
+
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+import requests
+
+from datakick.api import Client
+from datakick.cache import MemoryCache
+from datakick.server import ProxyServer, _Coalescer
+from datakick.transport import FakeTransport, RequestsTransport
+
+
+class _SlowTransport(FakeTransport):
+    """Fake transport taking a while to answer, so that requests overlap."""
+
+    def request(self, method, url, params=None, files=None, timeout=None):
+        time.sleep(0.2)
+        return FakeTransport.request(self, method, url, params, files)
+
+
+class TestCoalescer(unittest.TestCase):
+
+    def test_concurrent_calls_coalesced(self):
+        coalescer = _Coalescer()
+        calls = []
+
+        def slow(value):
+            calls.append(value)
+            time.sleep(0.2)
+            return value * 2
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(coalescer.call("k", slow, 2))
+            )
+            for _ in range(5)
+        ]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([2], calls)
+        self.assertEqual([4] * 5, results)
+        self.assertEqual(4, coalescer.coalesced)
+
+    def test_errors_shared_and_forgotten(self):
+        coalescer = _Coalescer()
+
+        def fail():
+            raise ValueError("fail")
+
+        self.assertRaises(ValueError, coalescer.call, "k", fail)
+        self.assertEqual(3, coalescer.call("k", lambda: 3))
+
+
+class TestProxyServer(unittest.TestCase):
+
+    def setUp(self):
+        self.upstream = _SlowTransport([
+            {"gtin14": "00000000000001", "name": "Peanut Butter",
+             "images": [{"url": "https://images.example.com/1.jpg"}]},
+            {"gtin14": "00000000000002", "name": "Almond Butter"},
+        ])
+        upstream_client = Client(self.upstream, cache=MemoryCache())
+        self.server = ProxyServer(("127.0.0.1", 0), upstream_client)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.client = Client(
+            RequestsTransport(requests.Session()), api_url=self.server.url
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.client.close()
+
+    def test_find_product(self):
+        product = self.client.find_product("00000000000001")
+
+        self.assertEqual("Peanut Butter", product.name)
+        self.assertEqual(["https://images.example.com/1.jpg"], product.images)
+
+    def test_find_product_not_found(self):
+        with self.assertRaises(requests.HTTPError) as context:
+            self.client.find_product("00000000000003")
+
+        self.assertEqual(404, context.exception.response.status_code)
+
+    def test_search_and_list(self):
+        self.assertEqual(
+            ["00000000000002"],
+            [p.gtin14 for p in self.client.search("almond")]
+        )
+        self.assertEqual(2, len(self.client.list_products()))
+
+    def test_cached_and_coalesced(self):
+        results = self.client.find_products(["00000000000001"] * 8)
+
+        self.assertEqual(
+            ["Peanut Butter"] * 8, [product.name for _, product in results]
+        )
+        self.client.find_product("00000000000001")
+        self.assertEqual(1, len(self.upstream.requests))
+
+    def test_batch(self):
+        resp = requests.post(
+            self.server.url + "/items/batch",
+            data=json.dumps(
+                {"gtin14s": ["00000000000002", "00000000000003"]}
+            )
+        )
+        body = resp.json()
+
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual("Almond Butter", body[0]["name"])
+        self.assertEqual("00000000000003", body[1]["gtin14"])
+        self.assertEqual(404, body[1]["status"])
+
+    def test_batch_invalid(self):
+        url = self.server.url + "/items/batch"
+
+        self.assertEqual(400, requests.post(url, data="{").status_code)
+
+        self.server.max_batch = 1
+        resp = requests.post(url, data=json.dumps(["1", "2"]))
+        self.assertEqual(413, resp.status_code)
+
+    def _raw(self, request):
+        """Sends raw bytes to the proxy and returns everything it answers
+        until it closes the connection."""
+        connection = socket.create_connection(self.server.server_address)
+        connection.settimeout(5)
+        received = b""
+
+        try:
+            connection.sendall(request)
+
+            while True:
+                data = connection.recv(4096)
+
+                if not data:
+                    return received
+
+                received += data
+        finally:
+            connection.close()
+
+    def test_batch_invalid_length(self):
+        answer = self._raw(
+            b"POST /api/items/batch HTTP/1.1\r\nHost: x\r\n"
+            b"Content-Length: abc\r\n\r\n"
+        )
+
+        self.assertTrue(answer.startswith(b"HTTP/1.1 400"))
+
+    def test_batch_too_large_closes_connection(self):
+        answer = self._raw(
+            b"POST /api/items/batch HTTP/1.1\r\nHost: x\r\n"
+            b"Content-Length: 2000000\r\n\r\n" + b"x" * 100 +
+            b"GET /api/items/00000000000001 HTTP/1.1\r\nHost: x\r\n\r\n"
+        )
+
+        # a single answer, the leftover body isn't read as a request
+        self.assertTrue(answer.startswith(b"HTTP/1.1 413"))
+        self.assertEqual(1, answer.count(b"HTTP/1.1"))
+        self.assertIn(b"Connection: close", answer)
+
+    def test_add_product(self):
+        self.client.find_product("00000000000002")
+        product = self.client.add_product("00000000000002", brand_name="Acme")
+
+        self.assertEqual("Acme", product.brand_name)
+        self.assertEqual(
+            "Acme", self.client.find_product("00000000000002").brand_name
+        )
+        # the proxy cached the new version
+        self.assertEqual(2, len(self.upstream.requests))
+
+    def test_add_image(self):
+        self.client.find_product("00000000000002")
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, "image.jpg")
+
+        try:
+            with open(path, "wb") as image:
+                image.write(b"\xff\xd8image")
+
+            image_url = self.client.add_image("00000000000002", path)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+        self.assertIn(
+            image_url, self.client.find_product("00000000000002").images
+        )
+        self.assertEqual(3, len(self.upstream.requests))
+
+    def test_add_image_without_image(self):
+        resp = requests.post(
+            self.server.url + "/items/00000000000002/images",
+            files={"other": ("image.jpg", b"\xff\xd8")}
+        )
+
+        self.assertEqual(400, resp.status_code)
+
+    def test_add_image_invalid_format(self):
+        resp = requests.post(
+            self.server.url + "/items/00000000000002/images",
+            files={"image": ("image.gif", b"GIF89a")}
+        )
+
+        self.assertEqual(400, resp.status_code)
+        self.assertEqual([], self.upstream.requests)
+
+    def test_invalidate(self):
+        self.client.find_product("00000000000002")
+        self.upstream.products["00000000000002"]["name"] = "Cashew Butter"
+
+        resp = requests.delete(self.server.url + "/items/00000000000002")
+
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual(
+            "Cashew Butter", self.client.find_product("00000000000002").name
+        )
+
+    def test_unknown_path(self):
+        resp = requests.get(self.server.url.replace("/api", "/other"))
+
+        self.assertEqual(404, resp.status_code)
+
+
+if __name__ == "__main__":
+    unittest.main()
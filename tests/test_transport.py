@@ -0,0 +1,241 @@
+"""Unittest for datakick.transport module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+import requests
+import urllib3
+
+from datakick.api import Client
+from datakick.transport import (
+    FakeTransport, RequestsTransport, Response, Urllib3Transport
+)
+
+
+def _products():
+    return [
+        {
+            "gtin14": "00000000000001",
+            "name": "Creamy Peanut Butter",
+            "brand_name": "Jif",
+            "images": [{"url": "someurl_1"}],
+        },
+        {
+            "gtin14": "00000000000002",
+            "name": "Strawberry Jam",
+            "brand_name": "Smucker's",
+        },
+    ]
+
+
+class _PoolManager(object):
+    """urllib3 pool manager answering from a FakeTransport."""
+
+    def __init__(self, fake):
+        self.fake = fake
+        self.calls = []
+
+    def request(self, method, url, fields=None, timeout=None):
+        self.calls.append((method, url, fields))
+        resp = self.fake.request(method, url)
+
+        return mock.MagicMock(
+            status=resp.status_code, data=resp.content, reason=resp.reason
+        )
+
+    def clear(self):
+        pass
+
+
+class TestTransports(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.image = os.path.join(self.directory, "image.jpg")
+
+        with open(self.image, "wb") as image:
+            image.write(b"\xff\xd8\xff")
+
+        self.clients = [
+            Client(FakeTransport(_products())),
+            Client(Urllib3Transport(
+                pool_manager=_PoolManager(FakeTransport(_products()))
+            )),
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_find_product(self):
+        for client in self.clients:
+            product = client.find_product("00000000000001")
+
+            self.assertEqual("Jif", product.brand_name)
+            self.assertEqual(["someurl_1"], product.images)
+
+    def test_find_product_not_found(self):
+        for client in self.clients:
+            self.assertRaises(
+                requests.HTTPError, client.find_product, "00000000000003"
+            )
+
+    def test_list_products(self):
+        for client in self.clients:
+            self.assertEqual(2, len(client.list_products(1)))
+            self.assertEqual([], client.list_products(2))
+
+    def test_search(self):
+        for client in self.clients:
+            products = client.search("peanut butter")
+
+            self.assertEqual(
+                ["00000000000001"], [product.gtin14 for product in products]
+            )
+
+    def test_add_image(self):
+        for client in self.clients:
+            url = client.add_image("00000000000002", self.image)
+
+            self.assertTrue(url.endswith(".jpg"))
+
+    def test_add_image_not_found(self):
+        for client in self.clients:
+            self.assertRaises(
+                requests.HTTPError, client.add_image, "00000000000003",
+                self.image
+            )
+
+    def test_fake_add_product(self):
+        fake = FakeTransport()
+        product = Client(fake).add_product("00000000000003", name="MyName")
+
+        self.assertEqual("MyName", product.name)
+        self.assertEqual("MyName", Client(fake).find_product(
+            "00000000000003").name)
+        self.assertEqual(2, len(fake.requests))
+
+    def test_urllib3_params(self):
+        pool_manager = mock.MagicMock()
+        pool_manager.request.return_value = mock.MagicMock(
+            status=200, data=b'{"gtin14": "1"}', reason="OK"
+        )
+
+        Client(Urllib3Transport(pool_manager=pool_manager)).add_product(
+            "1", name="MyName"
+        )
+
+        args, kwargs = pool_manager.request.call_args
+        self.assertEqual(
+            ("PUT", "https://www.datakick.org/api/items/1?name=MyName"), args
+        )
+        self.assertEqual(None, kwargs["fields"])
+        self.assertEqual(3.05, kwargs["timeout"].connect_timeout)
+        self.assertEqual(30, kwargs["timeout"].read_timeout)
+
+    def test_urllib3_upload(self):
+        pool_manager = _PoolManager(FakeTransport(_products()))
+        client = Client(Urllib3Transport(pool_manager=pool_manager))
+
+        client.add_image("00000000000002", self.image)
+
+        _, _, fields = pool_manager.calls[0]
+        self.assertEqual(("image.jpg", b"\xff\xd8\xff"), fields["image"])
+
+    def test_urllib3_connection_error(self):
+        pool_manager = mock.MagicMock()
+        pool_manager.request.side_effect = urllib3.exceptions.MaxRetryError(
+            None, "url"
+        )
+        client = Client(Urllib3Transport(pool_manager=pool_manager))
+
+        self.assertRaises(requests.ConnectionError, client.find_product, "1")
+
+    def test_urllib3_timeout(self):
+        pool_manager = mock.MagicMock()
+        pool_manager.request.side_effect = urllib3.exceptions.ReadTimeoutError(
+            None, "url", "timed out"
+        )
+        client = Client(Urllib3Transport(pool_manager=pool_manager))
+
+        self.assertRaises(requests.Timeout, client.find_product, "1")
+
+    def test_urllib3_errors_match_requests(self):
+        exceptions = urllib3.exceptions
+        cases = [
+            (exceptions.NewConnectionError(None, "refused"),
+             requests.ConnectionError, requests.Timeout),
+            (exceptions.ProtocolError("reset"),
+             requests.ConnectionError, requests.Timeout),
+            (exceptions.MaxRetryError(
+                None, "url", exceptions.NewConnectionError(None, "refused")
+            ), requests.ConnectionError, requests.Timeout),
+            (exceptions.ConnectTimeoutError(None, "timed out"),
+             requests.ConnectTimeout, None),
+            (exceptions.ReadTimeoutError(None, "url", "timed out"),
+             requests.ReadTimeout, requests.ConnectionError),
+        ]
+
+        for error, expected, unexpected in cases:
+            pool_manager = mock.MagicMock()
+            pool_manager.request.side_effect = error
+            transport = Urllib3Transport(pool_manager=pool_manager)
+
+            with self.assertRaises(expected) as context:
+                transport.request("GET", "url")
+
+            if unexpected is not None:
+                self.assertNotIsInstance(context.exception, unexpected)
+
+    def test_refused_connection_like_requests(self):
+        url = "http://127.0.0.1:1/api/items/1"
+
+        with self.assertRaises(requests.ConnectionError) as context:
+            Urllib3Transport().request("GET", url, timeout=(1, 1))
+
+        self.assertNotIsInstance(context.exception, requests.Timeout)
+        self.assertRaises(
+            requests.ConnectionError, RequestsTransport().request, "GET", url
+        )
+
+    @mock.patch("requests.get")
+    def test_requests_timeout(self, get_request):
+        RequestsTransport().request("GET", "url", timeout=(1, 2))
+
+        self.assertEqual(
+            [mock.call("url", timeout=(1, 2))], get_request.call_args_list
+        )
+
+    @mock.patch("requests.get")
+    def test_requests_default(self, get_request):
+        RequestsTransport().request("GET", "url")
+
+        self.assertEqual([mock.call("url")], get_request.call_args_list)
+
+    def test_requests_session(self):
+        session = mock.MagicMock()
+        transport = RequestsTransport(session)
+
+        transport.request("PUT", "url", params={"name": "MyName"})
+        transport.close()
+
+        self.assertEqual(
+            [mock.call("url", params={"name": "MyName"})],
+            session.put.call_args_list
+        )
+        self.assertTrue(session.close.called)
+
+    def test_response_raise_for_status(self):
+        resp = Response(500, b"{}", "url", "Internal Server Error")
+
+        with self.assertRaises(requests.HTTPError) as context:
+            resp.raise_for_status()
+
+        self.assertIs(resp, context.exception.response)
+        self.assertIn("500 Server Error", str(context.exception))
@@ -0,0 +1,150 @@
+"""Unittest for datakick.warming module."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import unittest.mock as mock
+except ImportError:
+    import mock
+
+from datakick.api import Client
+from datakick.cache import MemoryCache
+from datakick.transport import FakeTransport
+from datakick.warming import SpaceSaving, _throttle, warm
+
+
+class TestSpaceSaving(unittest.TestCase):
+
+    def test_counts(self):
+        sketch = SpaceSaving(k=10)
+
+        for gtin14 in ["1", "2", "1", "3", "1", "2"]:
+            sketch.record(gtin14)
+
+        self.assertEqual([("1", 3), ("2", 2), ("3", 1)], sketch.top())
+        self.assertEqual([("1", 3)], sketch.top(1))
+        self.assertEqual(6, sketch.total)
+
+    def test_evicts_least_frequent(self):
+        sketch = SpaceSaving(k=2)
+        sketch.record("1", 5)
+        sketch.record("2", 1)
+        sketch.record("3")
+
+        self.assertNotIn("2", sketch)
+        # "3" inherits the count of "2"
+        self.assertEqual(2, sketch.count("3"))
+        self.assertEqual(2, len(sketch))
+
+    def test_keeps_heavy_hitters(self):
+        sketch = SpaceSaving(k=20)
+
+        for i in range(5000):
+            sketch.record(str(i % 7) if i % 2 else "noise{}".format(i))
+
+        top = [gtin14 for gtin14, _ in sketch.top(7)]
+
+        self.assertEqual(sorted(str(i) for i in range(7)), sorted(top))
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "sketch.gz")
+        sketch = SpaceSaving(k=2)
+
+        for gtin14 in ["1", "2", "1", "3"]:
+            sketch.record(gtin14)
+
+        try:
+            sketch.save(path)
+            loaded = SpaceSaving.load(path)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(sketch.top(), loaded.top())
+        self.assertEqual(4, loaded.total)
+
+        loaded.record("4")
+
+        self.assertEqual(2, len(loaded))
+
+
+class TestWarm(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeTransport(
+            {"gtin14": str(i), "name": "Name {}".format(i)} for i in range(10)
+        )
+        self.cache = MemoryCache()
+        self.client = Client(self.fake, cache=self.cache)
+        self.sketch = SpaceSaving()
+
+        for i in range(10):
+            self.sketch.record(str(i), 10 - i)
+
+        self.sketch.record("missing")
+
+    def test_client_records_accesses(self):
+        client = Client(self.fake, access_sketch=SpaceSaving())
+        client.find_product("1")
+        client.find_product("1")
+
+        self.assertEqual(2, client.access_sketch.count("1"))
+
+    def test_warm_keeps_counts(self):
+        self.client.access_sketch = self.sketch
+        before = self.sketch.top()
+
+        warm(self.client, self.sketch, block=True)
+
+        self.assertEqual(before, self.sketch.top())
+        self.assertEqual(56, self.sketch.total)
+
+    def test_warm_block(self):
+        warming = warm(self.client, self.sketch, block=True)
+
+        self.assertEqual(10, warming.warmed)
+        self.assertEqual(1, warming.failed)
+        self.assertEqual(10, len(self.cache))
+        self.assertAlmostEqual(55.0 / 56, warming.hit_rate)
+
+    def test_warm_count(self):
+        warm(self.client, self.sketch, count=3, block=True)
+
+        self.assertEqual(
+            ["0", "1", "2"], sorted(url[-1] for _, url in self.fake.requests)
+        )
+
+    def test_warm_background(self):
+        warming = warm(self.client, self.sketch)
+
+        self.assertTrue(warming.wait(timeout=5))
+        self.assertEqual(10, len(self.cache))
+
+    def test_warm_target_hit_rate(self):
+        warming = warm(
+            self.client, self.sketch, block=True, target_hit_rate=0.5,
+            concurrency=1
+        )
+
+        self.assertGreaterEqual(warming.hit_rate, 0.5)
+        warming.wait(timeout=5)
+
+    def test_wait_unreachable_hit_rate(self):
+        warming = warm(self.client, self.sketch)
+
+        self.assertFalse(warming.wait(hit_rate=1.0, timeout=5))
+
+    def test_throttle(self):
+        with mock.patch("time.sleep") as sleep:
+            self.assertEqual([1, 2, 3], list(_throttle([1, 2, 3], rate=10)))
+
+        self.assertEqual(2, sleep.call_count)
+
+    def test_throttle_unlimited(self):
+        with mock.patch("time.sleep") as sleep:
+            list(_throttle([1, 2, 3], rate=None))
+
+        self.assertFalse(sleep.called)